@@ -0,0 +1,67 @@
+"""
+Measures parsing a large birdview, as sent by `location_info`, into an `Image` and decoding
+it repeatedly, against validating it as a list of ints and decoding it on every access as
+done before images were stored as bytes.
+
+    python benchmarks/birdview.py --size 2048 --repeat 10
+"""
+import io
+import argparse
+import statistics
+import time
+from typing import List
+
+import numpy as np
+from PIL import Image as PImage
+from pydantic import TypeAdapter
+
+from invertedai.common import Image
+
+
+def make_birdview(size: int) -> List[int]:
+    rng = np.random.default_rng(0)
+    # Flat regions with some noise compress like rendered maps
+    pixels = np.repeat(rng.integers(0, 255, (size // 16, size // 16, 3), dtype=np.uint8), 16, axis=0).repeat(16, axis=1)
+    pixels[rng.random((size, size)) < 0.05] = 255
+    stream = io.BytesIO()
+    PImage.fromarray(pixels).save(stream, format="PNG")
+    return list(stream.getvalue())
+
+
+def measure(function, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def decode_list(encoded_image: List[int]) -> np.ndarray:
+    return np.array(PImage.open(io.BytesIO(bytes(encoded_image))))[:, :, ::-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=2048, help="Width and height of the birdview in pixels.")
+    parser.add_argument("--repeat", type=int, default=10, help="Number of repetitions per measurement.")
+    args = parser.parse_args()
+
+    encoded_image = make_birdview(args.size)
+    int_list = TypeAdapter(List[int])
+    image = Image.fromval(encoded_image)
+    image.array
+    timings = {
+        "parse as list of ints": lambda: int_list.validate_python(encoded_image),
+        "parse as bytes": lambda: Image.fromval(encoded_image),
+        "decode list every access": lambda: decode_list(encoded_image),
+        "cached array access": lambda: image.array,
+        "decode() copy": lambda: image.decode(),
+    }
+    print(f"{args.size}x{args.size} birdview, {len(encoded_image) / 1000:.0f} kB encoded:")
+    for name, function in timings.items():
+        print(f"  {name:<26} {measure(function, args.repeat) * 1000:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Compares the steps per second of a simulation loop calling `drive` one step at a time with
+the same loop consuming `drive_stream`, against a local stand-in server answering with the
+mock API after a fixed latency. The client does `--work-ms` of work on every response, such as
+rendering or logging, which `drive_stream` overlaps with the next request.
+
+    python benchmarks/drive_stream.py --steps 50 --agents 50 --latency-ms 30 --work-ms 20
+"""
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import invertedai as iai
+from invertedai.api.mock import mock_update_agent_state
+from invertedai.common import AgentState, AgentProperties, RECURRENT_SIZE
+
+
+class MockDriveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        time.sleep(self.server.latency)
+        agent_states = [mock_update_agent_state(AgentState.fromlist(state)).tolist() for state in body["agent_states"]]
+        payload = json.dumps(dict(
+            agent_states=agent_states,
+            recurrent_states=body["recurrent_states"] or [[0.0] * RECURRENT_SIZE for _ in agent_states],
+            birdview=None,
+            infraction_indicators=[],
+            is_inside_supported_area=[True] * len(agent_states),
+            model_version="mock",
+            traffic_lights_states=None,
+            light_recurrent_states=None,
+        )).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def client_work(response, seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=50, help="Number of time steps per run.")
+    parser.add_argument("--agents", type=int, default=50, help="Number of agents in the scene.")
+    parser.add_argument("--latency-ms", type=float, default=30, help="Latency of the stand-in server.")
+    parser.add_argument("--work-ms", type=float, default=20, help="Client work done on every response.")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockDriveHandler)
+    server.latency = args.latency_ms / 1000
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    session = iai.Session()
+    session.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    agent_states = [AgentState.fromlist([10.0 * i, 0.0, 0.0, 5.0]) for i in range(args.agents)]
+    agent_properties = [AgentProperties(length=4.5, width=2.0, rear_axis_offset=1.4, agent_type="car")] * args.agents
+    work = args.work_ms / 1000
+
+    start = time.perf_counter()
+    states, recurrent_states = agent_states, None
+    for _ in range(args.steps):
+        response = iai.drive(location="carla:Town03", agent_states=states, agent_properties=agent_properties,
+                             recurrent_states=recurrent_states, session=session)
+        states, recurrent_states = response.agent_states, response.recurrent_states
+        client_work(response, work)
+    serial = args.steps / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for response in iai.drive_stream(location="carla:Town03", agent_states=agent_states, agent_properties=agent_properties,
+                                     num_steps=args.steps, session=session):
+        client_work(response, work)
+    pipelined = args.steps / (time.perf_counter() - start)
+
+    server.shutdown()
+    print(f"drive loop:   {serial:.1f} steps/s")
+    print(f"drive_stream: {pipelined:.1f} steps/s ({pipelined / serial:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
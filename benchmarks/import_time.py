@@ -0,0 +1,48 @@
+"""
+Measures the time and memory taken by `import invertedai` in fresh interpreters, and lists
+which optional visualization dependencies got imported along the way.
+
+    python benchmarks/import_time.py --repeat 10
+"""
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+OPTIONAL_MODULES = ["matplotlib", "PIL", "tqdm", "ipywidgets"]
+
+PROBE = f"""
+import sys, time, json, resource
+start = time.perf_counter()
+import invertedai
+elapsed = time.perf_counter() - start
+print(json.dumps(dict(
+    seconds=elapsed,
+    max_rss_kb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    loaded=[m for m in {OPTIONAL_MODULES!r} if m in sys.modules],
+)))
+"""
+
+
+def measure(statement: str) -> dict:
+    output = subprocess.run([sys.executable, "-c", statement], check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10, help="Number of fresh interpreters to measure.")
+    args = parser.parse_args()
+
+    samples = [measure(PROBE) for _ in range(args.repeat)]
+    seconds = [sample["seconds"] for sample in samples]
+    max_rss = [sample["max_rss_kb"] for sample in samples]
+    print(f"import invertedai: median {statistics.median(seconds) * 1000:.1f} ms, "
+          f"min {min(seconds) * 1000:.1f} ms over {args.repeat} runs")
+    print(f"peak RSS: median {statistics.median(max_rss) / 1024:.1f} MB")
+    print(f"optional modules loaded: {samples[-1]['loaded'] or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
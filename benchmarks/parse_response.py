@@ -0,0 +1,75 @@
+"""
+Measures the time taken to parse decoded `drive` and `initialize` responses into
+`DriveResponse` and `InitializeResponse`, with and without pydantic validation, and into
+array batches.
+
+    python benchmarks/parse_response.py --agents 100 1000 --repeat 20
+"""
+import random
+import argparse
+import statistics
+import time
+
+from invertedai.common import RECURRENT_SIZE
+from invertedai.api.drive import _parse_drive_response
+from invertedai.api.initialize import _parse_initialize_response
+
+
+def make_drive_response(num_agents: int, rng: random.Random) -> dict:
+    return dict(
+        agent_states=[[rng.uniform(-100, 100), rng.uniform(-100, 100), rng.uniform(-3, 3), rng.uniform(0, 20)]
+                      for _ in range(num_agents)],
+        recurrent_states=[[rng.gauss(0, 1) for _ in range(RECURRENT_SIZE)] for _ in range(num_agents)],
+        birdview=None,
+        infraction_indicators=[[False, False, False] for _ in range(num_agents)],
+        is_inside_supported_area=[True] * num_agents,
+        model_version="benchmark",
+        traffic_lights_states={str(i): "green" for i in range(20)},
+        light_recurrent_states=[[0.0, 1.0] for _ in range(5)],
+    )
+
+
+def make_initialize_response(num_agents: int, rng: random.Random) -> dict:
+    response = make_drive_response(num_agents, rng)
+    del response["is_inside_supported_area"]
+    response["agent_attributes"] = None
+    response["agent_properties"] = [
+        dict(length=4.5, width=2.0, rear_axis_offset=1.4, agent_type="car", waypoint=None, max_speed=None)
+        for _ in range(num_agents)
+    ]
+    return response
+
+
+def measure(parse, response: dict, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse(response)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, nargs="+", default=[100, 1000], help="Numbers of agents to measure.")
+    parser.add_argument("--repeat", type=int, default=20, help="Number of parses per measurement.")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    parsers = {
+        "drive, validated": (make_drive_response, lambda r: _parse_drive_response(r)),
+        "drive, unvalidated": (make_drive_response, lambda r: _parse_drive_response(r, validate=False)),
+        "drive, batches": (make_drive_response, lambda r: _parse_drive_response(
+            r, agent_state_batch=True, recurrent_state_batch=True, validate=False)),
+        "initialize, validated": (make_initialize_response, lambda r: _parse_initialize_response(r)),
+        "initialize, unvalidated": (make_initialize_response, lambda r: _parse_initialize_response(r, validate=False)),
+    }
+    for num_agents in args.agents:
+        print(f"{num_agents} agents:")
+        for name, (make_response, parse) in parsers.items():
+            seconds = measure(parse, make_response(num_agents, rng), args.repeat)
+            print(f"  {name:<24} {seconds * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
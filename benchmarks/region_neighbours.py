@@ -0,0 +1,93 @@
+"""
+Measures looking up the agents of other regions which are passed as conditional agents to
+`initialize` while `large_initialize` loops over its regions, with the spatial grid of placed
+agents against concatenating and filtering the agents of all regions for every region as done
+before the grid.
+
+    python benchmarks/region_neighbours.py --regions 500 --agents 10 --repeat 3
+"""
+import random
+import argparse
+import statistics
+import time
+from math import sqrt
+from typing import List
+
+from invertedai.common import AgentProperties, AgentState, Point
+from invertedai.large.common import Region, REGION_MAX_SIZE
+from invertedai.large.initialize import AGENT_SCOPE_FOV_BUFFER, _AgentGrid, _inside_fov
+
+
+def make_regions(num_regions: int, num_agents: int, rng: random.Random) -> List[Region]:
+    side = int(sqrt(num_regions - 1)) + 1
+    regions = []
+    for i in range(num_regions):
+        center = Point(x=(i % side) * REGION_MAX_SIZE, y=(i // side) * REGION_MAX_SIZE)
+        agent_states = [
+            AgentState.fromlist([
+                center.x + rng.uniform(-REGION_MAX_SIZE / 2, REGION_MAX_SIZE / 2),
+                center.y + rng.uniform(-REGION_MAX_SIZE / 2, REGION_MAX_SIZE / 2),
+                0.0, 0.0
+            ]) for _ in range(num_agents)
+        ]
+        agent_properties = [AgentProperties(length=4.5, width=2.0, rear_axis_offset=1.5, agent_type="car") for _ in agent_states]
+        regions.append(Region(center=center, size=REGION_MAX_SIZE, agent_states=agent_states, agent_properties=agent_properties))
+    return regions
+
+
+def concatenate_and_filter(regions: List[Region]) -> List[int]:
+    num_conditional_agents = []
+    for i, region in enumerate(regions):
+        agent_states = []
+        agent_properties = []
+        for ind, other in enumerate(regions):
+            if ind == i:
+                continue
+            if sqrt((region.center.x-other.center.x)**2+(region.center.y-other.center.y)**2) > (REGION_MAX_SIZE + AGENT_SCOPE_FOV_BUFFER):
+                continue
+            agent_states = agent_states + other.agent_states
+            agent_properties = agent_properties + other.agent_properties[:len(other.agent_states)]
+        conditional_agents = list(filter(
+            lambda x: _inside_fov(center=region.center, agent_scope_fov=region.size+AGENT_SCOPE_FOV_BUFFER, point=x[0].center),
+            zip(agent_states, agent_properties)
+        ))
+        num_conditional_agents.append(len(conditional_agents))
+    return num_conditional_agents
+
+
+def agent_grid(regions: List[Region]) -> List[int]:
+    num_conditional_agents = []
+    grid = _AgentGrid(regions)
+    for i, region in enumerate(regions):
+        agent_states, _ = grid.get_nearby_agents(region_index=i, agent_scope_fov=region.size+AGENT_SCOPE_FOV_BUFFER)
+        num_conditional_agents.append(len(agent_states))
+        # The region keeps its agents, as if initialize placed them at the same positions
+        grid.update(i)
+    return num_conditional_agents
+
+
+def measure(function, regions: List[Region], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(regions)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--regions", type=int, default=500, help="Number of regions, laid out in a square grid.")
+    parser.add_argument("--agents", type=int, default=10, help="Number of agents per region.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of repetitions per measurement.")
+    args = parser.parse_args()
+
+    regions = make_regions(args.regions, args.agents, random.Random(0))
+    assert concatenate_and_filter(regions) == agent_grid(regions)
+    print(f"{args.regions} regions, {args.agents} agents per region:")
+    for name, function in {"concatenate and filter": concatenate_and_filter, "agent grid": agent_grid}.items():
+        print(f"  {name:<24} {measure(function, regions, args.repeat) * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Measures the size of `drive` response bodies and the time taken to decode and parse them
+into a `DriveResponse` with the JSON, orjson and binary serializers.
+
+    python benchmarks/wire_format.py --agents 100 1000 --repeat 20
+"""
+import random
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from invertedai.api.drive import _parse_drive_response
+from invertedai.utils import BinarySerializer, get_serializer
+from parse_response import make_drive_response
+
+
+def measure(serializer, body: bytes, repeat: int, **parse_options) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _parse_drive_response(serializer.loads(body), validate=False, **parse_options)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, nargs="+", default=[100, 1000], help="Numbers of agents to measure.")
+    parser.add_argument("--repeat", type=int, default=20, help="Number of parses per measurement.")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    serializers = {"json": get_serializer("json"), "binary": BinarySerializer()}
+    try:
+        serializers["orjson"] = get_serializer("orjson")
+    except ImportError:
+        pass
+    for num_agents in args.agents:
+        response = make_drive_response(num_agents, rng)
+        # A server answering binary requests sends the states as buffers
+        binary_response = {
+            key: np.array(value) if key in ("agent_states", "recurrent_states") else value
+            for key, value in response.items()
+        }
+        print(f"{num_agents} agents:")
+        for name, serializer in serializers.items():
+            body = serializer.dumps(binary_response if name == "binary" else response)
+            seconds = measure(serializer, body, args.repeat)
+            batch_seconds = measure(serializer, body, args.repeat, agent_state_batch=True, recurrent_state_batch=True)
+            print(f"  {name:<8} {len(body) / 1000:9.1f} kB {seconds * 1000:8.2f} ms {batch_seconds * 1000:8.2f} ms with batches")
+
+
+if __name__ == "__main__":
+    main()
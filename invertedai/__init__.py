@@ -6,7 +6,7 @@ __version__ = importlib.metadata.version("invertedai")
 from invertedai.api.light import light
 from invertedai.api.location import location_info
 from invertedai.api.initialize import initialize, async_initialize
-from invertedai.api.drive import drive, async_drive
+from invertedai.api.drive import drive, async_drive, drive_batch, async_drive_batch, drive_stream, DriveRequest
 from invertedai.api.blame import blame, async_blame
 from invertedai.cosimulation import BasicCosimulation
 from invertedai.utils import Jupyter_Render, IAILogger, Session
@@ -17,6 +17,7 @@ from invertedai.large.initialize import (
     large_initialize
 )
 from invertedai.large.drive import large_drive
+from invertedai.large.drivable_area import DrivableAreaIndex
 from invertedai.logs.logger import LogWriter, LogReader
 from invertedai.logs.debug_logger import DebugLogger
 
@@ -39,13 +40,53 @@ log_console = strtobool(os.environ.get("IAI_LOG_CONSOLE", "true"))
 log_file = strtobool(os.environ.get("IAI_LOG_FILE", "false"))
 api_key = os.environ.get("IAI_API_KEY", "")
 debug_logger_path = os.environ.get("IAI_LOGGER_PATH", None)
+async_transport = os.environ.get("IAI_ASYNC_TRANSPORT", "asyncio")
+pool_connections = int(os.environ.get("IAI_POOL_CONNECTIONS", 10))
+pool_maxsize = int(os.environ.get("IAI_POOL_MAXSIZE", 10))
+pool_block = strtobool(os.environ.get("IAI_POOL_BLOCK", "false"))
+max_in_flight = int(os.environ.get("IAI_MAX_IN_FLIGHT", 0)) or None
+request_compression = os.environ.get("IAI_REQUEST_COMPRESSION") or None
+compression_threshold = int(os.environ.get("IAI_COMPRESSION_THRESHOLD", 1024))
+serializer = os.environ.get("IAI_SERIALIZER", "auto")
+retry_budget = float(os.environ.get("IAI_RETRY_BUDGET", 0)) or None
+rate_limit = float(os.environ.get("IAI_RATE_LIMIT", 0)) or None
+adaptive_rate_limit = strtobool(os.environ.get("IAI_ADAPTIVE_RATE_LIMIT", "true"))
+hedging = strtobool(os.environ.get("IAI_HEDGING", "false"))
+hedge_percentile = float(os.environ.get("IAI_HEDGE_PERCENTILE", 95))
+lazy_key_verification = strtobool(os.environ.get("IAI_LAZY_KEY_VERIFICATION", "false"))
+key_cache_ttl = float(os.environ.get("IAI_KEY_CACHE_TTL", 24 * 60 * 60))
+validate_responses = strtobool(os.environ.get("IAI_VALIDATE_RESPONSES", "true"))
+validation = os.environ.get("IAI_VALIDATION", "full")
+state_encoding = os.environ.get("IAI_STATE_ENCODING", "json")
+location_cache_size = int(float(os.environ.get("IAI_LOCATION_CACHE_SIZE", 256)) * 2 ** 20)
 
 debug_logger = None
 if debug_logger_path is not None:
     debug_logger = DebugLogger(debug_logger_path)
 logger = IAILogger(level=log_level, consoel=bool(log_console), log_file=bool(log_file))
 
-session = Session(debug_logger)
+session = Session(
+    debug_logger,
+    async_transport=async_transport,
+    pool_connections=pool_connections,
+    pool_maxsize=pool_maxsize,
+    pool_block=pool_block,
+    max_in_flight=max_in_flight,
+    request_compression=request_compression,
+    compression_threshold=compression_threshold,
+    serializer=serializer,
+    retry_budget=retry_budget,
+    rate_limit=rate_limit,
+    adaptive_rate_limit=adaptive_rate_limit,
+    hedging=hedging,
+    hedge_percentile=hedge_percentile,
+    lazy_key_verification=lazy_key_verification,
+    key_cache_ttl=key_cache_ttl,
+    validate_responses=validate_responses,
+    validation=validation,
+    state_encoding=state_encoding,
+    location_cache_size=location_cache_size,
+)
 if api_key:
     session.add_apikey(api_key)
 add_apikey = session.add_apikey
@@ -58,6 +99,7 @@ model_resources = {
     "initialize": ("post", "/initialize"),
     "blame": ("post", "/blame"),
     "drive": ("post", "/drive"),
+    "drive_batch": ("post", "/drive_batch"),
     "location_info": ("get", "/location_info"),
     "light": ("get", "/light"),
     "test": ("get", "/test"),
@@ -71,10 +113,14 @@ __all__ = [
     "use_mock_api",
     "blame",
     "drive",
+    "drive_batch",
+    "drive_stream",
+    "DriveRequest",
     "initialize",
     "location_info",
     "light",
     "async_initialize",
     "async_drive",
+    "async_drive_batch",
     "async_blame",
 ]
\ No newline at end of file
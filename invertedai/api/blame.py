@@ -3,6 +3,7 @@ from typing import List, Optional, Tuple, Dict
 from pydantic import BaseModel, validate_call
 
 import invertedai as iai
+from invertedai.utils import Session
 from invertedai.api.config import TIMEOUT, should_use_mock_api
 from invertedai.api.mock import (
     get_mock_birdview,
@@ -41,7 +42,15 @@ def convert_prop_to_attr(agent_properties):
 
     return agent_attributes
 
-@validate_call
+def _parse_blame_response(response: dict) -> BlameResponse:
+    return BlameResponse(
+        agents_at_fault=response["agents_at_fault"],
+        reasons=response["reasons"],
+        confidence_score=response["confidence_score"],
+        birdviews=[Image.fromval(birdview) for birdview in response["birdviews"]]
+    )
+
+@validate_call(config=dict(arbitrary_types_allowed=True))
 def blame(
     location: str,
     colliding_agents: Tuple[int, int],
@@ -50,7 +59,8 @@ def blame(
     traffic_light_state_history: Optional[List[TrafficLightStatesDict]] = None,
     get_reasons: bool = False,
     get_confidence_score: bool = False,
-    get_birdviews: bool = False
+    get_birdviews: bool = False,
+    session: Optional[Session] = None
 ) -> BlameResponse:
     """
     Parameters
@@ -94,6 +104,9 @@ def blame(
         Whether to return the image visualizing the collision case. This is very slow and 
         should only be used for debugging.
 
+    session:
+        Session used to call the API. If None is passed which is by default, the global :attr:`iai.session` is used.
+
     See Also
     --------
     :func:`drive`
@@ -119,6 +132,8 @@ def blame(
         )
         return response
 
+    if session is None:
+        session = iai.session
     model_inputs = dict(
         location=location,
         colliding_agents=colliding_agents,
@@ -134,13 +149,10 @@ def blame(
 
     while True:
         try:
-            response = iai.session.request(model="blame", data=model_inputs)
-
-            response = BlameResponse(
-                agents_at_fault=response["agents_at_fault"],
-                reasons=response["reasons"],
-                confidence_score=response["confidence_score"],
-                birdviews=[Image.fromval(birdview) for birdview in response["birdviews"]]
+            response = session.request(
+                model="blame", 
+                data=model_inputs, 
+                response_parser=_parse_blame_response
             )
 
             return response
@@ -152,7 +164,7 @@ def blame(
                 raise e
 
 
-@validate_call
+@validate_call(config=dict(arbitrary_types_allowed=True))
 async def async_blame(
     location: str,
     colliding_agents: Tuple[int, int],
@@ -161,13 +173,16 @@ async def async_blame(
     traffic_light_state_history: Optional[List[TrafficLightStatesDict]] = None,
     get_reasons: bool = False,
     get_confidence_score: bool = False,
-    get_birdviews: bool = False
+    get_birdviews: bool = False,
+    session: Optional[Session] = None
 ) -> BlameResponse:
     """
     A light async version of :func:`blame`
     """
     agent_attributes = convert_prop_to_attr(agent_properties)
 
+    if session is None:
+        session = iai.session
     model_inputs = dict(
         location=location,
         colliding_agents=colliding_agents,
@@ -179,13 +194,10 @@ async def async_blame(
         get_birdviews=get_birdviews
     )
 
-    response = await iai.session.async_request(model="blame", data=model_inputs)
-
-    response = BlameResponse(
-        agents_at_fault=response["agents_at_fault"],
-        reasons=response["reasons"],
-        confidence_score=response["confidence_score"],
-        birdviews=[Image.fromval(birdview) for birdview in response["birdviews"]]
+    response = await session.async_request(
+        model="blame", 
+        data=model_inputs, 
+        response_parser=_parse_blame_response
     )
 
     return response
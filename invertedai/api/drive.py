@@ -1,12 +1,17 @@
 import time
 import asyncio
 import warnings
-from typing import List, Optional, Tuple
+import concurrent.futures
+import numpy as np
+from typing import Callable, Coroutine, Iterator, List, Optional, Tuple, Union
 from pydantic import BaseModel, validate_call
 
 import invertedai as iai
+from invertedai.utils import Session
+from invertedai.validation import validate_api_call
 from invertedai.api.config import TIMEOUT, should_use_mock_api
-from invertedai.error import APIConnectionError, InvalidInput
+from invertedai.encoding import encode_array, decode_array, is_encoded
+from invertedai.error import APIConnectionError, InvalidInput, InvalidRequestError, InvertedAIError, ResourceNotFoundError
 from invertedai.api.mock import (
     mock_update_agent_state,
     get_mock_birdview,
@@ -15,24 +20,33 @@ from invertedai.api.mock import (
 )
 from invertedai.common import (
     AgentState,
+    AgentStateBatch,
+    AgentStates,
     RecurrentState,
+    RecurrentStateBatch,
+    RecurrentStates,
     Image,
     InfractionIndicators,
     AgentAttributes,
     AgentProperties,
+    AgentPropertiesHandle,
     TrafficLightStatesDict,
     LightRecurrentStates,
     LightRecurrentState,
+    _construct,
+    _parse_traffic_lights_states,
 )
 
+DRIVE_BATCH_SIZE = 16
+
 
 class DriveResponse(BaseModel):
     """
     Response returned from an API call to :func:`iai.drive`.
     """
 
-    agent_states: List[AgentState] #: Predicted states for all agents at the next time step.
-    recurrent_states: List[RecurrentState] #: To pass to :func:`iai.drive` at the subsequent time step.
+    agent_states: AgentStates #: Predicted states for all agents at the next time step, as an :class:`AgentStateBatch` if the given states were one.
+    recurrent_states: RecurrentStates #: To pass to :func:`iai.drive` at the subsequent time step, as a :class:`RecurrentStateBatch` if the given states were one.
     birdview: Optional[Image] #: If `get_birdview` was set, this contains the resulting image.
     infractions: Optional[List[InfractionIndicators]]  #: If `get_infractions` was set, they are returned here.
     is_inside_supported_area: List[bool] #: For each agent, indicates whether the predicted state is inside supported area.
@@ -41,13 +55,262 @@ class DriveResponse(BaseModel):
     api_model_version: str # Model version used for this API call
 
 
-@validate_call
+# Optional capabilities of the server, see Session.server_supports, and the fields using them
+STORED_PROPERTIES = "stored_properties"
+STATE_ENCODING = "state_encoding"
+CAPABILITY_FIELDS = {STORED_PROPERTIES: "agent_properties_handle", STATE_ENCODING: "state_encoding"}
+
+
+def _get_agent_properties_inputs(
+    agent_properties: Optional[Union[List[AgentProperties], AgentPropertiesHandle]],
+    session: Optional[Session]
+) -> dict:
+    if not isinstance(agent_properties, AgentPropertiesHandle):
+        return dict(agent_properties=[ap.serialize() for ap in agent_properties] if agent_properties is not None else None)
+    if session is None or session.server_supports(STORED_PROPERTIES) is False:
+        return dict(agent_properties=agent_properties.serialized)
+    if agent_properties.is_stored(session):
+        return dict(agent_properties=None, agent_properties_handle=agent_properties.key)
+    return dict(agent_properties=agent_properties.serialized, agent_properties_handle=agent_properties.key)
+
+
+def _get_state_inputs(
+    agent_states: AgentStates,
+    recurrent_states: Optional[RecurrentStates],
+    session: Optional[Session]
+) -> dict:
+    if recurrent_states is not None and not isinstance(recurrent_states, RecurrentStateBatch):
+        recurrent_states = [r.packed for r in (recurrent_states if isinstance(recurrent_states, list) else recurrent_states.tolist())]
+    inputs = dict(
+        agent_states=agent_states.array if isinstance(agent_states, AgentStateBatch) else [state.tolist() for state in agent_states],
+        recurrent_states=recurrent_states.array if isinstance(recurrent_states, RecurrentStateBatch) else recurrent_states
+    )
+    if session is None or session.state_encoding != "binary" or session.server_supports(STATE_ENCODING) is False:
+        return inputs
+    return dict(
+        agent_states=encode_array(inputs["agent_states"], getattr(agent_states, "_wire_reference", None)),
+        recurrent_states=encode_array(inputs["recurrent_states"], getattr(recurrent_states, "_wire_reference", None))
+        if recurrent_states is not None else None,
+        state_encoding="binary"
+    )
+
+
+def _resend_in_full(
+    agent_states: AgentStates,
+    recurrent_states: Optional[RecurrentStates],
+    agent_properties: Optional[Union[List[AgentProperties], AgentPropertiesHandle]],
+    model_inputs: dict,
+    session: Session
+) -> bool:
+    """
+    If the request referenced agent properties or states stored by the server, which it no
+    longer has, change it to send them in full and return True.
+    """
+    resend = False
+    if model_inputs.get("agent_properties_handle") is not None and model_inputs["agent_properties"] is None:
+        agent_properties.forget(session)
+        model_inputs.update(_get_agent_properties_inputs(agent_properties, session))
+        resend = True
+    if any(is_encoded(model_inputs[name]) and model_inputs[name].get("reference") is not None
+           for name in ("agent_states", "recurrent_states")):
+        for states in (agent_states, recurrent_states):
+            if isinstance(states, (AgentStateBatch, RecurrentStateBatch)):
+                states._wire_reference = None
+        model_inputs.update(_get_state_inputs(agent_states, recurrent_states, session))
+        resend = True
+    return resend
+
+
+def _get_capabilities(model_inputs: dict) -> List[str]:
+    """
+    Optional capabilities of the server used by a request body.
+    """
+    return [capability for capability, field in CAPABILITY_FIELDS.items() if model_inputs.get(field) is not None]
+
+
+def _rejected_capability(
+    e: InvalidRequestError,
+    untried: List[str]
+) -> Optional[str]:
+    """
+    The capability among `untried` whose field is named by the error, removed from `untried`, or
+    None if the request was rejected for something else and should not be sent again.
+    """
+    for capability in untried:
+        if CAPABILITY_FIELDS[capability] in str(e):
+            untried.remove(capability)
+            return capability
+    return None
+
+
+def _without_capability(
+    capability: str,
+    agent_states: AgentStates,
+    recurrent_states: Optional[RecurrentStates],
+    agent_properties: Optional[Union[List[AgentProperties], AgentPropertiesHandle]],
+    model_inputs: dict
+) -> dict:
+    """
+    Copy of a request body changed not to use the given capability, sending the agent properties
+    of an :class:`AgentPropertiesHandle` or lists of states instead.
+    """
+    model_inputs = dict(model_inputs)
+    del model_inputs[CAPABILITY_FIELDS[capability]]
+    if capability == STORED_PROPERTIES:
+        model_inputs.update(_get_agent_properties_inputs(agent_properties, None))
+    else:
+        model_inputs.update(_get_state_inputs(agent_states, recurrent_states, None))
+    return model_inputs
+
+
+def _drive_response_parser(
+    agent_states: AgentStates,
+    recurrent_states: Optional[RecurrentStates],
+    agent_properties: Optional[Union[List[AgentProperties], AgentPropertiesHandle]],
+    model_inputs: dict,
+    session: Session,
+    fallback: Optional[str] = None
+) -> Callable[[dict], "DriveResponse"]:
+    """
+    Parser of the response to `model_inputs`, which was sent without the capability `fallback`
+    after the request using it was rejected. The server is then known not to support it.
+    """
+    def _parse(response: dict) -> "DriveResponse":
+        if fallback is not None:
+            session.record_server_support(fallback, False)
+        if model_inputs.get("agent_properties_handle") is not None:
+            if response.get("agent_properties_handle") == agent_properties.key:
+                agent_properties.mark_stored(session)
+            else:
+                session.record_server_support(STORED_PROPERTIES, False)
+        return _parse_drive_response(
+            response,
+            agent_state_batch=isinstance(agent_states, AgentStateBatch),
+            recurrent_state_batch=isinstance(recurrent_states, RecurrentStateBatch),
+            validate=session.validate_responses,
+            state_references=dict(
+                agent_states=getattr(agent_states, "_wire_reference", None),
+                recurrent_states=getattr(recurrent_states, "_wire_reference", None)
+            )
+        )
+    return _parse
+
+
+def _get_drive_model_inputs(
+    location: str,
+    agent_states: AgentStates,
+    agent_attributes: Optional[List[AgentAttributes]],
+    agent_properties: Optional[Union[List[AgentProperties], AgentPropertiesHandle]],
+    recurrent_states: Optional[RecurrentStates],
+    traffic_lights_states: Optional[TrafficLightStatesDict],
+    light_recurrent_states: Optional[LightRecurrentStates],
+    get_birdview: bool,
+    rendering_center: Optional[Tuple[float, float]],
+    rendering_fov: Optional[float],
+    get_infractions: bool,
+    random_seed: Optional[int],
+    api_model_version: Optional[str],
+    session: Optional[Session] = None
+) -> dict:
+    """
+    Request body of a call to :func:`drive`. Agent properties of an :class:`AgentPropertiesHandle`
+    are only referenced if the server of `session` stored them, and always sent without a session,
+    as are states in lists of floats.
+    """
+    return dict(
+        location=location,
+        agent_attributes=[state.tolist() for state in agent_attributes] if agent_attributes is not None else None,
+        **_get_agent_properties_inputs(agent_properties, session),
+        **_get_state_inputs(agent_states, recurrent_states, session),
+        traffic_lights_states=traffic_lights_states,
+        light_recurrent_states=[light_recurrent_state.tolist() for light_recurrent_state in light_recurrent_states] 
+        if light_recurrent_states is not None else None,
+        get_birdview=get_birdview,
+        get_infractions=get_infractions,
+        random_seed=random_seed,
+        rendering_center=rendering_center,
+        rendering_fov=rendering_fov,
+        model_version=api_model_version
+    )
+
+
+def _parse_states(
+    response: dict,
+    name: str,
+    batch_type: type,
+    as_batch: bool,
+    reference: Optional[Tuple[str, np.ndarray]] = None
+):
+    states = response[name]
+    if not is_encoded(states):
+        return batch_type.fromlist(states) if as_batch else states
+    # States of the response may be encoded against the stored states sent in the request
+    if reference is not None and states.get("reference") == reference[0]:
+        array = decode_array(states, reference[1])
+    else:
+        array = decode_array(states)
+    if not as_batch:
+        return array.tolist()
+    batch = batch_type(array)
+    if response.get("state_reference") is not None:
+        # The server stored the states, later requests only send the changes to them
+        batch._wire_reference = (response["state_reference"], array.copy())
+    return batch
+
+
+def _parse_drive_response(
+    response: dict,
+    agent_state_batch: bool = False,
+    recurrent_state_batch: bool = False,
+    validate: bool = True,
+    state_references: Optional[dict] = None
+) -> DriveResponse:
+    if state_references is None:
+        state_references = {}
+    agent_states = _parse_states(
+        response, "agent_states", AgentStateBatch, agent_state_batch, state_references.get("agent_states")
+    )
+    recurrent_states = _parse_states(
+        response, "recurrent_states", RecurrentStateBatch, recurrent_state_batch, state_references.get("recurrent_states")
+    )
+    fields = dict(
+        agent_states=agent_states if agent_state_batch else [
+            AgentState.fromlist(state, validate=validate) for state in agent_states
+        ],
+        recurrent_states=recurrent_states if recurrent_state_batch else [
+            RecurrentState.fromval(r, validate=validate) for r in recurrent_states
+        ],
+        birdview=Image.fromval(response["birdview"], validate=validate)
+        if response["birdview"] is not None
+        else None,
+        infractions=[
+            InfractionIndicators.fromlist(infractions, validate=validate)
+            for infractions in response["infraction_indicators"]
+        ]
+        if response["infraction_indicators"]
+        else [],
+        is_inside_supported_area=response["is_inside_supported_area"],
+        api_model_version=response["model_version"],
+        traffic_lights_states=_parse_traffic_lights_states(response["traffic_lights_states"])
+        if response["traffic_lights_states"] is not None 
+        else None,
+        light_recurrent_states=[
+            LightRecurrentState.fromlist(state_arr, validate=validate) 
+            for state_arr in response["light_recurrent_states"]
+        ] 
+        if response["light_recurrent_states"] is not None 
+        else None
+    )
+    return DriveResponse(**fields) if validate else _construct(DriveResponse, fields)
+
+
+@validate_api_call
 def drive(
     location: str,
-    agent_states: List[AgentState],
+    agent_states: AgentStates,
     agent_attributes: Optional[List[AgentAttributes]] = None,
-    agent_properties: Optional[List[AgentProperties]] = None,
-    recurrent_states: Optional[List[RecurrentState]] = None,
+    agent_properties: Optional[Union[List[AgentProperties], AgentPropertiesHandle]] = None,
+    recurrent_states: Optional[RecurrentStates] = None,
     traffic_lights_states: Optional[TrafficLightStatesDict] = None,
     light_recurrent_states: Optional[LightRecurrentStates] = None,
     get_birdview: bool = False,
@@ -55,7 +318,8 @@ def drive(
     rendering_fov: Optional[float] = None,
     get_infractions: bool = False,
     random_seed: Optional[int] = None,
-    api_model_version: Optional[str] = None
+    api_model_version: Optional[str] = None,
+    session: Optional[Session] = None
 ) -> DriveResponse:
     """
     Update the state of all given agents forward one time step. Agents are identified by their list index.
@@ -70,6 +334,8 @@ def drive(
         The state must include x: [float], y: [float] coordinate in meters
         orientation: [float] in radians with 0 pointing along x and pi/2 pointing along y and
         speed: [float] in m/s.
+        The states can be given as an :class:`AgentStateBatch`, in which case the predicted
+        states are returned as an :class:`AgentStateBatch` as well.
 
     agent_attributes:
         Deprecated. Static attributes of all agents.
@@ -85,10 +351,15 @@ def drive(
         currently supports 'car' and 'pedestrian'.
         waypoint: optional [Point], the target waypoint of the agent.
         max_speed: optional [float], the desired maximum speed of the agent in m/s.
+        The properties can be given as an :class:`AgentPropertiesHandle`, which is reused across
+        the calls of a simulation. Once the server has stored the properties of the handle, later
+        calls only send a reference to them instead of the full list.
 
     recurrent_states:
         Recurrent states for all agents, obtained from the previous call to
         :func:`drive` or :func:`initialize`.
+        The states can be given as a :class:`RecurrentStateBatch`, in which case the recurrent
+        states of the next time step are returned as a :class:`RecurrentStateBatch` as well.
 
     get_birdview:
         Whether to return an image visualizing the simulation state.
@@ -125,6 +396,14 @@ def drive(
 
     api_model_version:
         Optionally specify the version of the model. If None is passed which is by default, the best model will be used.
+
+    session:
+        Session used to call the API. If None is passed which is by default, the global :attr:`iai.session` is used.
+
+    validation:
+        Keyword-only. Validation policy of the arguments, "full", "shallow" or "none". If not given,
+        :attr:`Session.validation` of the session is used.
+
     See Also
     --------
     :func:`initialize`
@@ -134,7 +413,8 @@ def drive(
     """
 
     if should_use_mock_api():
-        agent_states = [mock_update_agent_state(s) for s in agent_states]
+        if not isinstance(agent_states, AgentStateBatch):
+            agent_states = [mock_update_agent_state(s) for s in agent_states]
         present_mask = [True for _ in agent_states]
         birdview = get_mock_birdview()
         infractions = get_mock_infractions(len(agent_states))
@@ -153,66 +433,48 @@ def drive(
     if agent_attributes is not None:
         warnings.warn('agent_attributes is deprecated. Please use agent_properties.',category=DeprecationWarning) 
 
-    def _tolist(input_data: List):
-        if not isinstance(input_data, list):
-            return input_data.tolist()
-        else:
-            return input_data
-
-    recurrent_states = _tolist(recurrent_states) if recurrent_states is not None else None
-    model_inputs = dict(
+    if session is None:
+        session = iai.session
+    model_inputs = _get_drive_model_inputs(
         location=location,
-        agent_states=[state.tolist() for state in agent_states],
-        agent_attributes=[state.tolist() for state in agent_attributes] if agent_attributes is not None else None,
-        agent_properties=[ap.serialize() for ap in agent_properties] if agent_properties is not None else None,
-        recurrent_states=[r.packed for r in recurrent_states] if recurrent_states is not None else None,
+        agent_states=agent_states,
+        agent_attributes=agent_attributes,
+        agent_properties=agent_properties,
+        recurrent_states=recurrent_states,
         traffic_lights_states=traffic_lights_states,
-        light_recurrent_states=[light_recurrent_state.tolist() for light_recurrent_state in light_recurrent_states] 
-        if light_recurrent_states is not None else None,
+        light_recurrent_states=light_recurrent_states,
         get_birdview=get_birdview,
-        get_infractions=get_infractions,
-        random_seed=random_seed,
         rendering_center=rendering_center,
         rendering_fov=rendering_fov,
-        model_version=api_model_version
+        get_infractions=get_infractions,
+        random_seed=random_seed,
+        api_model_version=api_model_version,
+        session=session
     )
     start = time.time()
     timeout = TIMEOUT
+    # Capabilities the request may be rejected for, dropped one at a time from the original request
+    request_inputs, fallback, untried = model_inputs, None, _get_capabilities(model_inputs)
 
     while True:
         try:
-            response = iai.session.request(model="drive", data=model_inputs)
-
-            response = DriveResponse(
-                agent_states=[
-                    AgentState.fromlist(state) for state in response["agent_states"]
-                ],
-                recurrent_states=[
-                    RecurrentState.fromval(r) for r in response["recurrent_states"]
-                ],
-                birdview=Image.fromval(response["birdview"])
-                if response["birdview"] is not None
-                else None,
-                infractions=[
-                    InfractionIndicators.fromlist(infractions)
-                    for infractions in response["infraction_indicators"]
-                ]
-                if response["infraction_indicators"]
-                else [],
-                is_inside_supported_area=response["is_inside_supported_area"],
-                api_model_version=response["model_version"],
-                traffic_lights_states=response["traffic_lights_states"]
-                if response["traffic_lights_states"] is not None 
-                else None,
-                light_recurrent_states=[
-                    LightRecurrentState(state=state_arr[0], time_remaining=state_arr[1]) 
-                    for state_arr in response["light_recurrent_states"]
-                ] 
-                if response["light_recurrent_states"] is not None 
-                else None
+            response = session.request(
+                model="drive", 
+                data=request_inputs, 
+                response_parser=_drive_response_parser(
+                    agent_states, recurrent_states, agent_properties, request_inputs, session, fallback
+                )
             )
 
             return response
+        except ResourceNotFoundError:
+            if not _resend_in_full(agent_states, recurrent_states, agent_properties, request_inputs, session):
+                raise
+        except InvalidRequestError as e:
+            fallback = _rejected_capability(e, untried)
+            if fallback is None:
+                raise
+            request_inputs = _without_capability(fallback, agent_states, recurrent_states, agent_properties, model_inputs)
         except APIConnectionError as e:
             iai.logger.warning("Retrying")
             if (
@@ -221,13 +483,13 @@ def drive(
                 raise e
 
 
-@validate_call
+@validate_api_call
 async def async_drive(
     location: str,
-    agent_states: List[AgentState],
+    agent_states: AgentStates,
     agent_attributes: Optional[List[AgentAttributes]]=None,
-    agent_properties: Optional[List[AgentProperties]]=None,
-    recurrent_states: Optional[List[RecurrentState]] = None,
+    agent_properties: Optional[Union[List[AgentProperties], AgentPropertiesHandle]]=None,
+    recurrent_states: Optional[RecurrentStates] = None,
     traffic_lights_states: Optional[TrafficLightStatesDict] = None,
     light_recurrent_states: Optional[LightRecurrentStates] = None,
     get_birdview: bool = False,
@@ -235,64 +497,345 @@ async def async_drive(
     rendering_fov: Optional[float] = None,
     get_infractions: bool = False,
     random_seed: Optional[int] = None,
-    api_model_version: Optional[str] = None
+    api_model_version: Optional[str] = None,
+    session: Optional[Session] = None
 ) -> DriveResponse:
     """
-    A light async version of :func:`drive`
+    A light async version of :func:`drive`.
+    Calls with a fixed `random_seed` are deterministic and may be hedged if the session has `hedging` enabled.
     """
 
-    def _tolist(input_data: List):
-        if not isinstance(input_data, list):
-            return input_data.tolist()
-        else:
-            return input_data
-
-    recurrent_states = _tolist(recurrent_states) if recurrent_states is not None else None
-    model_inputs = dict(
+    if session is None:
+        session = iai.session
+    model_inputs = _get_drive_model_inputs(
         location=location,
-        agent_states=[state.tolist() for state in agent_states],
-        agent_attributes=[state.tolist() for state in agent_attributes] if agent_attributes is not None else None,
-        agent_properties=[ap.serialize() for ap in agent_properties] if agent_properties is not None else None,
-        recurrent_states=[r.packed for r in recurrent_states] if recurrent_states is not None else None,
+        agent_states=agent_states,
+        agent_attributes=agent_attributes,
+        agent_properties=agent_properties,
+        recurrent_states=recurrent_states,
         traffic_lights_states=traffic_lights_states,
-        light_recurrent_states=[light_recurrent_state.tolist() for light_recurrent_state in light_recurrent_states] 
-        if light_recurrent_states is not None else None,
+        light_recurrent_states=light_recurrent_states,
         get_birdview=get_birdview,
-        get_infractions=get_infractions,
-        random_seed=random_seed,
         rendering_center=rendering_center,
         rendering_fov=rendering_fov,
-        model_version=api_model_version
+        get_infractions=get_infractions,
+        random_seed=random_seed,
+        api_model_version=api_model_version,
+        session=session
     )
-    response = await iai.session.async_request(model="drive", data=model_inputs)
+    request_inputs, fallback, untried = model_inputs, None, _get_capabilities(model_inputs)
+    while True:
+        try:
+            return await session.async_request(
+                model="drive", 
+                data=request_inputs, 
+                response_parser=_drive_response_parser(
+                    agent_states, recurrent_states, agent_properties, request_inputs, session, fallback
+                ),
+                hedge=random_seed is not None
+            )
+        except ResourceNotFoundError:
+            if not _resend_in_full(agent_states, recurrent_states, agent_properties, request_inputs, session):
+                raise
+        except InvalidRequestError as e:
+            fallback = _rejected_capability(e, untried)
+            if fallback is None:
+                raise
+            request_inputs = _without_capability(fallback, agent_states, recurrent_states, agent_properties, model_inputs)
 
-    response = DriveResponse(
-        agent_states=[
-            AgentState.fromlist(state) for state in response["agent_states"]
-        ],
-        recurrent_states=[
-            RecurrentState.fromval(r) for r in response["recurrent_states"]
-        ],
-        birdview=Image.fromval(response["birdview"])
-        if response["birdview"] is not None
-        else None,
-        infractions=[
-            InfractionIndicators.fromlist(infractions)
-            for infractions in response["infraction_indicators"]
-        ]
-        if response["infraction_indicators"]
-        else [],
-        is_inside_supported_area=response["is_inside_supported_area"],
-        api_model_version=response["model_version"],
-        traffic_lights_states=response["traffic_lights_states"] 
-        if response["traffic_lights_states"] is not None 
-        else None,
-        light_recurrent_states=[
-            LightRecurrentState(state=state_arr[0], time_remaining=state_arr[1]) 
-            for state_arr in response["light_recurrent_states"]
-        ] 
-        if response["light_recurrent_states"] is not None 
-        else None
+
+class DriveRequest(BaseModel):
+    """
+    Inputs of a single call to :func:`drive`, used to batch independent scenes with :func:`drive_batch`.
+    Please refer to the documentation of :func:`drive` for information on the fields.
+    """
+
+    location: str
+    agent_states: AgentStates
+    agent_attributes: Optional[List[AgentAttributes]] = None
+    agent_properties: Optional[Union[List[AgentProperties], AgentPropertiesHandle]] = None
+    recurrent_states: Optional[RecurrentStates] = None
+    traffic_lights_states: Optional[TrafficLightStatesDict] = None
+    light_recurrent_states: Optional[LightRecurrentStates] = None
+    get_birdview: bool = False
+    rendering_center: Optional[Tuple[float, float]] = None
+    rendering_fov: Optional[float] = None
+    get_infractions: bool = False
+    random_seed: Optional[int] = None
+    api_model_version: Optional[str] = None
+
+
+DRIVE_BATCH = "drive_batch"
+# Statuses of a missing batch endpoint, answered by API gateways with 403 or 405 for unknown routes
+DRIVE_BATCH_UNSUPPORTED_STATUSES = (403, 404, 405)
+
+
+async def _gather_or_cancel(coroutines: List[Coroutine]) -> list:
+    """
+    Like :func:`asyncio.gather`, cancelling the remaining coroutines when one of them fails.
+    """
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        return await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+@validate_call(config=dict(arbitrary_types_allowed=True))
+def drive_batch(
+    drive_requests: List[DriveRequest],
+    max_concurrency: int = 8,
+    batch_size: int = DRIVE_BATCH_SIZE,
+    use_batch_endpoint: Optional[bool] = None,
+    session: Optional[Session] = None
+) -> List[DriveResponse]:
+    """
+    Step many independent scenes forward by one time step, returning one response per request
+    in the same order. Requests are sent `batch_size` at a time to the batch endpoint of the
+    API, with at most `max_concurrency` calls in flight. If the server has no batch endpoint,
+    each request is sent to :func:`drive` instead, still with at most `max_concurrency` calls
+    in flight.
+
+    Parameters
+    ----------
+    drive_requests:
+        Inputs of each scene, as passed to :func:`drive`.
+
+    max_concurrency:
+        Maximum number of calls to the API in flight at once.
+
+    batch_size:
+        Maximum number of scenes sent in a single call to the batch endpoint.
+
+    use_batch_endpoint:
+        Whether to use the batch endpoint. If None is passed which is by default, it is tried
+        first and the fallback to :func:`drive` is remembered for the session if it is missing.
+        The first call of a session to the batch endpoint is not retried if answered with a
+        status of a missing endpoint (403, 404 or 405). A 403 is confirmed with one call to
+        :func:`drive`, which raises an :class:`AuthenticationError` if the API key is rejected.
+
+    session:
+        Please refer to the documentation of :func:`drive` for information on this parameter.
+
+    See Also
+    --------
+    :func:`drive`
+    """
+    if should_use_mock_api():
+        return [drive(**dict(drive_request)) for drive_request in drive_requests]
+    if session is None:
+        session = iai.session
+    return session.run_async(async_drive_batch(
+        drive_requests=drive_requests,
+        max_concurrency=max_concurrency,
+        batch_size=batch_size,
+        use_batch_endpoint=use_batch_endpoint,
+        session=session
+    ))
+
+
+@validate_call(config=dict(arbitrary_types_allowed=True))
+async def async_drive_batch(
+    drive_requests: List[DriveRequest],
+    max_concurrency: int = 8,
+    batch_size: int = DRIVE_BATCH_SIZE,
+    use_batch_endpoint: Optional[bool] = None,
+    session: Optional[Session] = None
+) -> List[DriveResponse]:
+    """
+    The async version of :func:`drive_batch`.
+    """
+    if session is None:
+        session = iai.session
+    if use_batch_endpoint is None:
+        use_batch_endpoint = session.server_supports(DRIVE_BATCH) is not False
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _drive(drive_request: DriveRequest) -> DriveResponse:
+        async with semaphore:
+            return await async_drive(**dict(drive_request), session=session, validation="none")
+
+    async def _drive_chunk(chunk: List[DriveRequest], retry: bool = True) -> List[DriveResponse]:
+        model_inputs = dict(requests=[_get_drive_model_inputs(**dict(drive_request)) for drive_request in chunk])
+        async with semaphore:
+            return await session.async_request(
+                model="drive_batch",
+                data=model_inputs,
+                retry=retry,
+                response_parser=lambda response: [
+                    _parse_drive_response(
+                        r,
+                        agent_state_batch=isinstance(drive_request.agent_states, AgentStateBatch),
+                        recurrent_state_batch=isinstance(drive_request.recurrent_states, RecurrentStateBatch),
+                        validate=session.validate_responses
+                    )
+                    for r, drive_request in zip(response["responses"], chunk)
+                ]
+            )
+
+    async def _probe_chunk(chunk: List[DriveRequest]) -> Optional[List[DriveResponse]]:
+        # A missing endpoint may be answered with statuses retried for other endpoints, so the
+        # first call is not retried unless it failed for another reason. None if it is missing.
+        try:
+            responses = await _drive_chunk(chunk, retry=False)
+        except InvertedAIError as e:
+            if e.http_status not in DRIVE_BATCH_UNSUPPORTED_STATUSES:
+                responses = await _drive_chunk(chunk)
+            else:
+                if e.http_status == 403:
+                    # Also the answer to a rejected API key, which raises as /drive is rejected as well
+                    await session.async_request(
+                        model="drive", data=_get_drive_model_inputs(**dict(chunk[0])), retry=False
+                    )
+                iai.logger.info("The server has no batch endpoint, falling back to individual drive calls.")
+                session.record_server_support(DRIVE_BATCH, False)
+                return None
+        session.record_server_support(DRIVE_BATCH, True)
+        return responses
+
+    if use_batch_endpoint and drive_requests:
+        chunks = [drive_requests[i:i + batch_size] for i in range(0, len(drive_requests), batch_size)]
+        probed = [] if session.server_supports(DRIVE_BATCH) else await _probe_chunk(chunks.pop(0))
+        if probed is not None:
+            chunk_responses = await _gather_or_cancel([_drive_chunk(chunk) for chunk in chunks])
+            return probed + [response for responses in chunk_responses for response in responses]
+    return await _gather_or_cancel([_drive(drive_request) for drive_request in drive_requests])
+
+
+@validate_api_call
+def drive_stream(
+    location: str,
+    agent_states: AgentStates,
+    agent_properties: Optional[Union[List[AgentProperties], AgentPropertiesHandle]] = None,
+    recurrent_states: Optional[RecurrentStates] = None,
+    traffic_lights_states: Optional[TrafficLightStatesDict] = None,
+    light_recurrent_states: Optional[LightRecurrentStates] = None,
+    get_birdview: bool = False,
+    rendering_center: Optional[Tuple[float, float]] = None,
+    rendering_fov: Optional[float] = None,
+    get_infractions: bool = False,
+    random_seed: Optional[int] = None,
+    api_model_version: Optional[str] = None,
+    num_steps: Optional[int] = None,
+    update_inputs: Optional[Callable[[DriveResponse], Optional[dict]]] = None,
+    session: Optional[Session] = None
+) -> Iterator[DriveResponse]:
+    """
+    Repeatedly call :func:`drive` on the same scene, yielding the response of every time step.
+    The request of the next time step is sent before the response of the current one is yielded,
+    so work done by the caller on a yielded response (rendering, logging, stepping parts of a
+    local simulation that do not feed back into the scene) overlaps with the next call to the API,
+    and the next response is parsed in the background while that work is done.
+
+    Each request is built from the previous response: its `agent_states`, `recurrent_states` and
+    `light_recurrent_states` are passed on, while all other inputs are kept. Inputs that depend
+    on the response, such as the states of ego agents controlled by a local simulator, can be
+    given by `update_inputs`.
+
+    Parameters
+    ----------
+    location:
+        Please refer to the documentation of :func:`drive` for information on this parameter.
+
+    agent_states:
+        States of all agents at the first time step.
+
+    agent_properties:
+        Please refer to the documentation of :func:`drive` for information on this parameter.
+        A list of properties is wrapped in an :class:`AgentPropertiesHandle`, so that they are
+        only sent in full until the server has stored them.
+
+    recurrent_states:
+        Recurrent states of all agents at the first time step.
+
+    traffic_lights_states:
+        Please refer to the documentation of :func:`drive` for information on this parameter.
+        The given states are passed on every time step unless changed by `update_inputs`.
+
+    light_recurrent_states:
+        Light recurrent states at the first time step.
+
+    get_birdview:
+        Please refer to the documentation of :func:`drive` for information on this parameter.
+
+    rendering_center:
+        Please refer to the documentation of :func:`drive` for information on this parameter.
+
+    rendering_fov:
+        Please refer to the documentation of :func:`drive` for information on this parameter.
+
+    get_infractions:
+        Please refer to the documentation of :func:`drive` for information on this parameter.
+
+    random_seed:
+        Please refer to the documentation of :func:`drive` for information on this parameter.
+
+    api_model_version:
+        Please refer to the documentation of :func:`drive` for information on this parameter.
+
+    num_steps:
+        Number of time steps to simulate. If None is passed which is by default, the stream
+        continues until the caller stops iterating.
+
+    update_inputs:
+        Called with each response before the request of the next time step is sent. It may return
+        a dictionary of :func:`drive` inputs replacing those built from the response, for example
+        `dict(agent_states=...)` with the states of ego agents overridden. Work done here is not
+        overlapped with the API call and should be kept short.
+
+    session:
+        Please refer to the documentation of :func:`drive` for information on this parameter.
+
+    See Also
+    --------
+    :func:`drive`
+    """
+    if session is None:
+        session = iai.session
+    if agent_properties is not None and not isinstance(agent_properties, AgentPropertiesHandle):
+        agent_properties = AgentPropertiesHandle(agent_properties)
+    drive_request = DriveRequest(
+        location=location,
+        agent_states=agent_states,
+        agent_properties=agent_properties,
+        recurrent_states=recurrent_states,
+        traffic_lights_states=traffic_lights_states,
+        light_recurrent_states=light_recurrent_states,
+        get_birdview=get_birdview,
+        rendering_center=rendering_center,
+        rendering_fov=rendering_fov,
+        get_infractions=get_infractions,
+        random_seed=random_seed,
+        api_model_version=api_model_version
     )
 
-    return response
+    def _submit(drive_request: DriveRequest) -> concurrent.futures.Future:
+        if should_use_mock_api():
+            future = concurrent.futures.Future()
+            future.set_result(drive(**dict(drive_request), validation="none"))
+            return future
+        return session.submit_async(async_drive(**dict(drive_request), session=session, validation="none"))
+
+    future = _submit(drive_request)
+    step = 0
+    try:
+        while future is not None:
+            response = future.result()
+            future = None
+            step += 1
+            if num_steps is None or step < num_steps:
+                next_inputs = dict(
+                    agent_states=response.agent_states,
+                    recurrent_states=response.recurrent_states,
+                    light_recurrent_states=response.light_recurrent_states
+                )
+                if update_inputs is not None:
+                    next_inputs.update(update_inputs(response) or {})
+                drive_request = DriveRequest(**{**dict(drive_request), **next_inputs})
+                future = _submit(drive_request)
+            yield response
+    finally:
+        # The caller stopped iterating, the request in flight is no longer needed
+        if future is not None:
+            future.cancel()
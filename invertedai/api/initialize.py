@@ -1,10 +1,13 @@
 import time
 import asyncio
 import warnings
+from functools import partial
 from pydantic import BaseModel, validate_call
 from typing import List, Optional, Dict, Tuple
 
 import invertedai as iai
+from invertedai.utils import Session
+from invertedai.validation import validate_api_call
 from invertedai.api.config import TIMEOUT, should_use_mock_api
 from invertedai.error import TryAgain, InvalidInputType, InvalidInput
 from invertedai.api.mock import (
@@ -21,12 +24,16 @@ from invertedai.common import (
     AgentAttributes,
     AgentProperties,
     AgentState,
+    AgentStateBatch,
+    AgentStates,
     Image,
     InfractionIndicators,
     LightRecurrentState,
     LightRecurrentStates,
     RecurrentState,
-    TrafficLightStatesDict
+    TrafficLightStatesDict,
+    _construct,
+    _parse_traffic_lights_states,
 )
 
 
@@ -45,19 +52,57 @@ class InitializeResponse(BaseModel):
     api_model_version: str #: Model version used for this API call
 
 
-@validate_call
+def _parse_initialize_response(response: dict, validate: bool = True) -> InitializeResponse:
+    fields = dict(
+        agent_states=[
+            AgentState.fromlist(state, validate=validate) for state in response["agent_states"]
+        ],
+        agent_attributes=[
+            AgentAttributes.fromlist(attr) for attr in response["agent_attributes"]
+        ] if response["agent_attributes"] is not None else [],
+        agent_properties=[
+            AgentProperties.deserialize(ap, validate=validate) for ap in response["agent_properties"]
+        ],
+        recurrent_states=[
+            RecurrentState.fromval(r, validate=validate) for r in response["recurrent_states"]
+        ],
+        birdview=Image.fromval(response["birdview"], validate=validate)
+        if response["birdview"] is not None
+        else None,
+        infractions=[
+            InfractionIndicators.fromlist(infractions, validate=validate)
+            for infractions in response["infraction_indicators"]
+        ]
+        if response["infraction_indicators"]
+        else [],
+        api_model_version=response["model_version"],
+        traffic_lights_states=_parse_traffic_lights_states(response["traffic_lights_states"])
+        if response["traffic_lights_states"] is not None 
+        else None,
+        light_recurrent_states=[
+            LightRecurrentState.fromlist(state_arr, validate=validate) 
+            for state_arr in response["light_recurrent_states"]
+        ] 
+        if response["light_recurrent_states"] is not None 
+        else None
+    )
+    return InitializeResponse(**fields) if validate else _construct(InitializeResponse, fields)
+
+
+@validate_api_call
 def initialize(
     location: str,
     agent_attributes: Optional[List[AgentAttributes]] = None,
     agent_properties: Optional[List[AgentProperties]] = None,
-    states_history: Optional[List[List[AgentState]]] = None,
+    states_history: Optional[List[AgentStates]] = None,
     traffic_light_state_history: Optional[List[TrafficLightStatesDict]] = None,
     get_birdview: bool = False,
     location_of_interest: Optional[Tuple[float, float]] = None,
     get_infractions: bool = False,
     agent_count: Optional[int] = None,
     random_seed: Optional[int] = None,
-    api_model_version: Optional[str] = None  # Model version used for this API call
+    api_model_version: Optional[str] = None,  # Model version used for this API call
+    session: Optional[Session] = None
 ) -> InitializeResponse:
     """
     Initializes a simulation in a given location, using a combination of **user-defined** and **sampled** agents.
@@ -93,6 +138,7 @@ def initialize(
         in chronological order, i.e., index 0 is the oldest state and index -1 is the current state.
         The order of agents should be the same as in `agent_attributes`.
         For best results, provide at least 10 historical states for each agent.
+        The states of each time step can be given as an :class:`AgentStateBatch`.
 
     traffic_light_state_history:
        History of traffic light states - the list is over time, in chronological order, i.e.
@@ -118,6 +164,12 @@ def initialize(
     api_model_version:
         Optionally specify the version of the model. If None is passed which is by default, the best model will be used.
 
+    session:
+        Session used to call the API. If None is passed which is by default, the global :attr:`iai.session` is used.
+
+    validation:
+        Please refer to the documentation of :func:`drive` for information on this parameter.
+
     See Also
     --------
     :func:`drive`
@@ -138,7 +190,7 @@ def initialize(
         if agent_attributes is None:
             agent_states = [get_mock_agent_state() for _ in range(agent_count)]
         else:
-            agent_states = states_history[-1] if states_history is not None else []
+            agent_states = list(states_history[-1]) if states_history is not None else []
         recurrent_states = [get_mock_recurrent_state() for _ in range(agent_count)]
         birdview = get_mock_birdview()
         infractions = get_mock_infractions(len(agent_states))
@@ -158,12 +210,14 @@ def initialize(
     if agent_attributes is not None:
         warnings.warn('agent_attributes is deprecated. Please use agent_properties.',category=DeprecationWarning)
 
+    if session is None:
+        session = iai.session
     model_inputs = dict(
         location=location,
         num_agents_to_spawn=agent_count,
         states_history=states_history
         if states_history is None
-        else [[st.tolist() for st in states] for states in states_history],
+        else [states.array if isinstance(states, AgentStateBatch) else [st.tolist() for st in states] for states in states_history],
         agent_attributes=agent_attributes
         if agent_attributes is None
         else [state.tolist() for state in agent_attributes],
@@ -180,39 +234,10 @@ def initialize(
     timeout = TIMEOUT
     while True:
         try:
-            response = iai.session.request(model="initialize", data=model_inputs)
-            response = InitializeResponse(
-                agent_states=[
-                    AgentState.fromlist(state) for state in response["agent_states"]
-                ],
-                agent_attributes=[
-                    AgentAttributes.fromlist(attr) for attr in response["agent_attributes"]
-                ] if response["agent_attributes"] is not None else [],
-                agent_properties=[
-                    AgentProperties.deserialize(ap) for ap in response["agent_properties"]
-                ],
-                recurrent_states=[
-                    RecurrentState.fromval(r) for r in response["recurrent_states"]
-                ],
-                birdview=Image.fromval(response["birdview"])
-                if response["birdview"] is not None
-                else None,
-                infractions=[
-                    InfractionIndicators.fromlist(infractions)
-                    for infractions in response["infraction_indicators"]
-                ]
-                if response["infraction_indicators"]
-                else [],
-                api_model_version=response["model_version"],
-                traffic_lights_states=response["traffic_lights_states"] 
-                if response["traffic_lights_states"] is not None 
-                else None,
-                light_recurrent_states=[
-                    LightRecurrentState(state=state_arr[0], time_remaining=state_arr[1]) 
-                    for state_arr in response["light_recurrent_states"]
-                ] 
-                if response["light_recurrent_states"] is not None 
-                else None
+            response = session.request(
+                model="initialize", 
+                data=model_inputs, 
+                response_parser=partial(_parse_initialize_response, validate=session.validate_responses)
             )
             return response
         except TryAgain as e:
@@ -221,30 +246,33 @@ def initialize(
             iai.logger.info(iai.logger.logfmt("Waiting for model to warm up", error=e))
 
 
-@validate_call
+@validate_api_call
 async def async_initialize(
     location: str,
     agent_attributes: Optional[List[AgentAttributes]] = None,
     agent_properties: Optional[List[AgentProperties]] = None,
-    states_history: Optional[List[List[AgentState]]] = None,
+    states_history: Optional[List[AgentStates]] = None,
     traffic_light_state_history: Optional[List[TrafficLightStatesDict]] = None,
     get_birdview: bool = False,
     location_of_interest: Optional[Tuple[float, float]] = None,
     get_infractions: bool = False,
     agent_count: Optional[int] = None,
     random_seed: Optional[int] = None,
-    api_model_version: Optional[str] = None
+    api_model_version: Optional[str] = None,
+    session: Optional[Session] = None
 ) -> InitializeResponse:
     """
     The async version of :func:`initialize`
     """
 
+    if session is None:
+        session = iai.session
     model_inputs = dict(
         location=location,
         num_agents_to_spawn=agent_count,
         states_history=states_history
         if states_history is None
-        else [[st.tolist() for st in states] for states in states_history],
+        else [states.array if isinstance(states, AgentStateBatch) else [st.tolist() for st in states] for states in states_history],
         agent_attributes=agent_attributes
         if agent_attributes is None
         else [state.tolist() for state in agent_attributes],
@@ -258,43 +286,14 @@ async def async_initialize(
         model_version=api_model_version
     )
 
-    response = await iai.session.async_request(model="initialize", data=model_inputs)
-    agents_spawned = len(response["agent_states"])
+    response = await session.async_request(
+        model="initialize", 
+        data=model_inputs, 
+        response_parser=partial(_parse_initialize_response, validate=session.validate_responses)
+    )
+    agents_spawned = len(response.agent_states)
     if agents_spawned != agent_count:
         iai.logger.warning(
             f"Unable to spawn a scenario for {agent_count} agents,  {agents_spawned} spawned instead."
         )
-    response = InitializeResponse(
-        agent_states=[
-            AgentState.fromlist(state) for state in response["agent_states"]
-        ],
-        agent_attributes=[
-            AgentAttributes.fromlist(attr) for attr in response["agent_attributes"]
-        ],
-        agent_properties=[
-                    AgentProperties.deserialize(ap) for ap in response["agent_properties"]
-                ],
-        recurrent_states=[
-            RecurrentState.fromval(r) for r in response["recurrent_states"]
-        ],
-        birdview=Image.fromval(response["birdview"])
-        if response["birdview"] is not None
-        else None,
-        infractions=[
-            InfractionIndicators.fromlist(infractions)
-            for infractions in response["infraction_indicators"]
-        ]
-        if response["infraction_indicators"]
-        else [],
-        api_model_version=response["model_version"],
-        traffic_lights_states=response["traffic_lights_states"]
-        if response["traffic_lights_states"] is not None 
-        else None,
-        light_recurrent_states=[
-            LightRecurrentState(state=state_arr[0], time_remaining=state_arr[1]) 
-            for state_arr in response["light_recurrent_states"]
-            ] 
-        if response["light_recurrent_states"] is not None 
-        else None
-    )
     return response
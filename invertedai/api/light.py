@@ -66,8 +66,11 @@ def light(
     params = {"location": location, "recurrent_states": recurrent_states, "random_seed": random_seed}
     while True:
         try:
-            response = iai.session.request(model="light", params=params)
-            return LightResponse(**response)
+            return iai.session.request(
+                model="light", 
+                params=params, 
+                response_parser=lambda response: LightResponse(**response)
+            )
         except TryAgain as e:
             if timeout is not None and time.time() > start + timeout:
                 raise e
@@ -3,6 +3,7 @@ from pydantic import BaseModel, validate_call
 from typing import Optional, List, Tuple
 
 import invertedai as iai
+from invertedai.utils import Session
 from invertedai.api.config import TIMEOUT, should_use_mock_api
 from invertedai.error import TryAgain
 from invertedai.api.mock import get_mock_birdview
@@ -26,12 +27,32 @@ class LocationResponse(BaseModel):
     static_actors: List[StaticMapActor]  #: Lists traffic lights with their IDs and locations.
 
 
-@validate_call
+def _parse_location_response(response: dict) -> LocationResponse:
+    if response['bounding_polygon'] is not None:
+        response['bounding_polygon'] = [Point(x=x, y=y) for (x, y) in response['bounding_polygon']]
+    if response["static_actors"] is not None:
+        response["static_actors"] = [
+            StaticMapActor.fromdict(actor) for actor in response["static_actors"]
+        ]
+    if response["osm_map"] is not None:
+        response["osm_map"] = LocationMap(
+            encoded_map=response["osm_map"],
+            origin=Origin.fromlist(
+                response["map_origin"]))
+    del response["map_origin"]
+    response["map_center"] = Point.fromlist(response["map_center"])
+    response['birdview_image'] = Image.fromval(response['birdview_image'])
+    return LocationResponse(**response)
+
+
+@validate_call(config=dict(arbitrary_types_allowed=True))
 def location_info(
     location: str,
     include_map_source: bool = False,
     rendering_fov: Optional[int] = None,
     rendering_center: Optional[Tuple[float, float]] = None,
+    session: Optional[Session] = None,
+    use_cache: bool = True,
 ) -> LocationResponse:
     """
     Provides static information about a given location.
@@ -50,6 +71,14 @@ def location_info(
 
     rendering_center:
         Optional center x,y coordinates for the rendered birdview.
+
+    session:
+        Session used to call the API. If None is passed which is by default, the global :attr:`iai.session` is used.
+
+    use_cache:
+        Whether to return a response cached by the session for the same parameters, see
+        :attr:`Session.location_cache_size`. The response of the API is cached in any case.
+
     See Also
     --------
     :func:`drive`
@@ -72,29 +101,33 @@ def location_info(
         )
         return response
 
+    if session is None:
+        session = iai.session
+
     start = time.time()
     timeout = TIMEOUT
 
     params = {"location": location, "include_map_source": include_map_source, "rendering_fov": rendering_fov,
               "rendering_center": ",".join([str(rendering_center[0]), str(rendering_center[1])]) if rendering_center else rendering_center}
+    cache_key = session.location_cache.entry_key(session.base_url, params)
+    if use_cache:
+        cached_response = session.location_cache.get(cache_key)
+        if cached_response is not None:
+            return _parse_location_response(dict(cached_response))
+
+    def _parse_and_cache(response: dict) -> LocationResponse:
+        # Only responses which could be parsed are cached
+        parsed = _parse_location_response(dict(response))
+        session.location_cache.put(cache_key, response)
+        return parsed
+
     while True:
         try:
-            response = iai.session.request(model="location_info", params=params)
-            if response['bounding_polygon'] is not None:
-                response['bounding_polygon'] = [Point(x=x, y=y) for (x, y) in response['bounding_polygon']]
-            if response["static_actors"] is not None:
-                response["static_actors"] = [
-                    StaticMapActor.fromdict(actor) for actor in response["static_actors"]
-                ]
-            if response["osm_map"] is not None:
-                response["osm_map"] = LocationMap(
-                    encoded_map=response["osm_map"],
-                    origin=Origin.fromlist(
-                        response["map_origin"]))
-            del response["map_origin"]
-            response["map_center"] = Point.fromlist(response["map_center"])
-            response['birdview_image'] = Image.fromval(response['birdview_image'])
-            return LocationResponse(**response)
+            return session.request(
+                model="location_info", 
+                params=params, 
+                response_parser=_parse_and_cache
+            )
         except TryAgain as e:
             if timeout is not None and time.time() > start + timeout:
                 raise e
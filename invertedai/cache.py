@@ -0,0 +1,272 @@
+"""
+On-disk caches kept between processes, under the directory given by `IAI_CACHE_DIR`
+(by default `$XDG_CACHE_HOME/invertedai` or `~/.cache/invertedai`).
+Caches are best effort: failing to read or write them never fails an API call.
+"""
+
+import os
+import json
+import time
+import struct
+import base64
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+KEY_CACHE_TTL_SECS = 24 * 60 * 60
+LOCATION_CACHE_TTL_SECS = 7 * 24 * 60 * 60
+LOCATION_CACHE_SIZE = 256 * 2 ** 20
+LOCATION_CACHE_MEMORY_ENTRIES = 16
+
+
+def get_cache_dir() -> str:
+    cache_dir = os.environ.get("IAI_CACHE_DIR")
+    if not cache_dir:
+        cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        cache_dir = os.path.join(cache_home, "invertedai")
+    return cache_dir
+
+
+def _write_atomic(path: str, data: bytes):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class APIKeyCache:
+    """
+    Remembers which base URL an API key was verified against, so that sessions in new
+    processes can skip the verification request. Only a hash of the key is stored.
+    Entries expire after `ttl` seconds.
+    """
+
+    def __init__(
+        self,
+        ttl: float = KEY_CACHE_TTL_SECS,
+        path: Optional[str] = None
+    ):
+        self.ttl = ttl
+        self.path = path if path is not None else os.path.join(get_cache_dir(), "api_keys.json")
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _entry_key(api_token: str, requested_url: str) -> str:
+        return hashlib.sha256(f"{api_token}\n{requested_url}".encode("utf-8")).hexdigest()
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, "rb") as f:
+                entries = json.loads(f.read())
+            return entries if isinstance(entries, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.debug(f"Ignoring unreadable API key cache {self.path}: {e}")
+            return {}
+
+    def get(
+        self,
+        api_token: str,
+        requested_url: str
+    ) -> Optional[str]:
+        """
+        Return the base URL the key was verified against when `requested_url` was requested,
+        or None if it was not verified within the TTL.
+        """
+        if self.ttl <= 0:
+            return None
+        entry = self._load().get(self._entry_key(api_token, requested_url))
+        if not isinstance(entry, dict) or time.time() - entry.get("verified_at", 0) > self.ttl:
+            return None
+        return entry.get("url")
+
+    def put(
+        self,
+        api_token: str,
+        requested_url: str,
+        verified_url: str
+    ):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            now = time.time()
+            entries = {
+                key: entry for key, entry in self._load().items()
+                if isinstance(entry, dict) and now - entry.get("verified_at", 0) <= self.ttl
+            }
+            entries[self._entry_key(api_token, requested_url)] = dict(url=verified_url, verified_at=now)
+            try:
+                _write_atomic(self.path, json.dumps(entries).encode("utf-8"))
+            except OSError as e:
+                logger.debug(f"Unable to write API key cache {self.path}: {e}")
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class LocationInfoCache:
+    """
+    Remembers the responses of :func:`location_info`, which only change with the map version,
+    in memory and on disk. Entries are keyed by a hash of the base URL and the parameters of the
+    call, which include the map version if it is part of the location, and expire after `ttl`
+    seconds so that maps of unversioned locations are eventually updated. The least recently
+    used entries are evicted once the files take more than `max_bytes`, or once more than
+    `memory_entries` responses are kept in memory. A `max_bytes` of 0 disables the cache.
+    Data derived from the responses, such as drivable area indexes, is kept on disk with them.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = LOCATION_CACHE_SIZE,
+        ttl: float = LOCATION_CACHE_TTL_SECS,
+        memory_entries: int = LOCATION_CACHE_MEMORY_ENTRIES,
+        directory: Optional[str] = None
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.directory = directory if directory is not None else os.path.join(get_cache_dir(), "location_info")
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def entry_key(base_url: str, params: dict) -> str:
+        return hashlib.sha256(json.dumps([base_url, params], sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _path(self, key: str, extension: str = ".json") -> str:
+        return os.path.join(self.directory, f"{key}{extension}")
+
+    def _remember(self, key: str, stored_at: float, response: dict):
+        with self._lock:
+            self._memory[key] = (stored_at, response)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Return the cached response of the given key, or None if it is not cached within the TTL.
+        The response must not be modified.
+        """
+        if self.max_bytes <= 0:
+            return None
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+        if entry is None:
+            path = self._path(key)
+            try:
+                with open(path, "rb") as f:
+                    entry = json.loads(f.read())
+                response = entry["response"]
+                response["birdview_image"] = base64.b64decode(response["birdview_image"])
+                entry = (entry["stored_at"], response)
+                # The modification time orders the files from least to most recently used
+                os.utime(path)
+            except FileNotFoundError:
+                return None
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.debug(f"Ignoring unreadable location cache entry {path}: {e}")
+                return None
+            self._remember(key, *entry)
+        stored_at, response = entry
+        if time.time() - stored_at > self.ttl:
+            return None
+        return response
+
+    def put(self, key: str, response: dict):
+        """
+        Cache a response of :func:`location_info`, as decoded from the API.
+        """
+        if self.max_bytes <= 0:
+            return
+        response = dict(response, birdview_image=bytes(response["birdview_image"]))
+        stored_at = time.time()
+        self._remember(key, stored_at, response)
+        stored = dict(response, birdview_image=base64.b64encode(response["birdview_image"]).decode("ascii"))
+        try:
+            _write_atomic(self._path(key), json.dumps(dict(stored_at=stored_at, response=stored)).encode("utf-8"))
+            self._evict()
+        except OSError as e:
+            logger.debug(f"Unable to write location cache entry {self._path(key)}: {e}")
+
+    def get_bytes(self, key: str, extension: str) -> Optional[bytes]:
+        """
+        Return the data cached with :meth:`put_bytes`, or None if it is not cached within the TTL.
+        """
+        if self.max_bytes <= 0:
+            return None
+        path = self._path(key, extension)
+        try:
+            with open(path, "rb") as f:
+                stored_at, = struct.unpack("<d", f.read(8))
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, struct.error) as e:
+            logger.debug(f"Ignoring unreadable location cache entry {path}: {e}")
+            return None
+        if time.time() - stored_at > self.ttl:
+            return None
+        return data
+
+    def put_bytes(self, key: str, extension: str, data: bytes):
+        """
+        Cache data derived from a response of :func:`location_info` in a file with the given
+        extension, expired and evicted like the responses.
+        """
+        if self.max_bytes <= 0:
+            return
+        path = self._path(key, extension)
+        try:
+            _write_atomic(path, struct.pack("<d", time.time()) + data)
+            self._evict()
+        except OSError as e:
+            logger.debug(f"Unable to write location cache entry {path}: {e}")
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.startswith("."):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if not entry.name.startswith("."):
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
@@ -1,11 +1,13 @@
-from typing import List, Optional, Dict, Tuple
+from typing import List, Optional, Dict, Tuple, Union
 from enum import Enum
-from pydantic import BaseModel, model_validator
+from abc import ABC, abstractmethod
+from pydantic import BaseModel, PrivateAttr, field_serializer, field_validator, model_validator
 import math
-from PIL import Image as PImage
 import numpy as np
 import io
 import json
+import hashlib
+import weakref
 
 import invertedai as iai
 from invertedai.error import InvalidInputType, InvalidInput
@@ -13,6 +15,24 @@ from invertedai.error import InvalidInputType, InvalidInput
 RECURRENT_SIZE = 152
 TrafficLightId = int
 
+_object_setattr = object.__setattr__
+
+
+def _construct(cls, fields: dict):
+    """
+    Build a model from trusted field values without validating them, like `cls.model_construct(**fields)`
+    when all fields are given, but without its per-call overhead. Used to parse large responses.
+    """
+    model = cls.__new__(cls)
+    _object_setattr(model, "__dict__", fields)
+    _object_setattr(model, "__pydantic_fields_set__", set(fields))
+    _object_setattr(model, "__pydantic_extra__", None)
+    _object_setattr(model, "__pydantic_private__", {
+        name: private.get_default() for name, private in cls.__private_attributes__.items()
+    } or None)
+    return model
+
+
 class RecurrentState(BaseModel):
     """
     Recurrent state used in :func:`iai.drive`.
@@ -22,7 +42,9 @@ class RecurrentState(BaseModel):
     packed: List[float] = [0.0] * RECURRENT_SIZE
 
     @classmethod
-    def fromval(cls, val):
+    def fromval(cls, val, validate: bool = True):
+        if not validate:
+            return _construct(cls, dict(packed=val))
         return cls(packed=val)
 
 
@@ -37,8 +59,10 @@ class Point(BaseModel):
     y: float
 
     @classmethod
-    def fromlist(cls, l):
+    def fromlist(cls, l, validate: bool = True):
         x, y = l
+        if not validate:
+            return _construct(cls, dict(x=x, y=y))
         return cls(x=x, y=y)
 
     def __sub__(self, other):
@@ -72,35 +96,72 @@ class LocationMap(BaseModel):
             f.write(self.encoded_map)
 
 
+def _to_bytes(value) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, (bytearray, memoryview)):
+        return bytes(value)
+    if isinstance(value, np.ndarray) and value.dtype == np.uint8:
+        return value.tobytes()
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return bytes(value)
+    return value
+
+
 class Image(BaseModel):
     """
     Images sent through the API in their encoded format.
     Decoding the images requires additional dependencies on top of what invertedai uses.
+    The API sends encoded images as lists of ints, which are stored as bytes when parsed.
+    An image is only decoded once, when first accessed.
     """
-    encoded_image: List[int]
+    encoded_image: bytes
+    _decoded: Optional[Tuple[bytes, np.ndarray]] = PrivateAttr(default=None)
 
-    def decode(self):
+    @field_validator("encoded_image", mode="before")
+    @classmethod
+    def _encoded_image_to_bytes(cls, value):
+        return _to_bytes(value)
+
+    @field_serializer("encoded_image")
+    def _serialize_encoded_image(self, encoded_image: bytes) -> List[int]:
+        return list(encoded_image)
+
+    @property
+    def array(self) -> np.ndarray:
         """
-        Decode and return the image.
+        The decoded image, in BGR channel order. It is decoded on first access and the same
+        read-only array is returned afterwards without copying.
         """
-        self.encoded_image = bytes(self.encoded_image)
-        img_stream = io.BytesIO(self.encoded_image)
-        img = PImage.open(img_stream)
-        img_array = np.array(img)
-        img_array = img_array[:, :, ::-1]
-        return img_array
+        decoded = self._decoded
+        if decoded is None or decoded[0] is not self.encoded_image:
+            from PIL import Image as PImage
 
+            img_array = np.array(PImage.open(io.BytesIO(self.encoded_image)))
+            img_array = img_array[:, :, ::-1]
+            img_array.flags.writeable = False
+            decoded = self._decoded = (self.encoded_image, img_array)
+        return decoded[1]
+
+    def decode(self):
+        """
+        Decode and return the image, as a writable copy of :attr:`array`.
+        """
+        return self.array.copy()
 
     @classmethod
-    def fromval(cls, val):
+    def fromval(cls, val, validate: bool = True):
+        if not validate:
+            return _construct(cls, dict(encoded_image=_to_bytes(val)))
         return cls(encoded_image=val)
 
     def decode_and_save(self, path):
         """
         Decode the image and save it to the specified path.
         """
-        image = self.decode()
-        image_pil = PImage.fromarray(image)
+        from PIL import Image as PImage
+
+        image_pil = PImage.fromarray(self.array)
         image_pil.save(path)
 
 
@@ -131,6 +192,16 @@ class LightRecurrentState(BaseModel):
         Convert LightRecurrentState to a list in this order: [state, time_remaining]
         """
         return [self.state, self.time_remaining]
+
+    @classmethod
+    def fromlist(cls, l, validate: bool = True):
+        """
+        Build LightRecurrentState from a list with this order: [state, time_remaining]
+        """
+        state, time_remaining = l
+        if not validate:
+            return _construct(cls, dict(state=state, time_remaining=time_remaining))
+        return cls(state=state, time_remaining=time_remaining)
     
     
 class AgentType(str, Enum):
@@ -230,7 +301,16 @@ class AgentProperties(BaseModel):
     max_speed: Optional[float] = None  #: Maximum speed limit of the agent in m/s.
 
     @classmethod
-    def deserialize(cls, val):
+    def deserialize(cls, val, validate: bool = True):
+        if not validate:
+            return _construct(cls, dict(
+                length=val['length'], 
+                width=val['width'], 
+                rear_axis_offset=val['rear_axis_offset'], 
+                agent_type=val['agent_type'], 
+                waypoint=Point.fromlist(val['waypoint'], validate=False) if val['waypoint'] else None, 
+                max_speed=val['max_speed']
+            ))
         return cls(
             length=val['length'], 
             width=val['width'], 
@@ -254,6 +334,67 @@ class AgentProperties(BaseModel):
         }
     
     
+class AgentPropertiesHandle:
+    """
+    Static agent properties of a simulation, serialized once and identified by a hash of their
+    content. When passed to :func:`iai.drive` in place of the list of properties, the properties
+    are sent along with their hash until the server acknowledges it stored them, after which
+    requests of the same session only reference them by their hash. If the server does not store
+    properties, or later forgets them, the full properties are sent as before.
+
+    Properties modified after the handle is created are not sent, a new handle must be created
+    for them when :meth:`is_current` is False.
+
+    See Also
+    --------
+    AgentProperties
+    """
+
+    def __init__(self, agent_properties: List[AgentProperties]):
+        self.agent_properties = list(agent_properties)
+        self.serialized = [properties.serialize() for properties in self.agent_properties]
+        self.key = hashlib.sha256(json.dumps(self.serialized, sort_keys=True).encode("utf-8")).hexdigest()
+        self._stored_by = weakref.WeakSet()
+
+    def is_current(self, agent_properties: Optional[List[AgentProperties]] = None) -> bool:
+        """
+        Whether the handle holds the current content of the given properties, by default the
+        properties it was created from.
+        """
+        if agent_properties is None:
+            agent_properties = self.agent_properties
+        return [properties.serialize() for properties in agent_properties] == self.serialized
+
+    def is_stored(self, session) -> bool:
+        """
+        Whether the server of the given session acknowledged it stored the properties.
+        """
+        return session in self._stored_by
+
+    def mark_stored(self, session):
+        self._stored_by.add(session)
+
+    def forget(self, session):
+        self._stored_by.discard(session)
+
+    def __len__(self):
+        return len(self.agent_properties)
+
+    def __iter__(self):
+        return iter(self.agent_properties)
+
+    def __getitem__(self, index):
+        return self.agent_properties[index]
+
+    def __repr__(self):
+        return f"AgentPropertiesHandle(key={self.key[:12]}..., agents={len(self)})"
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source_type, handler):
+        from pydantic_core import core_schema
+        return core_schema.is_instance_schema(cls)
+
+
 class AgentState(BaseModel):
     """
     The current or predicted state of a given agent at a given point.
@@ -275,11 +416,13 @@ class AgentState(BaseModel):
         return [self.center.x, self.center.y, self.orientation, self.speed]
 
     @classmethod
-    def fromlist(cls, l):
+    def fromlist(cls, l, validate: bool = True):
         """
         Build AgentState from a list with this order: [x, y, orientation, speed]
         """
         x, y, psi, v = l
+        if not validate:
+            return _construct(cls, dict(center=_construct(Point, dict(x=x, y=y)), orientation=psi, speed=v))
         return cls(
             center=Point(x=x, y=y), 
             orientation=psi, 
@@ -287,6 +430,193 @@ class AgentState(BaseModel):
         )
 
 
+class _ArrayBatch(ABC):
+    """
+    Base of the array-backed batches, which store one row of `_width` floats per agent.
+    Batches of a response that the server stored for binary state encoding keep a copy of the
+    stored array in `_wire_reference`, see :mod:`invertedai.encoding`.
+    """
+
+    __slots__ = ("array", "_wire_reference")
+    _width = None
+
+    def __init__(self, array):
+        array = np.asarray(array)
+        if not np.issubdtype(array.dtype, np.floating):
+            array = array.astype(np.float64)
+        array = np.ascontiguousarray(array)
+        if array.size == 0:
+            array = array.reshape(0, self._width)
+        if array.ndim != 2 or array.shape[1] != self._width:
+            raise InvalidInput(f"{type(self).__name__} must have shape (N, {self._width}), got {array.shape}.")
+        self.array = array
+        self._wire_reference = None
+
+    @abstractmethod
+    def _item(self, row: list):
+        """
+        Build the object of one agent from a row of the array.
+        """
+
+    @staticmethod
+    @abstractmethod
+    def _item_tolist(item) -> list:
+        """
+        Convert the object of one agent to a row of the array.
+        """
+
+    @classmethod
+    def fromlist(cls, l, dtype=np.float64):
+        """
+        Build the batch from a list with one flattened row per agent.
+        """
+        return cls(np.array(l, dtype=dtype).reshape(-1, cls._width))
+
+    def tolist(self):
+        """
+        Convert the batch to a list with one flattened row per agent.
+        """
+        return self.array.tolist()
+
+    def __len__(self):
+        return self.array.shape[0]
+
+    def __iter__(self):
+        return iter([self._item(row) for row in self.array.tolist()])
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return self._item(self.array[index].tolist())
+        return type(self)(self.array[index])
+
+    def __setitem__(self, index, value):
+        if isinstance(value, _ArrayBatch):
+            value = value.array
+        elif isinstance(value, BaseModel):
+            value = self._item_tolist(value)
+        elif isinstance(value, list) and value and isinstance(value[0], BaseModel):
+            value = [self._item_tolist(item) for item in value]
+        self.array[index] = value
+
+    def __add__(self, other):
+        if isinstance(other, list):
+            other = type(self).fromlist([self._item_tolist(item) for item in other], dtype=self.array.dtype)
+        return type(self)(np.concatenate([self.array, other.array]))
+
+    def __eq__(self, other):
+        return type(other) is type(self) and np.array_equal(self.array, other.array)
+
+    # Batches are mutable, like lists
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.array!r})"
+
+    @classmethod
+    def _validate(cls, value):
+        if isinstance(value, cls):
+            return value
+        if isinstance(value, np.ndarray):
+            return cls(value)
+        raise ValueError(f"Expected a {cls.__name__} or an array of shape (N, {cls._width}).")
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source_type, handler):
+        from pydantic_core import core_schema
+        return core_schema.no_info_plain_validator_function(
+            cls._validate,
+            serialization=core_schema.plain_serializer_function_ser_schema(lambda batch: batch.tolist())
+        )
+
+
+class AgentStateBatch(_ArrayBatch):
+    """
+    States of many agents stored column-wise in a single float64 NumPy array of shape (N, 4),
+    with columns in the order of :meth:`AgentState.tolist`: [x, y, orientation, speed].
+    It can be passed wherever a list of :class:`AgentState` is accepted and avoids building
+    a pydantic object per agent, which dominates the cost of large simulations. The array is
+    sent to the API as is: the `orjson` serializer writes it without intermediate Python
+    objects. When given to :func:`iai.drive`, the predicted states are returned as a batch too.
+
+    Indexing with an integer returns an :class:`AgentState`, and indexing with a slice or an
+    array of indices returns a batch viewing or copying the selected rows as NumPy does.
+
+    See Also
+    --------
+    AgentState
+    """
+
+    _width = 4
+
+    def _item(self, row: list) -> AgentState:
+        return AgentState.fromlist(row, validate=False)
+
+    @staticmethod
+    def _item_tolist(item: AgentState) -> list:
+        return item.tolist()
+
+    @classmethod
+    def from_agent_states(cls, agent_states: List[AgentState]):
+        return cls.fromlist([state.tolist() for state in agent_states])
+
+    @classmethod
+    def from_columns(cls, x, y, orientation, speed):
+        return cls(np.stack([x, y, orientation, speed], axis=1))
+
+    def to_agent_states(self) -> List[AgentState]:
+        return [AgentState.fromlist(state, validate=False) for state in self.array.tolist()]
+
+    @property
+    def x(self) -> np.ndarray:
+        return self.array[:, 0]
+
+    @property
+    def y(self) -> np.ndarray:
+        return self.array[:, 1]
+
+    @property
+    def orientation(self) -> np.ndarray:
+        return self.array[:, 2]
+
+    @property
+    def speed(self) -> np.ndarray:
+        return self.array[:, 3]
+
+
+class RecurrentStateBatch(_ArrayBatch):
+    """
+    Recurrent states of many agents stored in a single NumPy array of shape (N, 152), one row
+    per agent holding :attr:`RecurrentState.packed`. It can be passed wherever a list of
+    :class:`RecurrentState` is accepted and skips the pydantic validation of every element,
+    which dominates the cost of parsing and sending recurrent states of large simulations.
+    When given to :func:`iai.drive`, the recurrent states of the next time step are returned
+    as a batch too, so they are passed from step to step without per-agent Python objects.
+
+    The array is float64 by default, which holds the values sent by the server exactly, so the
+    states are sent back bit-exact. A float32 array halves the memory but rounds the values.
+
+    See Also
+    --------
+    RecurrentState
+    """
+
+    _width = RECURRENT_SIZE
+
+    def _item(self, row: list) -> RecurrentState:
+        return RecurrentState.fromval(row, validate=False)
+
+    @staticmethod
+    def _item_tolist(item: RecurrentState) -> list:
+        return item.packed
+
+    @classmethod
+    def from_recurrent_states(cls, recurrent_states: List[RecurrentState], dtype=np.float64):
+        return cls.fromlist([r.packed for r in recurrent_states], dtype=dtype)
+
+    def to_recurrent_states(self) -> List[RecurrentState]:
+        return [RecurrentState.fromval(r, validate=False) for r in self.array.tolist()]
+
+
 class InfractionIndicators(BaseModel):
     """
     Infractions committed by a given agent, as returned from :func:`iai.drive`.
@@ -297,8 +627,10 @@ class InfractionIndicators(BaseModel):
     wrong_way: bool  #: CURRENTLY DISABLED. True if the cross product of the agent's and its lanelet's directions is negative.
 
     @classmethod
-    def fromlist(cls, l):
+    def fromlist(cls, l, validate: bool = True):
         collisions, offroad, wrong_way = l
+        if not validate:
+            return _construct(cls, dict(collisions=collisions, offroad=offroad, wrong_way=wrong_way))
         return cls(
             collisions=collisions, 
             offroad=offroad, 
@@ -339,3 +671,10 @@ class StaticMapActor(BaseModel):
 
 TrafficLightStatesDict = Dict[TrafficLightId, TrafficLightState]
 LightRecurrentStates = List[LightRecurrentState]
+AgentStates = Union[List[AgentState], AgentStateBatch]
+RecurrentStates = Union[List[RecurrentState], RecurrentStateBatch]
+
+
+def _parse_traffic_lights_states(states: dict) -> TrafficLightStatesDict:
+    # JSON object keys are strings
+    return {int(actor_id): TrafficLightState(state) for actor_id, state in states.items()}
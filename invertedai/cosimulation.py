@@ -4,14 +4,20 @@ from copy import deepcopy
 import invertedai as iai
 from invertedai.common import (
     AgentProperties,
+    AgentPropertiesHandle,
     AgentState, 
+    AgentStateBatch,
+    AgentStates,
     RecurrentState,
+    RecurrentStateBatch,
+    RecurrentStates,
     TrafficLightStatesDict
 )
 from invertedai.large.drive import large_drive
 from invertedai.large.initialize import large_initialize, get_regions_default
 from invertedai.api.drive import DriveResponse
 from invertedai.api.initialize import InitializeResponse
+from invertedai.utils import Session
 
 class BasicCosimulation:
     """
@@ -37,29 +43,39 @@ class BasicCosimulation:
         Please refer to the documentation for :func:`large_initialize` for more information on how to format this parameter (treating the
         ego agents as "predefined agents"). Furthermore, any predefined agents for which the user
         wishes the IAI API to control must be defined at the end of this list.
+        If given as an :class:`AgentStateBatch`, the states of all agents are kept and returned as a batch,
+        and their recurrent states are kept in a :class:`RecurrentStateBatch`.
     num_non_ego_conditional_agents: 
         The ego agents are the subset of the conditional agents that are NOT controlled by the Inverted AI API. This
         parameter allows some of the conditional agents with predefined states and properties to nonetheless be 
         controlled by the Inverted AI API. The non-ego conditional agents must be placed at the end of the conditional
         agents list and the ego agents must be placed at the beginning of the conditional agents list.
+    session:
+        Session used for all calls to the API. If None is passed which is by default, the global :attr:`iai.session` is used.
     """
 
     def __init__(
         self,
         location: str,
         conditional_agent_properties: Optional[List[AgentProperties]] = None,
-        conditional_agent_agent_states: Optional[List[AgentState]] = None,
+        conditional_agent_agent_states: Optional[AgentStates] = None,
         num_non_ego_conditional_agents: Optional[int] = 0,
+        session: Optional[Session] = None,
         **kwargs # sufficient arguments to initialize must also be included
     ):
+        self._use_agent_state_batch = isinstance(conditional_agent_agent_states, AgentStateBatch)
+        if self._use_agent_state_batch:
+            conditional_agent_agent_states = conditional_agent_agent_states.to_agent_states()
         self._conditional_agent_properties = conditional_agent_properties
         self._conditional_agent_agent_states = conditional_agent_agent_states
 
         self._location = location
+        self._session = session
         self._response = large_initialize(
             location=self._location,
             agent_properties=self._conditional_agent_properties,
             agent_states=self._conditional_agent_agent_states,
+            session=self._session,
             **kwargs,
         )
         self.init_response = deepcopy(self._response)
@@ -72,8 +88,13 @@ class BasicCosimulation:
         assert self._conditional_agent_count >= 0, "Invalid number of ego and conditional agents."
         
         self._agent_properties = self.init_response.agent_properties
+        self._agent_properties_handle = AgentPropertiesHandle(self._agent_properties)
         self._agent_states = self.init_response.agent_states
+        if self._use_agent_state_batch:
+            self._agent_states = AgentStateBatch.from_agent_states(self._agent_states)
         self._recurrent_states = self.init_response.recurrent_states
+        if self._use_agent_state_batch:
+            self._recurrent_states = RecurrentStateBatch.from_recurrent_states(self._recurrent_states)
         
     @property
     def location(self) -> str:
@@ -90,7 +111,7 @@ class BasicCosimulation:
         return self._total_agent_count
 
     @property
-    def agent_states(self) -> List[AgentState]:
+    def agent_states(self) -> AgentStates:
         """
         The predicted states for all agents, including ego.
         """
@@ -104,7 +125,7 @@ class BasicCosimulation:
         return self._agent_properties
 
     @property
-    def ego_states(self) -> List[AgentState]:
+    def ego_states(self) -> AgentStates:
         """
         Returns the predicted states of ego agents in order.
         The NPC agents are excluded.
@@ -120,7 +141,7 @@ class BasicCosimulation:
         return self._agent_properties[:self._conditional_agent_count]
 
     @property
-    def npc_states(self) -> List[AgentState]:
+    def npc_states(self) -> AgentStates:
         """
         Returns the predicted states of NPCs (non-ego agents) in order.
         The predictions for ego agents are excluded.
@@ -136,7 +157,7 @@ class BasicCosimulation:
         return self._agent_properties[self._conditional_agent_count:]
 
     @property
-    def npc_recurrent_states(self) -> List[RecurrentState]:
+    def npc_recurrent_states(self) -> RecurrentStates:
         """
         Returns the recurrent states of NPCs (non-ego agents) in order.
         The ego agents are excluded.
@@ -159,7 +180,7 @@ class BasicCosimulation:
 
     def step(
         self, 
-        current_conditional_agent_states: List[AgentState],
+        current_conditional_agent_states: AgentStates,
         **kwargs
     ) -> None:
         """
@@ -176,13 +197,17 @@ class BasicCosimulation:
             given ego, conditional agents during initialization.
         """
         self._update_conditional_states(current_conditional_agent_states)
-        
+        if not self._agent_properties_handle.is_current(self._agent_properties):
+            # Properties, such as waypoints of ego agents, were modified since the last step
+            self._agent_properties_handle = AgentPropertiesHandle(self._agent_properties)
+
         self._response = large_drive(
             location=self.location,
-            agent_properties=self._agent_properties,
+            agent_properties=self._agent_properties_handle,
             agent_states=self._agent_states,
             recurrent_states=self._recurrent_states,
             light_recurrent_states=self._light_recurrent_state,
+            session=self._session,
             **kwargs
         )
         self._agent_states = self._response.agent_states
@@ -193,4 +218,6 @@ class BasicCosimulation:
     def _update_conditional_states(self, conditional_agent_states):
         assert len(conditional_agent_states) == self._conditional_agent_count, "Given number of agents in this step must match the number of ego agents in the co-simulation."
 
+        if isinstance(conditional_agent_states, AgentStateBatch) and not self._use_agent_state_batch:
+            conditional_agent_states = conditional_agent_states.to_agent_states()
         self._agent_states[:self._conditional_agent_count] = conditional_agent_states
@@ -0,0 +1,70 @@
+"""
+Compact binary encoding of the agent states and recurrent states exchanged with :func:`drive`,
+used when :attr:`Session.state_encoding` is "binary".
+
+An encoded array is a dictionary holding the little-endian float64 values of the array,
+compressed with zlib and base64 encoded. The server keeps the states of its responses under
+the `state_reference` of the response, and states derived from them are sent as the XOR of
+their bits with the stored states, so the states of agents left unchanged by the client
+compress to almost nothing. The states of a response may likewise be encoded against the
+stored states referenced by its request.
+"""
+
+import zlib
+import base64
+import numpy as np
+from typing import Optional, Tuple
+
+from invertedai.error import InvalidInput
+
+STATE_ENCODINGS = ("json", "binary")
+DTYPE = "<f8"
+
+
+def check_state_encoding(state_encoding: str) -> str:
+    if state_encoding not in STATE_ENCODINGS:
+        raise InvalidInput(f"Invalid state encoding: {state_encoding}, expected one of {', '.join(STATE_ENCODINGS)}.")
+    return state_encoding
+
+
+def encode_array(
+    array: np.ndarray,
+    reference: Optional[Tuple[str, np.ndarray]] = None
+) -> dict:
+    """
+    Encode a float array, as the XOR with the array of `reference`, a pair of the reference
+    name and the referenced array, if given and of the same shape.
+    """
+    array = np.ascontiguousarray(array, dtype=DTYPE)
+    encoded = dict(dtype=DTYPE, shape=list(array.shape))
+    if reference is not None and reference[1].shape == array.shape:
+        encoded["reference"] = reference[0]
+        array = array.view("<u8") ^ np.ascontiguousarray(reference[1], dtype=DTYPE).view("<u8")
+    encoded["data"] = base64.b64encode(zlib.compress(array.tobytes())).decode("ascii")
+    return encoded
+
+
+def decode_array(
+    encoded: dict,
+    reference: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Decode an array encoded by :func:`encode_array`. Arrays encoded with a reference are
+    decoded with the referenced array.
+    """
+    if encoded.get("dtype", DTYPE) != DTYPE:
+        raise InvalidInput(f"Unsupported dtype of encoded array: {encoded['dtype']}.")
+    data = zlib.decompress(base64.b64decode(encoded["data"]))
+    shape = tuple(encoded["shape"])
+    if encoded.get("reference") is None:
+        array = np.frombuffer(data, dtype=DTYPE).copy()
+    else:
+        if reference is None or reference.shape != shape:
+            raise InvalidInput(f"Encoded array needs the array of reference {encoded['reference']}.")
+        array = np.frombuffer(data, dtype="<u8") ^ np.ascontiguousarray(reference, dtype=DTYPE).reshape(-1).view("<u8")
+        array = array.view(DTYPE)
+    return array.reshape(shape)
+
+
+def is_encoded(value) -> bool:
+    return isinstance(value, dict) and "data" in value and "shape" in value
@@ -1,2 +1,3 @@
 from invertedai.large.drive import large_drive
 from invertedai.large.initialize import large_initialize, get_regions_default, get_regions_in_grid, get_number_of_agents_per_region_by_drivable_area
+from invertedai.large.drivable_area import DrivableAreaIndex
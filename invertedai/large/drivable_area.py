@@ -0,0 +1,189 @@
+import io
+import logging
+import numpy as np
+from math import ceil
+from typing import List, Optional, Tuple
+
+import invertedai as iai
+from invertedai.common import Point
+from invertedai.large.common import Region
+from invertedai.utils import Session
+
+logger = logging.getLogger(__name__)
+
+
+class DrivableAreaIndex:
+    """
+    Drivable area of a square part of a location, built once from a single birdview of
+    :func:`location_info`, in which pixels that are not black are drivable. An integral image of
+    the drivable pixels answers the drivable fraction of any axis-aligned region in constant time.
+
+    The birdview is laid out like in :class:`ScenePlotter`, with x increasing to the right and y
+    upwards, or with x mirrored for `left_hand_coordinates`. If not given, the layout is detected
+    from the static actors of the location, which lie on drivable lanes. If the location has no
+    static actors telling the layouts apart, x is assumed not to be mirrored and `layout_known`
+    is False.
+
+    See Also
+    --------
+    :func:`get_number_of_agents_per_region_by_drivable_area`
+    """
+
+    def __init__(
+        self,
+        drivable: np.ndarray,
+        center: Tuple[float, float],
+        fov: float,
+        left_hand_coordinates: bool = False,
+        layout_known: bool = True
+    ):
+        self.drivable = np.asarray(drivable, dtype=bool)
+        self.center = center
+        self.fov = fov
+        self.left_hand_coordinates = left_hand_coordinates
+        self.layout_known = layout_known
+        height, width = self.drivable.shape
+        self._integral = np.zeros((height + 1, width + 1), dtype=np.int64)
+        np.cumsum(np.cumsum(self.drivable, axis=0), axis=1, out=self._integral[1:, 1:])
+
+    @classmethod
+    def from_birdview(
+        cls,
+        birdview: np.ndarray,
+        center: Tuple[float, float],
+        fov: float,
+        static_actor_centers: Optional[List[Point]] = None,
+        left_hand_coordinates: Optional[bool] = None
+    ) -> "DrivableAreaIndex":
+        index = cls(birdview.sum(axis=-1) != 0, center, fov, bool(left_hand_coordinates))
+        if left_hand_coordinates is None:
+            static_actor_centers = static_actor_centers or []
+            mirrored = cls(index.drivable, center, fov, True)
+            num_drivable = index._count_drivable(static_actor_centers)
+            num_mirrored_drivable = mirrored._count_drivable(static_actor_centers)
+            if num_mirrored_drivable > num_drivable:
+                index = mirrored
+            index.layout_known = num_mirrored_drivable != num_drivable
+        return index
+
+    @classmethod
+    def from_location(
+        cls,
+        location: str,
+        center: Tuple[float, float],
+        fov: float,
+        left_hand_coordinates: Optional[bool] = None,
+        session: Optional[Session] = None
+    ) -> "DrivableAreaIndex":
+        """
+        Build the index of the square of side `fov` around `center` from a birdview of the
+        location. Indexes are cached in :attr:`Session.location_cache` with the responses of
+        :func:`location_info`, sharing their expiry and eviction.
+        """
+        if session is None:
+            session = iai.session
+        fov = int(ceil(fov))
+        center = (float(center[0]), float(center[1]))
+        key = session.location_cache.entry_key(
+            session.base_url, dict(location=location, center=list(center), fov=fov, left_hand_coordinates=left_hand_coordinates)
+        )
+        data = session.location_cache.get_bytes(key, ".npz")
+        if data is not None:
+            try:
+                with np.load(io.BytesIO(data)) as cached:
+                    drivable = np.unpackbits(cached["drivable"], count=int(np.prod(cached["shape"]))).reshape(cached["shape"])
+                    return cls(drivable, center, fov, bool(cached["left_hand_coordinates"]), bool(cached["layout_known"]))
+            except (OSError, ValueError, KeyError) as e:
+                logger.debug(f"Ignoring unreadable drivable area cache entry {key}: {e}")
+
+        response = iai.location_info(location=location, rendering_fov=fov, rendering_center=center, session=session)
+        index = cls.from_birdview(
+            response.birdview_image.array, center, fov,
+            static_actor_centers=[actor.center for actor in response.static_actors],
+            left_hand_coordinates=left_hand_coordinates
+        )
+        if session.location_cache_size > 0:
+            stream = io.BytesIO()
+            np.savez_compressed(
+                stream, drivable=np.packbits(index.drivable), shape=np.array(index.drivable.shape),
+                left_hand_coordinates=np.array(index.left_hand_coordinates), layout_known=np.array(index.layout_known)
+            )
+            session.location_cache.put_bytes(key, ".npz", stream.getvalue())
+        return index
+
+    @classmethod
+    def for_regions(
+        cls,
+        location: str,
+        regions: List[Region],
+        left_hand_coordinates: Optional[bool] = None,
+        session: Optional[Session] = None
+    ) -> "DrivableAreaIndex":
+        """
+        Build the index of the smallest square covering all given regions.
+        """
+        min_x = min(region.center.x - region.size / 2 for region in regions)
+        max_x = max(region.center.x + region.size / 2 for region in regions)
+        min_y = min(region.center.y - region.size / 2 for region in regions)
+        max_y = max(region.center.y + region.size / 2 for region in regions)
+        return cls.from_location(
+            location=location,
+            center=((min_x + max_x) / 2, (min_y + max_y) / 2),
+            fov=max(max_x - min_x, max_y - min_y),
+            left_hand_coordinates=left_hand_coordinates,
+            session=session
+        )
+
+    def _pixel_bounds(
+        self,
+        min_x: float,
+        max_x: float,
+        min_y: float,
+        max_y: float
+    ) -> Tuple[float, float, float, float]:
+        # Fractional (first row, last row, first column, last column) of a rectangle
+        height, width = self.drivable.shape
+        left, top = self.center[0] - self.fov / 2, self.center[1] + self.fov / 2
+        if self.left_hand_coordinates:
+            min_x, max_x = 2 * self.center[0] - max_x, 2 * self.center[0] - min_x
+        return (
+            (top - max_y) * height / self.fov, (top - min_y) * height / self.fov,
+            (min_x - left) * width / self.fov, (max_x - left) * width / self.fov
+        )
+
+    def _count_drivable(self, points: List[Point]) -> int:
+        height, width = self.drivable.shape
+        count = 0
+        for point in points:
+            row, _, column, _ = self._pixel_bounds(point.x, point.x, point.y, point.y)
+            if 0 <= row < height and 0 <= column < width:
+                count += int(self.drivable[int(row), int(column)])
+        return count
+
+    def drivable_fraction(
+        self,
+        center: Point,
+        size: float
+    ) -> float:
+        """
+        Fraction of the square of side `size` around `center` that is drivable. Parts of the
+        square outside of the index are not drivable.
+        """
+        height, width = self.drivable.shape
+        first_row, last_row, first_column, last_column = self._pixel_bounds(
+            center.x - size / 2, center.x + size / 2, center.y - size / 2, center.y + size / 2
+        )
+        first_row, last_row, first_column, last_column = (
+            round(bound) for bound in (first_row, last_row, first_column, last_column)
+        )
+        num_pixels = (last_row - first_row) * (last_column - first_column)
+        if num_pixels <= 0:
+            return 0.0
+        first_row, last_row = (min(max(row, 0), height) for row in (first_row, last_row))
+        first_column, last_column = (min(max(column, 0), width) for column in (first_column, last_column))
+        integral = self._integral
+        num_drivable = (
+            integral[last_row, last_column] - integral[first_row, last_column]
+            - integral[last_row, first_column] + integral[first_row, first_column]
+        )
+        return float(num_drivable) / num_pixels
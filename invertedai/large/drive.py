@@ -1,14 +1,16 @@
 import asyncio
 import warnings
+import numpy as np
 from typing import Tuple, Optional, List, Union
 from pydantic import BaseModel, validate_call
 from math import ceil
 
 import invertedai as iai
 from invertedai.large.common import Region
-from invertedai.common import Point, AgentState, AgentAttributes, AgentProperties, RecurrentState, TrafficLightStatesDict, LightRecurrentState
+from invertedai.common import Point, AgentState, AgentStateBatch, AgentStates, AgentAttributes, AgentProperties, AgentPropertiesHandle, RecurrentState, RecurrentStateBatch, RecurrentStates, TrafficLightStatesDict, LightRecurrentState, _construct
 from invertedai.api.drive import DriveResponse
-from invertedai.utils import convert_attributes_to_properties
+from invertedai.utils import Session, convert_attributes_to_properties
+from invertedai.validation import validate_api_call
 from invertedai.error import InvertedAIError, InvalidRequestError
 from ._quadtree import QuadTreeAgentInfo, QuadTree, _flatten_and_sort, QUADTREE_SIZE_BUFFER
 
@@ -19,19 +21,29 @@ async def async_drive_all(async_input_params):
     return all_responses
 
 
-@validate_call
+def _scatter_batches(region_batches, region_agent_ids, num_agents):
+    # Each region's predictions start with the agents inside it, followed by those of its buffer
+    batch_type = type(region_batches[0])
+    array = np.empty((num_agents, region_batches[0].array.shape[1]), dtype=region_batches[0].array.dtype)
+    for batch, agent_ids in zip(region_batches, region_agent_ids):
+        array[agent_ids] = batch.array[:len(agent_ids)]
+    return batch_type(array)
+
+
+@validate_api_call
 def large_drive(
     location: str,
-    agent_states: List[AgentState],
-    agent_properties: List[Union[AgentAttributes,AgentProperties]],
-    recurrent_states: Optional[List[RecurrentState]] = None,
+    agent_states: AgentStates,
+    agent_properties: Union[List[Union[AgentAttributes,AgentProperties]], AgentPropertiesHandle],
+    recurrent_states: Optional[RecurrentStates] = None,
     traffic_lights_states: Optional[TrafficLightStatesDict] = None,
     light_recurrent_states: Optional[List[LightRecurrentState]] = None,
     get_infractions: bool = False,
     random_seed: Optional[int] = None,
     api_model_version: Optional[str] = None,
     single_call_agent_limit: Optional[int] = None,
-    async_api_calls: bool = True
+    async_api_calls: bool = True,
+    session: Optional[Session] = None
 ) -> DriveResponse:
     """
     A utility function to drive more than the normal capacity of agents in a call to :func:`drive`.
@@ -47,12 +59,18 @@ def large_drive(
 
     agent_states:
         Please refer to the documentation of :func:`drive` for information on this parameter.
+        When given as an :class:`AgentStateBatch`, the states sent to and received from each
+        call to :func:`drive` stay in arrays and the predicted states are returned as a batch.
 
     agent_properties:
         Please refer to the documentation of :func:`drive` for information on this parameter.
+        An :class:`AgentPropertiesHandle` is passed on when all agents fit in a single call to
+        :func:`drive`, otherwise the properties of each region are sent in full.
 
     recurrent_states:
         Please refer to the documentation of :func:`drive` for information on this parameter.
+        When given as a :class:`RecurrentStateBatch`, the recurrent states are likewise sliced
+        for each call and returned as a batch.
 
     traffic_lights_states:
        Please refer to the documentation of :func:`drive` for information on this parameter.
@@ -78,12 +96,20 @@ def large_drive(
     async_api_calls:
         A flag to control whether to use asynchronous DRIVE calls.
 
+    session:
+        Please refer to the documentation of :func:`drive` for information on this parameter.
+
+    validation:
+        Please refer to the documentation of :func:`drive` for information on this parameter.
+
     See Also
     --------
     :func:`drive`
     """
 
     # Validate input arguments
+    if session is None:
+        session = iai.session
     if single_call_agent_limit is None:
         single_call_agent_limit = DRIVE_MAXIMUM_NUM_AGENTS
     if single_call_agent_limit > DRIVE_MAXIMUM_NUM_AGENTS:
@@ -96,6 +122,11 @@ def large_drive(
     if not num_agents > 0:
         raise InvalidRequestError(message="Valid call must contain at least 1 agent.")
 
+    agent_properties_handle = None
+    if isinstance(agent_properties, AgentPropertiesHandle):
+        agent_properties_handle = agent_properties
+        agent_properties = agent_properties_handle.agent_properties
+
     # Convert any AgentAttributes to AgentProperties for backwards compatibility 
     agent_properties_new = []
     is_using_attributes = False
@@ -110,6 +141,13 @@ def large_drive(
     if is_using_attributes:
         warnings.warn('agent_attributes is deprecated. Please use agent_properties.',category=DeprecationWarning)
 
+    # The quadtree is built from individual agent states, batches themselves are sliced for each region
+    agent_state_batch = None
+    if isinstance(agent_states, AgentStateBatch):
+        agent_state_batch = agent_states
+        agent_states = agent_state_batch.to_agent_states()
+    recurrent_state_batch = recurrent_states if isinstance(recurrent_states, RecurrentStateBatch) else None
+
     # Generate quadtree
     agent_x = [agent.center.x for agent in agent_states]
     agent_y = [agent.center.y for agent in agent_states]
@@ -125,7 +163,7 @@ def large_drive(
         ),
     )
     for i, (agent, attrs) in enumerate(zip(agent_states,agent_properties)):
-        if recurrent_states is None:
+        if recurrent_states is None or recurrent_state_batch is not None:
             recurr_state = None
         else:
             recurr_state = recurrent_states[i]
@@ -143,6 +181,7 @@ def large_drive(
     all_responses = []
     non_empty_nodes = []
     agent_id_order = []
+    region_agent_ids = []
     
     if len(all_leaf_nodes) > 1:
         for i, leaf_node in enumerate(all_leaf_nodes):
@@ -152,10 +191,20 @@ def large_drive(
             if len(region.agent_states) > 0:
                 non_empty_nodes.append(leaf_node)
                 agent_id_order.extend(region_agents_ids)
+                region_agent_ids.append(region_agents_ids)
+                input_agent_ids = region_agents_ids + [particle.agent_id for particle in leaf_node.particles_buffer]
+                if agent_state_batch is None:
+                    region_agent_states = region.agent_states+region_buffer.agent_states
+                else:
+                    region_agent_states = agent_state_batch[input_agent_ids]
+                if recurrent_state_batch is None:
+                    region_recurrent_states = None if recurrent_states is None else region.recurrent_states+region_buffer.recurrent_states
+                else:
+                    region_recurrent_states = recurrent_state_batch[input_agent_ids]
                 input_params = {
                     "location":location,
-                    "agent_states":region.agent_states+region_buffer.agent_states,
-                    "recurrent_states":None if recurrent_states is None else region.recurrent_states+region_buffer.recurrent_states,
+                    "agent_states":region_agent_states,
+                    "recurrent_states":region_recurrent_states,
                     "agent_properties":region.agent_properties+region_buffer.agent_properties,
                     "light_recurrent_states":light_recurrent_states,
                     "traffic_lights_states":traffic_lights_states,
@@ -164,7 +213,9 @@ def large_drive(
                     "rendering_fov":None,
                     "get_infractions":get_infractions,
                     "random_seed":random_seed,
-                    "api_model_version":api_model_version
+                    "api_model_version":api_model_version,
+                    "session":session,
+                    "validation":"none"
                 }
                 if not async_api_calls:
                     all_responses.append(iai.drive(**input_params))
@@ -172,11 +223,20 @@ def large_drive(
                     async_input_params.append(input_params)
 
         if async_api_calls:
-            all_responses = asyncio.run(async_drive_all(async_input_params))
+            all_responses = session.run_async(async_drive_all(async_input_params))
+
+        if agent_state_batch is None:
+            response_agent_states = _flatten_and_sort([region_response.agent_states[:leaf_node.get_number_of_agents_in_node()] for region_response, leaf_node in zip(all_responses,non_empty_nodes)],agent_id_order)
+        else:
+            response_agent_states = _scatter_batches([region_response.agent_states for region_response in all_responses], region_agent_ids, num_agents)
+        if recurrent_state_batch is None:
+            response_recurrent_states = _flatten_and_sort([region_response.recurrent_states[:leaf_node.get_number_of_agents_in_node()] for region_response, leaf_node in zip(all_responses,non_empty_nodes)],agent_id_order)
+        else:
+            response_recurrent_states = _scatter_batches([region_response.recurrent_states for region_response in all_responses], region_agent_ids, num_agents)
 
-        response = DriveResponse(
-            agent_states = _flatten_and_sort([region_response.agent_states[:leaf_node.get_number_of_agents_in_node()] for region_response, leaf_node in zip(all_responses,non_empty_nodes)],agent_id_order),
-            recurrent_states = _flatten_and_sort([region_response.recurrent_states[:leaf_node.get_number_of_agents_in_node()] for region_response, leaf_node in zip(all_responses,non_empty_nodes)],agent_id_order),
+        response_fields = dict(
+            agent_states = response_agent_states,
+            recurrent_states = response_recurrent_states,
             is_inside_supported_area = _flatten_and_sort([region_response.is_inside_supported_area[:leaf_node.get_number_of_agents_in_node()] for region_response, leaf_node in zip(all_responses,non_empty_nodes)],agent_id_order),
             infractions = [] if not get_infractions else _flatten_and_sort([region_response.infractions[:leaf_node.get_number_of_agents_in_node()] for region_response, leaf_node in zip(all_responses,non_empty_nodes)],agent_id_order),
             api_model_version = all_responses[0].api_model_version,
@@ -184,13 +244,14 @@ def large_drive(
             traffic_lights_states = all_responses[0].traffic_lights_states,
             light_recurrent_states = all_responses[0].light_recurrent_states
         )
+        response = DriveResponse(**response_fields) if session.validate_responses else _construct(DriveResponse, response_fields)
 
     else:
         # Quadtree capacity has not been surpassed therefore can just call regular drive()
         response = iai.drive(
             location = location,
-            agent_states = agent_states,
-            agent_properties = agent_properties,
+            agent_states = agent_states if agent_state_batch is None else agent_state_batch,
+            agent_properties = agent_properties if agent_properties_handle is None else agent_properties_handle,
             recurrent_states = recurrent_states,
             traffic_lights_states = traffic_lights_states,
             light_recurrent_states = light_recurrent_states,
@@ -199,7 +260,9 @@ def large_drive(
             rendering_fov = None,
             get_infractions = get_infractions,
             random_seed = random_seed,
-            api_model_version = api_model_version
+            api_model_version = api_model_version,
+            session = session,
+            validation = "none"
         )
 
     return response
\ No newline at end of file
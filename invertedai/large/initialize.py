@@ -1,18 +1,20 @@
 import time
 import numpy as np
+import concurrent.futures
 
 from random import choices, seed, randint
-from math import sqrt
+from math import sqrt, floor
 from copy import deepcopy
 from pydantic import BaseModel, validate_call
 from typing import Union, List, Optional, Tuple, Dict
 from itertools import product
-from tqdm.contrib import tenumerate
+from collections import defaultdict
 
 import invertedai as iai
 from invertedai.large.common import Region, REGION_MAX_SIZE
+from invertedai.large.drivable_area import DrivableAreaIndex
 from invertedai.api.initialize import InitializeResponse
-from invertedai.utils import get_default_agent_properties
+from invertedai.utils import Session, get_default_agent_properties
 from invertedai.error import InvertedAIError
 from invertedai.common import (
     AgentProperties, 
@@ -24,9 +26,11 @@ from invertedai.common import (
 
 AGENT_SCOPE_FOV_BUFFER = 60
 ATTEMPT_PER_NUM_REGIONS = 15
+BIRDVIEW_CONCURRENCY = 8
+AGENT_GRID_CELL_SIZE = 50.0
 
 
-@validate_call
+@validate_call(config=dict(arbitrary_types_allowed=True))
 def get_regions_default(
     location: str,
     total_num_agents: Optional[int] = None,
@@ -34,7 +38,8 @@ def get_regions_default(
     area_shape: Optional[Tuple[float,float]] = None,
     map_center: Optional[Tuple[float,float]] = (0.0,0.0),
     random_seed: Optional[int] = None, 
-    display_progress_bar: Optional[bool] = False
+    display_progress_bar: Optional[bool] = False,
+    session: Optional[Session] = None
 ) -> List[Region]:
     """
     A utility function to create a set of Regions to be passed into :func:`large_initialize` in
@@ -66,6 +71,9 @@ def get_regions_default(
 
     display_progress_bar:
         A flag to control whether a command line progress bar is displayed for convenience.
+
+    session:
+        Please refer to the documentation of :func:`location_info` for information on this parameter.
     
     """
     
@@ -89,7 +97,8 @@ def get_regions_default(
         regions = regions,
         agent_count_dict = agent_count_dict,
         random_seed = random_seed,
-        display_progress_bar = display_progress_bar
+        display_progress_bar = display_progress_bar,
+        session = session
     )
 
     return new_regions
@@ -154,14 +163,47 @@ def get_regions_in_grid(
     return regions
 
 
-@validate_call
+def _get_region_birdview(
+    location: str,
+    region: Region,
+    session: Optional[Session]
+) -> np.ndarray:
+    return iai.location_info(
+        location=location,
+        rendering_fov=int(region.size),
+        rendering_center=(region.center.x, region.center.y),
+        session=session
+    ).birdview_image.array
+
+
+def _get_drivable_area_ratios(birdviews: List[np.ndarray]) -> List[float]:
+    """
+    Fractions of the pixels of each birdview that are not black, counted at once for all
+    birdviews of the same shape.
+    """
+    ratios = [0.0] * len(birdviews)
+    indexes_by_shape = {}
+    for i, birdview in enumerate(birdviews):
+        indexes_by_shape.setdefault(birdview.shape, []).append(i)
+    for indexes in indexes_by_shape.values():
+        drivable = np.stack([birdviews[i] for i in indexes]).any(axis=-1).mean(axis=(1, 2))
+        for i, ratio in zip(indexes, drivable.tolist()):
+            ratios[i] = ratio
+    return ratios
+
+
+@validate_call(config=dict(arbitrary_types_allowed=True))
 def get_number_of_agents_per_region_by_drivable_area(
     location: str,
     regions: List[Region],
     total_num_agents: Optional[int] = None,
     agent_count_dict: Optional[Dict[AgentType,int]] = None,
     random_seed: Optional[int] = None,
-    display_progress_bar: Optional[bool] = True
+    display_progress_bar: Optional[bool] = True,
+    session: Optional[Session] = None,
+    drivable_area_index: Optional[DrivableAreaIndex] = None,
+    per_region_birdviews: bool = False,
+    max_concurrency: int = BIRDVIEW_CONCURRENCY
 ) -> List[Region]:
     """
     Takes a list of regions, calculates the driveable area for each of them using output from
@@ -190,6 +232,23 @@ def get_number_of_agents_per_region_by_drivable_area(
 
     display_progress_bar:
         A flag to control whether a command line progress bar is displayed for convenience.
+
+    session:
+        Please refer to the documentation of :func:`location_info` for information on this parameter.
+
+    drivable_area_index:
+        The drivable area of the location covering all regions. If this argument is not provided,
+        it is built from a single birdview covering all regions, see :class:`DrivableAreaIndex`.
+        If the layout of that birdview cannot be detected, a birdview of each region is used
+        instead, as with `per_region_birdviews`.
+
+    per_region_birdviews:
+        A flag to render a birdview of each region instead of using a drivable area index, which
+        is exact at the cost of one call to :func:`location_info` per region.
+
+    max_concurrency:
+        The maximum number of birdviews of regions fetched and decoded at once when
+        `per_region_birdviews` is set. The result does not depend on it.
     """
 
     if agent_count_dict is None:
@@ -204,35 +263,38 @@ def get_number_of_agents_per_region_by_drivable_area(
 
     new_regions = [Region.copy(region) for region in regions]
     region_road_area = []
-    total_drivable_area_ratio = 0
 
     if random_seed is not None:
         seed(random_seed)
-    
-    if display_progress_bar:
-        iterable_regions = tenumerate(
-            new_regions, 
-            total=len(new_regions),
-            desc=f"Calculating drivable surface areas"
-        )
-    else:
-        iterable_regions = enumerate(new_regions)
 
-    for i, region in iterable_regions:
-        center_tuple = (region.center.x, region.center.y)
-        birdview = iai.location_info(
-            location=location,
-            rendering_fov=int(region.size),
-            rendering_center=center_tuple
-        ).birdview_image.decode()
-
-        birdview_arr_shape = birdview.shape
-        total_num_pixels = birdview_arr_shape[0]*birdview_arr_shape[1]
-        number_of_black_pix = np.sum(birdview.sum(axis=-1) == 0)
-
-        drivable_area_ratio = (total_num_pixels-number_of_black_pix)/total_num_pixels 
-        total_drivable_area_ratio += drivable_area_ratio
-        region_road_area.append(drivable_area_ratio)
+    if not per_region_birdviews and drivable_area_index is None and new_regions:
+        drivable_area_index = DrivableAreaIndex.for_regions(location, new_regions, session=session)
+        if not drivable_area_index.layout_known:
+            iai.logger.warning(
+                f"Unable to detect whether birdviews of {location} are mirrored, "
+                f"falling back to a birdview of each region. Pass a DrivableAreaIndex with "
+                f"left_hand_coordinates set to avoid it."
+            )
+            per_region_birdviews = True
+
+    if per_region_birdviews:
+        progress_bar = None
+        if display_progress_bar:
+            from tqdm import tqdm
+            progress_bar = tqdm(total=len(new_regions), desc=f"Calculating drivable surface areas")
+        # Birdviews are fetched and decoded concurrently, in chunks to bound the memory they take
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            for start in range(0, len(new_regions), max_concurrency):
+                chunk = new_regions[start:start + max_concurrency]
+                birdviews = list(executor.map(lambda region: _get_region_birdview(location, region, session), chunk))
+                region_road_area.extend(_get_drivable_area_ratios(birdviews))
+                if progress_bar is not None:
+                    progress_bar.update(len(chunk))
+        if progress_bar is not None:
+            progress_bar.close()
+    else:
+        region_road_area = [drivable_area_index.drivable_fraction(region.center, region.size) for region in new_regions]
+    total_drivable_area_ratio = sum(region_road_area)
 
     # Select region in which to assign agents using drivable area as weight
     all_region_weights = [0]*len(new_regions)
@@ -375,24 +437,81 @@ def _consolidate_all_responses(
     return response
 
 
-def _get_all_existing_agents_from_regions(
-    regions: List[Region],
-    exclude_index: Optional[int] = None,
-    nearby_region: Optional[Region] = None,
-):
-    agent_states = []
-    agent_properties = []
+def _inside_fov(center: Point, agent_scope_fov: float, point: Point) -> bool:
+    return ((center.x - (agent_scope_fov / 2) < point.x < center.x + (agent_scope_fov / 2)) and
+            (center.y - (agent_scope_fov / 2) < point.y < center.y + (agent_scope_fov / 2)))
 
-    for ind, region in enumerate(regions):
-        if not ind == exclude_index:
-            if nearby_region is not None:
-                if sqrt((nearby_region.center.x-region.center.x)**2+(nearby_region.center.y-region.center.y)**2) > (REGION_MAX_SIZE + AGENT_SCOPE_FOV_BUFFER):
-                    continue
-            region_agent_states = region.agent_states
-            agent_states = agent_states + region_agent_states
-            agent_properties = agent_properties + [prop for prop in region.agent_properties[:len(region_agent_states)]]
 
-    return agent_states, agent_properties
+class _AgentGrid:
+    """
+    Spatial hash of the agents placed in a list of regions, bucketed by position into square
+    cells, which is updated region by region as regions are initialized.
+    """
+
+    def __init__(
+        self,
+        regions: List[Region],
+        cell_size: float = AGENT_GRID_CELL_SIZE
+    ):
+        self.regions = regions
+        self.cell_size = cell_size
+        self._cells = defaultdict(dict)
+        self._region_cells = {}
+        for region_index in range(len(regions)):
+            self.update(region_index)
+
+    def _cell(self, point: Point) -> Tuple[int, int]:
+        return (floor(point.x / self.cell_size), floor(point.y / self.cell_size))
+
+    def update(self, region_index: int):
+        """
+        Replace the agents of a region with its current agent states.
+        """
+        for cell in self._region_cells.pop(region_index, ()):
+            agents = self._cells[cell]
+            for key in [key for key in agents if key[0] == region_index]:
+                del agents[key]
+            if not agents:
+                del self._cells[cell]
+        region = self.regions[region_index]
+        region_cells = set()
+        for agent_index, (state, properties) in enumerate(zip(region.agent_states or [], region.agent_properties or [])):
+            cell = self._cell(state.center)
+            self._cells[cell][(region_index, agent_index)] = (state, properties)
+            region_cells.add(cell)
+        self._region_cells[region_index] = region_cells
+
+    def get_nearby_agents(
+        self,
+        region_index: int,
+        agent_scope_fov: float
+    ) -> Tuple[List[AgentState], List[AgentProperties]]:
+        """
+        Agents of the other regions within `agent_scope_fov` of a region, in the order of their
+        regions and of the agents within each region. Only regions near enough to the region that
+        their agents may be conditional are considered.
+        """
+        center = self.regions[region_index].center
+        first_column, first_row = self._cell(Point(x=center.x - agent_scope_fov / 2, y=center.y - agent_scope_fov / 2))
+        last_column, last_row = self._cell(Point(x=center.x + agent_scope_fov / 2, y=center.y + agent_scope_fov / 2))
+        nearby_agents = []
+        for cell in product(range(first_column, last_column + 1), range(first_row, last_row + 1)):
+            for key, (state, properties) in self._cells.get(cell, {}).items():
+                if key[0] != region_index and _inside_fov(center=center, agent_scope_fov=agent_scope_fov, point=state.center):
+                    nearby_agents.append((key, state, properties))
+
+        agent_states = []
+        agent_properties = []
+        is_nearby_region = {}
+        for (other_index, _), state, properties in sorted(nearby_agents, key=lambda x: x[0]):
+            if other_index not in is_nearby_region:
+                other_center = self.regions[other_index].center
+                is_nearby_region[other_index] = sqrt((center.x-other_center.x)**2+(center.y-other_center.y)**2) <= (REGION_MAX_SIZE + AGENT_SCOPE_FOV_BUFFER)
+            if is_nearby_region[other_index]:
+                agent_states.append(state)
+                agent_properties.append(properties)
+
+        return agent_states, agent_properties
 
 
 def _initialize_regions(
@@ -403,18 +522,17 @@ def _initialize_regions(
     random_seed: Optional[int] = None,
     api_model_version: Optional[str] = None,
     display_progress_bar: bool = True,
-    return_exact_agents: bool = False
+    return_exact_agents: bool = False,
+    session: Optional[Session] = None
 ) -> Tuple[List[Region],List[InitializeResponse]]:
     
     agent_states_sampled = []
     agent_properties_sampled = []
     agent_rs_sampled = []
+    agent_grid = _AgentGrid(regions)
 
-    def inside_fov(center: Point, agent_scope_fov: float, point: Point) -> bool:
-        return ((center.x - (agent_scope_fov / 2) < point.x < center.x + (agent_scope_fov / 2)) and
-                (center.y - (agent_scope_fov / 2) < point.y < center.y + (agent_scope_fov / 2)))
-    
     if display_progress_bar:
+        from tqdm.contrib import tenumerate
         iterable_regions = tenumerate(
             regions, 
             total=len(regions),
@@ -429,20 +547,11 @@ def _initialize_regions(
         region_center = region.center
         region_size = region.size
 
-        existing_agent_states, existing_agent_properties = _get_all_existing_agents_from_regions(
-            regions = regions,
-            exclude_index = i,
-            nearby_region = region
-        )
-
         # Acquire agents that exist in other regions that must be passed as conditional to avoid collisions
-        out_of_region_conditional_agents = list(filter(
-            lambda x: inside_fov(center=region_center, agent_scope_fov=region_size+AGENT_SCOPE_FOV_BUFFER, point=x[0].center), 
-            zip(existing_agent_states,existing_agent_properties)
-        ))
-
-        out_of_region_conditional_agent_states = [x[0] for x in out_of_region_conditional_agents]
-        out_of_region_conditional_agent_properties = [x[1] for x in out_of_region_conditional_agents]
+        out_of_region_conditional_agent_states, out_of_region_conditional_agent_properties = agent_grid.get_nearby_agents(
+            region_index = i,
+            agent_scope_fov = region_size+AGENT_SCOPE_FOV_BUFFER
+        )
 
         region_conditional_agent_states = [] if region.agent_states is None else region.agent_states
         num_region_conditional_agents = len(region_conditional_agent_states)
@@ -465,7 +574,8 @@ def _initialize_regions(
                         get_infractions=get_infractions,
                         traffic_light_state_history=traffic_light_state_history,
                         location_of_interest=(region_center.x, region_center.y),
-                        random_seed=random_seed
+                        random_seed=random_seed,
+                        session=session
                     )
 
                 except InvertedAIError as e:
@@ -491,7 +601,8 @@ def _initialize_regions(
                             get_infractions=get_infractions,
                             traffic_light_state_history=traffic_light_state_history,
                             location_of_interest=(region_center.x, region_center.y),
-                            random_seed=random_seed
+                            random_seed=random_seed,
+                            session=session
                         )
             
             if response is not None:
@@ -503,7 +614,7 @@ def _initialize_regions(
                     response.recurrent_states[num_out_of_region_conditional_agents:]
                 )):
                     if not return_exact_agents:
-                        if not inside_fov(center=region_center, agent_scope_fov=region_size, point=state.center):
+                        if not _inside_fov(center=region_center, agent_scope_fov=region_size, point=state.center):
                             continue
 
                     regions[i].insert_all_agent_details(state,props,r_state)
@@ -518,6 +629,8 @@ def _initialize_regions(
 
                 if traffic_light_state_history is None and response.traffic_lights_states is not None:
                     traffic_light_state_history = [response.traffic_lights_states]
+
+            agent_grid.update(i)
         else:
             #There are no agents to initialize within this region, proceed to the next region
             continue
@@ -525,7 +638,7 @@ def _initialize_regions(
     return regions, all_responses
 
 
-@validate_call
+@validate_call(config=dict(arbitrary_types_allowed=True))
 def large_initialize(
     location: str,
     regions: List[Region],
@@ -536,7 +649,8 @@ def large_initialize(
     random_seed: Optional[int] = None,
     api_model_version: Optional[str] = None,
     display_progress_bar: bool = True,
-    return_exact_agents: bool = False
+    return_exact_agents: bool = False,
+    session: Optional[Session] = None
 ) -> InitializeResponse:
     """
     A utility function to initialize an area larger than 100x100m. This function takes in a 
@@ -597,6 +711,9 @@ def large_initialize(
         the requested number of agents in any single region. If set to False, a region that 
         fails to return the number of requested agents will be skipped and only its predefined 
         agents (if any) will be returned with respective RecurrentState's. 
+
+    session:
+        Please refer to the documentation of :func:`initialize` for information on this parameter.
     
     See Also
     --------
@@ -622,7 +739,8 @@ def large_initialize(
         random_seed = random_seed,
         api_model_version = api_model_version,
         display_progress_bar = display_progress_bar,
-        return_exact_agents = return_exact_agents
+        return_exact_agents = return_exact_agents,
+        session = session
     )
 
     response = _consolidate_all_responses(
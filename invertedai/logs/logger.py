@@ -1,11 +1,9 @@
 from pydantic import BaseModel, validate_arguments
 from typing import List, Optional, Dict, Tuple
 
-import matplotlib.pyplot as plt
 import json
 
 from invertedai import location_info
-from invertedai.utils import ScenePlotter
 from invertedai.api.location import LocationResponse
 from invertedai.api.initialize import InitializeResponse
 from invertedai.api.drive import DriveResponse
@@ -76,6 +74,8 @@ class LogBase():
         Use the available internal tools to visualize the a specific range of time steps within the log and save it to a given location. If
         an invalid time step range is given, the function will fail. Please refer to ScenePlotter for details on the visualization tool.
         """
+        import matplotlib.pyplot as plt
+        from invertedai.plotting import ScenePlotter
 
         for timestep in timestep_range:
             assert timestep >= 0 or timestep <= (self.simulation_length - 1), "Visualization time range valid."
@@ -0,0 +1,405 @@
+"""
+Retry and backoff accounting shared by all requests of a :class:`invertedai.utils.Session`.
+"""
+
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from typing import Dict, Mapping, Optional
+
+
+class RetryScheduler:
+    """
+    Computes the backoff before retrying a failed request. The backoff grows by
+    `backoff_factor` on every failure and shrinks by the same factor on every success,
+    separately for each endpoint so that throttling on one endpoint does not slow down the
+    others. An optional retry budget bounds the retries of all endpoints together: every
+    retry spends one token and every success earns `retry_budget_refill` tokens, up to
+    `retry_budget`. Once the budget is spent, failed requests are no longer retried, which
+    stops concurrent callers from piling retries onto an overloaded server.
+    All methods are thread-safe.
+    """
+
+    def __init__(
+        self,
+        base_backoff: float = 1,
+        backoff_factor: float = 2,
+        jitter_factor: Optional[float] = 0.5,
+        max_backoff: Optional[float] = None,
+        retry_budget: Optional[float] = None,
+        retry_budget_refill: float = 0.1
+    ):
+        self.base_backoff = base_backoff
+        self.backoff_factor = backoff_factor
+        self.jitter_factor = jitter_factor
+        self.max_backoff = max_backoff
+        self.retry_budget_refill = retry_budget_refill
+        self._lock = threading.Lock()
+        self._current_backoffs: Dict[str, float] = {}
+        self._default_backoff = None
+        self.retries = 0  #: Number of retries scheduled.
+        self.exhausted = 0  #: Number of retries refused because the retry budget was spent.
+        self.retry_budget = retry_budget
+
+    @property
+    def retry_budget(self) -> Optional[float]:
+        """
+        Maximum number of retry tokens, None for unlimited retries.
+        """
+        return self._retry_budget
+
+    @retry_budget.setter
+    def retry_budget(self, value: Optional[float]):
+        with self._lock:
+            self._retry_budget = value
+            self._tokens = value
+
+    @property
+    def tokens(self) -> Optional[float]:
+        """
+        Number of retry tokens left in the budget.
+        """
+        return self._tokens
+
+    def current_backoff(self, key: Optional[str] = None) -> float:
+        """
+        Backoff in seconds before the next retry of the given endpoint, before jitter.
+        Without an endpoint, the largest backoff over all endpoints.
+        """
+        with self._lock:
+            if key is None:
+                return max(self._current_backoffs.values(), default=self._initial_backoff())
+            return self._current_backoffs.get(key, self._initial_backoff())
+
+    def _initial_backoff(self) -> float:
+        return self.base_backoff if self._default_backoff is None else self._default_backoff
+
+    def reset(self, value: Optional[float] = None):
+        """
+        Set the backoff of all endpoints to `value`, or forget it to start over from `base_backoff`.
+        """
+        with self._lock:
+            self._current_backoffs.clear()
+            self._default_backoff = value
+
+    def record_success(self, key: str):
+        """
+        Shrink the backoff of the given endpoint and refill the retry budget.
+        """
+        with self._lock:
+            current = self._current_backoffs.get(key, self._initial_backoff())
+            self._current_backoffs[key] = max(self.base_backoff, current / self.backoff_factor)
+            if self._retry_budget is not None:
+                # Rounded so that fractional refills add up to whole tokens exactly
+                self._tokens = min(self._retry_budget, round(self._tokens + self.retry_budget_refill, 9))
+
+    def next_backoff(self, key: str) -> Optional[float]:
+        """
+        Reserve a retry for the given endpoint and return the time to wait before it in seconds,
+        or None if the retry budget is spent.
+        """
+        with self._lock:
+            if self._retry_budget is not None:
+                if self._tokens < 1:
+                    self.exhausted += 1
+                    return None
+                self._tokens = round(self._tokens - 1, 9)
+            self.retries += 1
+            current = self._current_backoffs.get(key, self._initial_backoff())
+            jitter = random.uniform(-self.jitter_factor, self.jitter_factor) if self.jitter_factor is not None else 0
+            backoff = current * (1 + jitter)
+            current *= self.backoff_factor
+            if self.max_backoff is not None:
+                backoff = min(backoff, self.max_backoff)
+                current = min(current, self.max_backoff)
+            self._current_backoffs[key] = current
+        return backoff
+
+
+class RateLimiter:
+    """
+    Adaptive token bucket pacing the requests of a :class:`invertedai.utils.Session`.
+    Without a configured `rate`, requests are not paced until the server first answers with
+    status 429, at which point the limiter starts at a fraction of the rate it observed.
+    The rate then follows additive-increase/multiplicative-decrease: it grows by `increase`
+    requests per second for every second of successful requests and is multiplied by
+    `decrease_factor` on every 429, at most once per `decrease_interval` seconds.
+    `Retry-After` and `X-RateLimit-Remaining`/`X-RateLimit-Reset` response headers are
+    honoured when present.
+    All methods are thread-safe.
+    """
+
+    def __init__(
+        self,
+        rate: Optional[float] = None,
+        adaptive: bool = True,
+        burst: float = 1,
+        min_rate: float = 0.1,
+        increase: float = 1.0,
+        decrease_factor: float = 0.5,
+        decrease_interval: float = 1.0,
+        window: int = 100
+    ):
+        self.adaptive = adaptive
+        self.burst = burst
+        self.min_rate = min_rate
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.decrease_interval = decrease_interval
+        self._lock = threading.Lock()
+        self._sent = deque(maxlen=window)
+        self._pause_until = 0.0
+        self._last_decrease = float("-inf")
+        self.queued = 0  #: Number of requests currently waiting for the limiter.
+        self.throttled = 0  #: Number of responses with status 429.
+        self.wait_time = 0.0  #: Total time requests spent waiting for the limiter.
+        self.rate = rate
+
+    @property
+    def rate(self) -> Optional[float]:
+        """
+        Current number of requests per second let through, None if requests are not paced.
+        """
+        return self._rate
+
+    @rate.setter
+    def rate(self, value: Optional[float]):
+        with self._lock:
+            self._set_rate(value, time.monotonic())
+
+    def _set_rate(self, value: Optional[float], now: float):
+        self._rate = value
+        self._tokens = 0.0
+        self._updated = now
+
+    def _observed_rate(self, now: float) -> float:
+        if not self._sent:
+            return self.min_rate
+        # Measured over at least one decrease interval so that a single request does not look like a burst
+        return len(self._sent) / max(now - self._sent[0], self.decrease_interval)
+
+    def _reserve(self) -> float:
+        """
+        Take a token and return the time in seconds to wait until it is available.
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._pause_until - now)
+            if self._rate is not None:
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                self._tokens -= 1
+                if self._tokens < 0:
+                    wait = max(wait, -self._tokens / self._rate)
+            self._sent.append(now + wait)
+            if wait > 0:
+                self.queued += 1
+                self.wait_time += wait
+            return wait
+
+    def _release(self):
+        with self._lock:
+            self.queued -= 1
+
+    def acquire(self) -> float:
+        """
+        Block until the next request may be sent and return the time waited.
+        """
+        wait = self._reserve()
+        if wait > 0:
+            try:
+                time.sleep(wait)
+            finally:
+                self._release()
+        return wait
+
+    async def async_acquire(self) -> float:
+        """
+        Wait without blocking the event loop until the next request may be sent and return the time waited.
+        """
+        wait = self._reserve()
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self._release()
+        return wait
+
+    def record_response(self, status_code: int, headers: Mapping[str, str]):
+        """
+        Adapt the rate to the status code and rate limit headers of a response.
+        """
+        with self._lock:
+            now = time.monotonic()
+            retry_after = _parse_seconds(headers.get("Retry-After"))
+            if retry_after is not None:
+                self._pause_until = max(self._pause_until, now + retry_after)
+            remaining = _parse_seconds(headers.get("X-RateLimit-Remaining"))
+            reset = _parse_reset(headers.get("X-RateLimit-Reset"))
+            capped = False
+            if self.adaptive and remaining is not None and reset:
+                allowed = max(self.min_rate, remaining / reset)
+                if self._rate is None or allowed < self._rate:
+                    self._set_rate(allowed, now)
+                    capped = True
+            if status_code == 429:
+                self.throttled += 1
+                if self.adaptive and now - self._last_decrease >= self.decrease_interval:
+                    current = self._rate if self._rate is not None else self._observed_rate(now)
+                    self._set_rate(max(self.min_rate, current * self.decrease_factor), now)
+                    self._last_decrease = now
+            elif self.adaptive and not capped and self._rate is not None and status_code < 400:
+                # Grows by `increase` per second when requests are sent at the current rate
+                self._rate += self.increase / self._rate
+
+    def as_dict(self) -> Dict[str, Optional[float]]:
+        return dict(rate=self.rate, queued=self.queued, throttled=self.throttled, wait_time=self.wait_time)
+
+
+class InFlightLimiter:
+    """
+    Bounds the number of requests in flight at once, shared by threads sending requests
+    synchronously and by the event loops of async requests. Waiting requests are let through in
+    the order they arrived, each slot being handed over directly from a completed request.
+    All methods are thread-safe.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiters = deque()
+
+    def _try_acquire(self) -> bool:
+        if self._in_flight < self.limit and not self._waiters:
+            self._in_flight += 1
+            return True
+        return False
+
+    def acquire(self):
+        """
+        Block until a request may be sent.
+        """
+        with self._lock:
+            if self._try_acquire():
+                return
+            event = threading.Event()
+            self._waiters.append(event)
+        event.wait()
+
+    async def async_acquire(self):
+        """
+        Wait without blocking the event loop until a request may be sent.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._try_acquire():
+                return
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    raise
+            # The slot was handed over as the wait was cancelled
+            if waiter[1].done() and not waiter[1].cancelled():
+                self.release()
+            raise
+
+    def _wake(self, future: asyncio.Future):
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+    def release(self):
+        """
+        Let the next waiting request through, or free the slot of a completed request.
+        """
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if isinstance(waiter, threading.Event):
+                    waiter.set()
+                    return
+                loop, future = waiter
+                if not loop.is_closed():
+                    loop.call_soon_threadsafe(self._wake, future)
+                    return
+            self._in_flight -= 1
+
+
+def _parse_seconds(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+# Resets later than this many seconds are Unix timestamps rather than delays, as sent by some APIs
+_RESET_EPOCH_THRESHOLD = 10 ** 9
+
+
+def _parse_reset(value: Optional[str]) -> Optional[float]:
+    # Seconds until the rate limit window resets, None if it is unknown or already passed
+    reset = _parse_seconds(value)
+    if reset is not None and reset >= _RESET_EPOCH_THRESHOLD:
+        reset -= time.time()
+        if reset <= 0:
+            return None
+    return reset
+
+
+class Hedger:
+    """
+    Decides when to send a duplicate of a slow request. Once `min_samples` latencies are
+    recorded, a request that has not completed after the `percentile` of the last `window`
+    latencies is hedged: a second, identical request is sent and whichever completes first
+    is used. Only requests with deterministic results should be hedged.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95,
+        min_samples: int = 20,
+        window: int = 200
+    ):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self.fired = 0  #: Number of duplicate requests sent.
+        self.won = 0  #: Number of duplicate requests that completed before the original one.
+
+    def delay(self) -> Optional[float]:
+        """
+        Time in seconds after which a request should be hedged, None if too few latencies were recorded.
+        """
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        index = min(len(latencies) - 1, int(len(latencies) * self.percentile / 100))
+        return latencies[index]
+
+    def record_latency(self, latency: float):
+        with self._lock:
+            self._latencies.append(latency)
+
+    def record_fired(self):
+        with self._lock:
+            self.fired += 1
+
+    def record_won(self):
+        with self._lock:
+            self.won += 1
+
+    def as_dict(self) -> Dict[str, int]:
+        return dict(fired=self.fired, won=self.won)
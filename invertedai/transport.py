@@ -0,0 +1,479 @@
+"""
+Non-blocking HTTP transports used by :class:`invertedai.utils.Session` for the async API.
+Requests are prepared by `requests` (headers, authentication, body encoding) and only the
+network exchange is delegated to the transport, so both the sync and async paths put
+identical bytes on the wire.
+"""
+
+import os
+import asyncio
+import ssl
+import threading
+import time
+import weakref
+import zlib
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.utils import DEFAULT_CA_BUNDLE_PATH, select_proxy
+from requests.structures import CaseInsensitiveDict
+
+from invertedai.future import to_thread
+
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+KEEPALIVE_EXPIRY_SECS = 30.0
+TIMEOUT_SECS = 600
+
+
+class ConnectionStats:
+    """
+    Thread-safe counters describing how requests of a session use pooled connections.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0  #: Number of request attempts sent.
+            self.new_connections = 0  #: Number of connections opened to send them.
+            self.in_flight = 0  #: Number of requests currently waiting for a response.
+            self.peak_in_flight = 0  #: Largest number of requests in flight at the same time.
+
+    @property
+    def pool_hits(self) -> int:
+        """
+        Number of request attempts which were sent on a reused keep-alive connection.
+        """
+        return max(self.requests - self.new_connections, 0)
+
+    def record_request_start(self):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def record_request_end(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def record_new_connection(self):
+        with self._lock:
+            self.new_connections += 1
+
+    def as_dict(self) -> Dict[str, int]:
+        return dict(
+            requests=self.requests,
+            new_connections=self.new_connections,
+            pool_hits=self.pool_hits,
+            in_flight=self.in_flight,
+            peak_in_flight=self.peak_in_flight,
+        )
+
+
+class CountingHTTPAdapter(HTTPAdapter):
+    """
+    :class:`HTTPAdapter` which records every new connection opened by its pools in a
+    :class:`ConnectionStats`.
+    """
+
+    def __init__(
+        self,
+        stats: ConnectionStats,
+        **kwargs
+    ):
+        self._stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        stats = self._stats
+
+        def counting(pool_class):
+            class CountingConnectionPool(pool_class):
+                def _new_conn(self):
+                    stats.record_new_connection()
+                    return super()._new_conn()
+            return CountingConnectionPool
+
+        self.poolmanager.pool_classes_by_scheme = {
+            scheme: counting(pool_class) 
+            for scheme, pool_class in self.poolmanager.pool_classes_by_scheme.items()
+        }
+
+
+class TransportResponse:
+    """
+    Minimal response returned by an :class:`AsyncTransport`, exposing the subset of
+    :class:`requests.Response` used by :class:`invertedai.utils.Session`.
+    """
+
+    def __init__(
+        self,
+        status_code: int,
+        headers: CaseInsensitiveDict,
+        content: bytes,
+        url: Optional[str] = None
+    ):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.url = url
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+
+class AsyncTransport:
+    """
+    Interface for the network backend of :func:`Session.async_request`.
+    Subclasses send a prepared request without blocking the event loop and must raise
+    :class:`requests.exceptions.ConnectionError` or :class:`requests.exceptions.Timeout`
+    on network failures so that the retry semantics of the session apply unchanged.
+    """
+
+    async def send(
+        self,
+        request: requests.PreparedRequest
+    ) -> Union[TransportResponse, requests.Response]:
+        raise NotImplementedError
+
+
+class ThreadTransport(AsyncTransport):
+    """
+    Runs the blocking `requests` call in the default thread pool executor.
+    """
+
+    def __init__(
+        self,
+        session: requests.Session
+    ):
+        self._session = session
+
+    async def send(
+        self,
+        request: requests.PreparedRequest
+    ) -> requests.Response:
+        settings = self._session.merge_environment_settings(request.url, {}, None, None, None)
+        return await to_thread(self._session.send, request, **settings)
+
+
+class _Connection:
+    def __init__(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter
+    ):
+        self.reader = reader
+        self.writer = writer
+        self.last_used = time.monotonic()
+
+    def is_reusable(self, keepalive_expiry: float) -> bool:
+        return (
+            not self.writer.is_closing()
+            and not self.reader.at_eof()
+            and time.monotonic() - self.last_used < keepalive_expiry
+        )
+
+    def close(self):
+        self.writer.close()
+
+
+class _HostPool:
+    def __init__(
+        self,
+        maxsize: int,
+        block: bool,
+        generation: int
+    ):
+        self.maxsize = maxsize
+        self.semaphore = asyncio.Semaphore(maxsize) if block else None
+        self.generation = generation
+        self.closed = False
+        self.idle: List[_Connection] = []
+
+    def close(self):
+        self.closed = True
+        while self.idle:
+            self.idle.pop().close()
+
+
+class AsyncioTransport(AsyncTransport):
+    """
+    HTTP/1.1 client built on :mod:`asyncio` streams with keep-alive connections.
+    The pool options follow :class:`requests.adapters.HTTPAdapter`: up to `pool_maxsize` idle
+    connections are kept per host for `pool_connections` hosts. When all connections to a host
+    are busy, a request either waits for one to be released (`pool_block`) or opens an extra
+    connection which is closed after use. Pools are kept per event loop since streams cannot be
+    shared across loops.
+
+    If `session` is given, its settings and those of the environment apply as they do to the
+    synchronous requests of the session: TLS certificates are verified with the CA bundle of
+    `requests` unless `verify` or `REQUESTS_CA_BUNDLE` say otherwise, the client `cert` is sent,
+    and requests to be sent through a proxy are handed to a :class:`ThreadTransport`.
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+        pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+        pool_block: bool = False,
+        keepalive_expiry: float = KEEPALIVE_EXPIRY_SECS,
+        timeout: Optional[float] = TIMEOUT_SECS,
+        stats: Optional[ConnectionStats] = None,
+        session: Optional[requests.Session] = None
+    ):
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout = timeout
+        self.stats = stats if stats is not None else ConnectionStats()
+        self._session = session
+        self._proxy_transport = ThreadTransport(session) if session is not None else None
+        self._ssl_contexts: Dict[tuple, ssl.SSLContext] = {}
+        self._generation = 0
+        self._pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, str, int], _HostPool]]" = weakref.WeakKeyDictionary()
+        self.configure(pool_connections, pool_maxsize, pool_block)
+
+    def configure(
+        self,
+        pool_connections: int,
+        pool_maxsize: int,
+        pool_block: bool
+    ):
+        """
+        Change the pool options. Existing pools are replaced the next time they are used.
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self._generation += 1
+
+    def _get_pool(self, origin: tuple) -> _HostPool:
+        loop_pools = self._pools.setdefault(asyncio.get_running_loop(), {})
+        pool = loop_pools.pop(origin, None)
+        if pool is None or pool.generation != self._generation:
+            if pool is not None:
+                pool.close()
+            pool = _HostPool(self.pool_maxsize, self.pool_block, self._generation)
+        # Keep the most recently used hosts at the end and evict the oldest ones.
+        loop_pools[origin] = pool
+        while len(loop_pools) > self.pool_connections:
+            loop_pools.pop(next(iter(loop_pools))).close()
+        return pool
+
+    def _get_ssl_context(
+        self,
+        verify: Union[bool, str] = True,
+        cert: Optional[Union[str, Tuple[str, str]]] = None
+    ) -> ssl.SSLContext:
+        """
+        TLS context verifying certificates like `requests` with the given `verify` and `cert`.
+        """
+        key = (verify, cert)
+        if key not in self._ssl_contexts:
+            if verify is False:
+                context = ssl.create_default_context()
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+            else:
+                ca_bundle = DEFAULT_CA_BUNDLE_PATH if verify is True else verify
+                if os.path.isdir(ca_bundle):
+                    context = ssl.create_default_context(capath=ca_bundle)
+                else:
+                    context = ssl.create_default_context(cafile=ca_bundle)
+            if cert is not None:
+                if isinstance(cert, str):
+                    context.load_cert_chain(cert)
+                else:
+                    context.load_cert_chain(*cert)
+            self._ssl_contexts[key] = context
+        return self._ssl_contexts[key]
+
+    async def _acquire(
+        self,
+        pool: _HostPool,
+        origin: Tuple[str, str, int],
+        ssl_context: Optional[ssl.SSLContext]
+    ) -> Tuple[_Connection, bool]:
+        while pool.idle:
+            connection = pool.idle.pop()
+            if connection.is_reusable(self.keepalive_expiry):
+                return connection, True
+            connection.close()
+        scheme, host, port = origin
+        self.stats.record_new_connection()
+        reader, writer = await asyncio.open_connection(
+            host,
+            port,
+            ssl=ssl_context if scheme == "https" else None,
+        )
+        return _Connection(reader, writer), False
+
+    async def send(
+        self,
+        request: requests.PreparedRequest
+    ) -> Union[TransportResponse, requests.Response]:
+        settings = {}
+        if self._session is not None:
+            settings = self._session.merge_environment_settings(request.url, {}, None, None, None)
+            if select_proxy(request.url, settings["proxies"]) is not None:
+                # Tunnelling through proxies is left to requests
+                return await self._proxy_transport.send(request)
+        try:
+            send = self._send(request, settings.get("verify", True), settings.get("cert"))
+            if self.timeout is None:
+                return await send
+            return await asyncio.wait_for(send, self.timeout)
+        except asyncio.TimeoutError:
+            raise requests.exceptions.Timeout(f"Request to {request.url} timed out.") from None
+        except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+            raise requests.exceptions.ConnectionError(str(e)) from None
+
+    async def _send(
+        self,
+        request: requests.PreparedRequest,
+        verify: Union[bool, str] = True,
+        cert: Optional[Union[str, Tuple[str, str]]] = None
+    ) -> TransportResponse:
+        url = urlsplit(request.url)
+        scheme = url.scheme.lower()
+        origin = (scheme, url.hostname, url.port or (443 if scheme == "https" else 80))
+        target = (url.path or "/") + (f"?{url.query}" if url.query else "")
+        body = request.body
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        message = self._encode_request(request.method, target, url.netloc, request.headers, body)
+
+        ssl_context = self._get_ssl_context(verify, cert) if scheme == "https" else None
+        # Connections are only reused with the same TLS settings
+        pool = self._get_pool(origin + (verify, cert))
+        if pool.semaphore is not None:
+            await pool.semaphore.acquire()
+        try:
+            connection, reused = await self._acquire(pool, origin, ssl_context)
+            try:
+                response, keep_alive = await self._exchange(connection, message, request.method)
+            except (OSError, asyncio.IncompleteReadError):
+                connection.close()
+                if not reused:
+                    raise
+                # The server may have dropped an idle keep-alive connection, retry once on a fresh one.
+                connection, _ = await self._acquire(pool, origin, ssl_context)
+                try:
+                    response, keep_alive = await self._exchange(connection, message, request.method)
+                except BaseException:
+                    connection.close()
+                    raise
+            except BaseException:
+                connection.close()
+                raise
+
+            if keep_alive and not pool.closed and len(pool.idle) < pool.maxsize:
+                connection.last_used = time.monotonic()
+                pool.idle.append(connection)
+            else:
+                connection.close()
+        finally:
+            if pool.semaphore is not None:
+                pool.semaphore.release()
+
+        response.url = request.url
+        return response
+
+    @staticmethod
+    def _encode_request(
+        method: str,
+        target: str,
+        host: str,
+        headers: CaseInsensitiveDict,
+        body: Optional[bytes]
+    ) -> bytes:
+        headers = CaseInsensitiveDict(headers)
+        headers["Host"] = host
+        headers["Connection"] = "keep-alive"
+        # Only advertise encodings which can be decoded with the standard library.
+        headers["Accept-Encoding"] = "gzip, deflate"
+        if body is not None or method.upper() in ("POST", "PUT", "PATCH"):
+            headers["Content-Length"] = str(len(body or b""))
+        lines = [f"{method.upper()} {target} HTTP/1.1"]
+        lines.extend(f"{key}: {value}" for key, value in headers.items())
+        head = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+        return head + body if body else head
+
+    async def _exchange(
+        self,
+        connection: _Connection,
+        message: bytes,
+        method: str
+    ) -> Tuple[TransportResponse, bool]:
+        connection.writer.write(message)
+        await connection.writer.drain()
+        reader = connection.reader
+
+        while True:
+            status_line = await reader.readline()
+            if not status_line:
+                raise ConnectionResetError("Connection closed by the server before a response was received.")
+            version, status, _ = (status_line.decode("latin-1").rstrip("\r\n") + "  ").split(" ", 2)
+            status_code = int(status)
+            headers = await self._read_headers(reader)
+            if not 100 <= status_code < 200:
+                break
+
+        keep_alive = version == "HTTP/1.1" and headers.get("Connection", "").lower() != "close"
+        if method.upper() == "HEAD" or status_code in (204, 304):
+            content = b""
+        elif "chunked" in headers.get("Transfer-Encoding", "").lower():
+            content = await self._read_chunked(reader)
+        elif "Content-Length" in headers:
+            content = await reader.readexactly(int(headers["Content-Length"]))
+        else:
+            content = await reader.read()
+            keep_alive = False
+
+        return TransportResponse(status_code, headers, _decode_content(content, headers)), keep_alive
+
+    @staticmethod
+    async def _read_headers(reader: asyncio.StreamReader) -> CaseInsensitiveDict:
+        headers = CaseInsensitiveDict()
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                return headers
+            key, _, value = line.decode("latin-1").partition(":")
+            key, value = key.strip(), value.strip()
+            headers[key] = f"{headers[key]}, {value}" if key in headers else value
+
+    @staticmethod
+    async def _read_chunked(reader: asyncio.StreamReader) -> bytes:
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b";")[0].strip(), 16)
+            if size == 0:
+                # Discard any trailers.
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return b"".join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+
+
+def _decode_content(
+    content: bytes,
+    headers: CaseInsensitiveDict
+) -> bytes:
+    encoding = headers.get("Content-Encoding", "").lower()
+    if not content or encoding in ("", "identity"):
+        return content
+    if encoding == "gzip":
+        return zlib.decompress(content, 16 + zlib.MAX_WBITS)
+    if encoding == "deflate":
+        try:
+            return zlib.decompress(content)
+        except zlib.error:
+            return zlib.decompress(content, -zlib.MAX_WBITS)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
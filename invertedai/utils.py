@@ -1,35 +1,45 @@
 import json
 import os
+import struct
+import gzip
+import zlib
+import asyncio
+import threading
+import contextlib
+import concurrent.futures
 import re
-import csv
 import math
 import logging
-import random
 import time
 import numpy as np
-import warnings
 
-from typing import Dict, Optional, List, Tuple, Union, Any
+from typing import Dict, Optional, List, Tuple, Union, Any, Callable, Coroutine
 from copy import deepcopy
-from pydantic import validate_call, validate_arguments
+from pydantic import BaseModel, validate_call
 
 import requests
 from requests import Response
 from requests.auth import AuthBase
 from requests.adapters import HTTPAdapter, Retry
 
-import matplotlib.pyplot as plt
-from matplotlib import animation
-from matplotlib.patches import Rectangle
-from matplotlib.animation import FuncAnimation
-from matplotlib.axes import Axes
-from matplotlib import transforms
-
 import invertedai as iai
 import invertedai.api
 import invertedai.api.config
 from invertedai import error
+from invertedai.retry import RetryScheduler, RateLimiter, Hedger, InFlightLimiter
+from invertedai.cache import APIKeyCache, LocationInfoCache, KEY_CACHE_TTL_SECS, LOCATION_CACHE_SIZE
+from invertedai.validation import check_validation_policy
+from invertedai.encoding import check_state_encoding
 from invertedai.future import to_thread
+from invertedai.transport import (
+    AsyncTransport, 
+    AsyncioTransport, 
+    ThreadTransport, 
+    ConnectionStats, 
+    CountingHTTPAdapter,
+    DEFAULT_POOL_CONNECTIONS,
+    DEFAULT_POOL_MAXSIZE
+)
 from invertedai.error import InvertedAIError
 from invertedai.common import (
     AgentState, 
@@ -43,11 +53,10 @@ from invertedai.common import (
 )
 
 H_SCALE = 10
-text_x_offset = 0
-text_y_offset = 0.7
-text_size = 7
 TIMEOUT_SECS = 600
 MAX_RETRIES = 10
+COMPRESSION_LEVEL = 6
+COMPRESSION_THRESHOLD = 1024
 AGENT_SCOPE_FOV = 120
 
 logger = logging.getLogger(__name__)
@@ -60,18 +69,234 @@ STATUS_MESSAGE = {
     500: "The server encountered an unexpected issue. We're working to resolve this. Please try again later.",
 }
 
+REQUEST_COMPRESSIONS = {
+    None: None,
+    "gzip": lambda body: gzip.compress(body, compresslevel=COMPRESSION_LEVEL),
+    "deflate": lambda body: zlib.compress(body, COMPRESSION_LEVEL),
+}
+
+
+class JSONSerializer:
+    """
+    Serializer of request and response bodies based on the standard library.
+    Floats are written with their shortest round-trip representation, so the values
+    decoded on the other end are bit-exact. NumPy arrays are written as nested lists.
+    """
+    name = "json"
+    content_type = "application/json"
+
+    @staticmethod
+    def _default(obj: Any) -> Any:
+        if isinstance(obj, (np.ndarray, np.generic)):
+            return obj.tolist()
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj, allow_nan=False, default=self._default).encode("utf-8")
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return json.loads(data)
+
+
+def _has_non_finite(obj: Any) -> bool:
+    """
+    Whether a JSON document holds NaN or infinite floats. Flat lists of numbers are summed,
+    which is non-finite if any of them is, before their elements are checked one by one.
+    """
+    if isinstance(obj, float):
+        return not math.isfinite(obj)
+    if isinstance(obj, dict):
+        return any(_has_non_finite(value) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        if obj and isinstance(obj[0], (int, float)) and not isinstance(obj[0], bool):
+            try:
+                if math.isfinite(sum(obj)):
+                    return False
+            except TypeError:
+                pass
+        return any(_has_non_finite(value) for value in obj)
+    if isinstance(obj, np.ndarray) and obj.dtype.kind in "fc":
+        return not np.isfinite(obj).all()
+    if isinstance(obj, np.floating):
+        return not np.isfinite(obj)
+    return False
+
+
+class OrjsonSerializer(JSONSerializer):
+    """
+    Serializer based on the optional `orjson` package, which is considerably faster at
+    formatting and parsing long lists of floats such as :class:`RecurrentState`. Floats are
+    written with their shortest round-trip representation like the standard library, and
+    non-finite floats raise a ValueError like the standard library, where orjson would write
+    them as null.
+    """
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+        self._options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(self, obj: Any) -> bytes:
+        if _has_non_finite(obj):
+            raise ValueError("Out of range float values are not JSON compliant")
+        return self._orjson.dumps(obj, option=self._options)
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return self._orjson.loads(data)
+
+
+class BinarySerializer(JSONSerializer):
+    """
+    Serializer of a binary format in which numeric arrays are sent as packed buffers instead of
+    JSON text. A body starts with `MAGIC`, followed by the length of a JSON header as a 4 byte
+    little-endian integer, the header and the buffers. The header is the JSON document with each
+    array replaced by `{"$buffer": [dtype, shape, offset]}`, the offset of the array in the
+    buffers. NumPy arrays, such as those of array batches, are written as buffers, and buffers
+    are read as lists.
+
+    The format is negotiated with the `Content-Type` and `Accept` headers. Bodies that do not
+    start with `MAGIC` are parsed as JSON, so servers may answer binary requests with JSON.
+    """
+    name = "binary"
+    content_type = "application/vnd.inverted-ai.binary"
+    accept = f"{content_type}, application/json"
+    MAGIC = b"IAIB"
+
+    def __init__(self, fallback: Optional[JSONSerializer] = None):
+        self.fallback = fallback if fallback is not None else get_serializer("auto")
+
+    def _pack(self, obj: Any, buffers: List[bytes], offset: List[int]) -> Any:
+        if isinstance(obj, np.ndarray) and obj.dtype.kind in "biuf":
+            array = np.ascontiguousarray(obj, dtype=obj.dtype.newbyteorder("<"))
+            buffers.append(array.tobytes())
+            packed = {"$buffer": [array.dtype.str, list(array.shape), offset[0]]}
+            offset[0] += array.nbytes
+            return packed
+        if isinstance(obj, dict):
+            return {key: self._pack(value, buffers, offset) for key, value in obj.items()}
+        if isinstance(obj, (list, tuple)):
+            return [self._pack(value, buffers, offset) for value in obj]
+        if isinstance(obj, np.generic):
+            return obj.item()
+        return obj
+
+    def _unpack(self, obj: Any, buffers: memoryview) -> Any:
+        if isinstance(obj, dict):
+            if "$buffer" in obj and len(obj) == 1:
+                dtype, shape, offset = obj["$buffer"]
+                count = math.prod(shape)
+                return np.frombuffer(buffers, dtype=dtype, count=count, offset=offset).reshape(shape).tolist()
+            return {key: self._unpack(value, buffers) for key, value in obj.items()}
+        if isinstance(obj, list):
+            return [self._unpack(value, buffers) for value in obj]
+        return obj
+
+    def dumps(self, obj: Any) -> bytes:
+        buffers = []
+        header = self.fallback.dumps(self._pack(obj, buffers, [0]))
+        return b"".join([self.MAGIC, struct.pack("<I", len(header)), header, *buffers])
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        if isinstance(data, str) or not data.startswith(self.MAGIC):
+            return self.fallback.loads(data)
+        start = len(self.MAGIC) + 4
+        if len(data) < start:
+            raise ValueError("Truncated binary body.")
+        (header_length,) = struct.unpack_from("<I", data, len(self.MAGIC))
+        header = self.fallback.loads(data[start:start + header_length])
+        return self._unpack(header, memoryview(data)[start + header_length:])
+
+
+SERIALIZERS = {
+    "json": JSONSerializer,
+    "orjson": OrjsonSerializer,
+    "binary": BinarySerializer,
+}
+
+
+def get_serializer(name: str = "auto") -> JSONSerializer:
+    """
+    Return the serializer with the given name. "auto" selects `orjson` when it is
+    installed and falls back to the standard library otherwise.
+    """
+    if name == "auto":
+        try:
+            return OrjsonSerializer()
+        except ImportError:
+            return JSONSerializer()
+    if name not in SERIALIZERS:
+        raise error.InvalidInput(f"Invalid serializer: {name}.")
+    return SERIALIZERS[name]()
+
+
+class RequestMetrics(BaseModel):
+    """
+    Timings (in seconds) and sizes (in bytes) of a single call to :func:`Session.request`,
+    passed to the observers registered with :func:`Session.add_observer`.
+    """
+
+    model: str = "" #: Name of the called model, e.g. "drive".
+    payload_bytes: int = 0 #: Size of the request body as sent, after compression.
+    response_bytes: int = 0 #: Size of the decompressed response body.
+    encode_time: float = 0.0 #: Time spent serializing and compressing the request body.
+    network_time: float = 0.0 #: Round trip time of the last attempt, including the time spent on the server.
+    server_time: Optional[float] = None #: Processing time reported by the server in its `Server-Timing` header, if any.
+    backoff_time: float = 0.0 #: Time spent waiting between attempts.
+    throttle_time: float = 0.0 #: Time spent waiting for the rate limiter of the session.
+    decode_time: float = 0.0 #: Time spent deserializing the response body.
+    model_time: float = 0.0 #: Time spent building the response objects, e.g. :class:`DriveResponse`.
+    total_time: float = 0.0 #: Wall time of the whole call.
+    retries: int = 0 #: Number of attempts that were retried.
+    status_code: Optional[int] = None #: HTTP status code of the last attempt.
+    error: Optional[str] = None #: Name of the exception raised by the call, if any.
+    hedged: bool = False #: Whether a duplicate request was sent because the call was slow.
+
+
+def _parse_server_timing(
+    header: Optional[str]
+) -> Optional[float]:
+    if not header:
+        return None
+    durations = re.findall(r"dur=([0-9.]+)", header)
+    if not durations:
+        return None
+    return max(float(duration) for duration in durations) / 1000
+
 
 class Session:
-    def __init__(self,debug_logger=None):
+    def __init__(
+        self,
+        debug_logger=None,
+        async_transport: Union[str, AsyncTransport] = "asyncio",
+        pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+        pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+        pool_block: bool = False,
+        max_in_flight: Optional[int] = None,
+        request_compression: Optional[str] = None,
+        compression_threshold: int = COMPRESSION_THRESHOLD,
+        serializer: Union[str, JSONSerializer] = "auto",
+        retry_budget: Optional[float] = None,
+        rate_limit: Optional[float] = None,
+        adaptive_rate_limit: bool = True,
+        hedging: bool = False,
+        hedge_percentile: float = 95,
+        lazy_key_verification: bool = False,
+        key_cache_ttl: float = KEY_CACHE_TTL_SECS,
+        validate_responses: bool = True,
+        validation: str = "full",
+        state_encoding: str = "json",
+        location_cache_size: int = LOCATION_CACHE_SIZE
+    ):
         self.session = requests.Session()
-        self.session.mount(
-            "https://",
-            requests.adapters.HTTPAdapter(),
-        )
-        self.session.mount(
-            "http://",
-            requests.adapters.HTTPAdapter(),
-        )
+        self._connection_stats = ConnectionStats()
+        self._pool_connections = pool_connections
+        self._pool_maxsize = pool_maxsize
+        self._pool_block = pool_block
+        self._mount_adapters()
+        self._max_in_flight = None
+        self._in_flight_limiter = None
+        self.max_in_flight = max_in_flight
         self.session.headers.update(
             {
                 "Content-Type": "application/json",
@@ -81,15 +306,35 @@ class Session:
             }
         )
         self._base_url = self._get_base_url()
+        self._server_support = {}
+        self._lazy_key_verification = lazy_key_verification
+        self._key_cache = APIKeyCache(ttl=key_cache_ttl)
+        self._location_cache = LocationInfoCache(max_bytes=location_cache_size)
+        self._pending_key_verification = None
+        self._key_verification_lock = threading.Lock()
         self._max_retries = float("inf")
         self._status_force_list = [403, 408, 429, 500, 502, 503, 504]
-        self._base_backoff = 1  # Base backoff time in seconds
-        self._backoff_factor = 2
-        self._jitter_factor = 0.5
-        self._current_backoff = self._base_backoff
-        self._max_backoff = None
+        self._retry_scheduler = RetryScheduler(base_backoff=1, retry_budget=retry_budget)
+        self._rate_limiter = RateLimiter(rate=rate_limit, adaptive=adaptive_rate_limit)
+        self._hedging = hedging
+        self._hedger = Hedger(percentile=hedge_percentile)
+        self._validate_responses = validate_responses
+        self._validation = check_validation_policy(validation)
+        self._state_encoding = check_state_encoding(state_encoding)
+
+        self._request_compression = None
+        self.request_compression = request_compression
+        self._compression_threshold = compression_threshold
+        self._serializer = None
+        self.serializer = serializer
 
         self._debug_logger = debug_logger
+        self._observers = []
+
+        self._async_transport = None
+        self.async_transport = async_transport
+        self._loop = None
+        self._loop_lock = threading.Lock()
 
     @property
     def base_url(self):
@@ -113,56 +358,410 @@ class Session:
 
     @property
     def base_backoff(self):
-        return self._base_backoff
+        return self._retry_scheduler.base_backoff
 
     @base_backoff.setter
     def base_backoff(self, value):
-        self._base_backoff = value
-        self.current_backoff = (
-            self._base_backoff
-        )  # Reset current_backoff when base_backoff changes
+        self._retry_scheduler.base_backoff = value
+        self._retry_scheduler.reset()  # Reset current_backoff when base_backoff changes
 
     @property
     def backoff_factor(self):
-        return self._backoff_factor
+        return self._retry_scheduler.backoff_factor
 
     @backoff_factor.setter
     def backoff_factor(self, value):
-        self._backoff_factor = value
+        self._retry_scheduler.backoff_factor = value
 
-    
     @property
     def current_backoff(self):
-        return self._current_backoff
-    
+        """
+        Largest backoff in seconds over all endpoints. Setting it applies to every endpoint.
+        """
+        return self._retry_scheduler.current_backoff()
+
     @current_backoff.setter
     def current_backoff(self, value):
-        self._current_backoff = value
+        self._retry_scheduler.reset(value)
 
     @property
     def max_backoff(self):
-        return self._max_backoff
-    
+        return self._retry_scheduler.max_backoff
+
     @max_backoff.setter
     def max_backoff(self, value):
-        self._max_backoff = value
+        self._retry_scheduler.max_backoff = value
 
     @property
     def jitter_factor(self):
-        return self._jitter_factor
-    
+        return self._retry_scheduler.jitter_factor
+
     @jitter_factor.setter
     def jitter_factor(self, value):
-        self._jitter_factor = value
+        self._retry_scheduler.jitter_factor = value
+
+    @property
+    def retry_budget(self) -> Optional[float]:
+        """
+        Number of retries that may be spent across all requests of the session before failed
+        requests are no longer retried. Each successful request earns back a fraction of a retry.
+        None for no limit.
+        """
+        return self._retry_scheduler.retry_budget
+
+    @retry_budget.setter
+    def retry_budget(self, value: Optional[float]):
+        self._retry_scheduler.retry_budget = value
+
+    @property
+    def retry_scheduler(self) -> RetryScheduler:
+        """
+        Backoff and retry budget accounting of the session.
+        """
+        return self._retry_scheduler
+
+    @property
+    def rate_limit(self) -> Optional[float]:
+        """
+        Maximum number of requests per second sent by the session, None for no limit.
+        With `adaptive_rate_limit`, this is adjusted to the rate sustained by the server.
+        """
+        return self._rate_limiter.rate
 
+    @rate_limit.setter
+    def rate_limit(self, value: Optional[float]):
+        self._rate_limiter.rate = value
+
+    @property
+    def adaptive_rate_limit(self) -> bool:
+        """
+        Whether the rate limit is learned from throttled (429) responses and rate limit headers.
+        """
+        return self._rate_limiter.adaptive
+
+    @adaptive_rate_limit.setter
+    def adaptive_rate_limit(self, value: bool):
+        self._rate_limiter.adaptive = value
+
+    @property
+    def rate_limiter(self) -> RateLimiter:
+        """
+        Rate limiter of the session, exposing the current rate and the number of queued requests.
+        """
+        return self._rate_limiter
+
+    @property
+    def hedging(self) -> bool:
+        """
+        Whether async requests with deterministic results, e.g. :func:`async_drive` with a fixed
+        `random_seed`, are duplicated when they take longer than `hedge_percentile` of recent
+        latencies, using whichever response arrives first.
+        """
+        return self._hedging
+
+    @hedging.setter
+    def hedging(self, value: bool):
+        self._hedging = value
+
+    @property
+    def hedge_percentile(self) -> float:
+        """
+        Percentile of recent latencies after which a request is hedged.
+        """
+        return self._hedger.percentile
+
+    @hedge_percentile.setter
+    def hedge_percentile(self, value: float):
+        self._hedger.percentile = value
+
+    @property
+    def hedger(self) -> Hedger:
+        """
+        Latency tracking of hedged requests, exposing the number of hedges fired and won.
+        """
+        return self._hedger
+
+    @property
+    def validate_responses(self) -> bool:
+        """
+        Whether the responses of the API are validated by pydantic when parsed. Responses come
+        from a trusted server, so validation may be disabled, which parses drive responses of
+        1000 agents about 1.5 times faster in `benchmarks/parse_response.py`. The values are then
+        kept as decoded, e.g. integral floats may be ints.
+        """
+        return self._validate_responses
+
+    @validate_responses.setter
+    def validate_responses(self, value: bool):
+        self._validate_responses = value
+
+    @property
+    def validation(self) -> str:
+        """
+        Validation policy of the arguments of :func:`drive`, :func:`initialize`, :func:`large_drive`
+        and their async versions: "full" validates all arguments, "shallow" only validates arguments
+        that do not already have the expected types, e.g. objects passed along from a previous
+        response, and "none" validates nothing. Can be overridden by the `validation` keyword
+        argument of a call.
+        """
+        return self._validation
+
+    @validation.setter
+    def validation(self, value: str):
+        self._validation = check_validation_policy(value)
+
+    @property
+    def state_encoding(self) -> str:
+        """
+        Encoding of the agent states and recurrent states sent to and received from :func:`drive`:
+        "json" sends lists of floats, "binary" sends compressed arrays, see :mod:`invertedai.encoding`.
+        States passed on from a previous response as batches are then sent as differences to the
+        states the server stored, so that only the states changed by the client take up space.
+        The session falls back to "json" if the server does not support binary states.
+        """
+        return self._state_encoding
+
+    @state_encoding.setter
+    def state_encoding(self, value: str):
+        self._state_encoding = check_state_encoding(value)
+
+    @property
+    def lazy_key_verification(self) -> bool:
+        """
+        Whether :func:`add_apikey` defers verifying the key until the first request, so that
+        creating a session makes no network calls.
+        """
+        return self._lazy_key_verification
+
+    @lazy_key_verification.setter
+    def lazy_key_verification(self, value: bool):
+        self._lazy_key_verification = value
+
+    @property
+    def key_cache_ttl(self) -> float:
+        """
+        Time in seconds for which a verified API key is remembered on disk, across processes,
+        so that it does not need to be verified again. 0 disables the cache.
+        """
+        return self._key_cache.ttl
+
+    @key_cache_ttl.setter
+    def key_cache_ttl(self, value: float):
+        self._key_cache.ttl = value
+
+    @property
+    def location_cache(self) -> LocationInfoCache:
+        """
+        Cache of the responses of :func:`location_info`, kept in memory and on disk across processes.
+        """
+        return self._location_cache
+
+    @property
+    def location_cache_size(self) -> int:
+        """
+        Maximum size in bytes of the responses of :func:`location_info` cached on disk, so that
+        static map data of a location is only downloaded once. 0 disables the cache.
+        """
+        return self._location_cache.max_bytes
+
+    @location_cache_size.setter
+    def location_cache_size(self, value: int):
+        self._location_cache.max_bytes = value
+
+    @property
+    def pool_connections(self) -> int:
+        """
+        Number of hosts for which a connection pool is cached.
+        """
+        return self._pool_connections
+
+    @pool_connections.setter
+    def pool_connections(self, value: int):
+        self._pool_connections = value
+        self._configure_pools()
+
+    @property
+    def pool_maxsize(self) -> int:
+        """
+        Maximum number of keep-alive connections kept per host. Set this to at least the number of
+        concurrent calls, e.g. the number of leaves in :func:`large_drive`, to avoid reconnecting.
+        """
+        return self._pool_maxsize
+
+    @pool_maxsize.setter
+    def pool_maxsize(self, value: int):
+        self._pool_maxsize = value
+        self._configure_pools()
+
+    @property
+    def pool_block(self) -> bool:
+        """
+        Whether a request waits for a pooled connection when all of them are busy. Otherwise, an
+        extra connection is opened and discarded after use.
+        """
+        return self._pool_block
+
+    @pool_block.setter
+    def pool_block(self, value: bool):
+        self._pool_block = value
+        self._configure_pools()
+
+    @property
+    def max_in_flight(self) -> Optional[int]:
+        """
+        Maximum number of requests sent concurrently by the session, None for no limit.
+        Further requests wait until an earlier one has completed. The limit is shared by
+        :func:`request` and :func:`async_request`, from any thread or event loop.
+        """
+        return self._max_in_flight
+
+    @max_in_flight.setter
+    def max_in_flight(self, value: Optional[int]):
+        self._max_in_flight = value
+        self._in_flight_limiter = InFlightLimiter(value) if value else None
+
+    @property
+    def request_compression(self) -> Optional[str]:
+        """
+        Encoding used to compress request bodies, either "gzip", "deflate" or None to send
+        them uncompressed.
+        """
+        return self._request_compression
+
+    @request_compression.setter
+    def request_compression(self, value: Optional[str]):
+        if value not in REQUEST_COMPRESSIONS:
+            raise error.InvalidInput(f"Invalid request compression: {value}.")
+        self._request_compression = value
+
+    @property
+    def compression_threshold(self) -> int:
+        """
+        Minimum size in bytes of a request body to be compressed, smaller bodies are sent as is.
+        """
+        return self._compression_threshold
+
+    @compression_threshold.setter
+    def compression_threshold(self, value: int):
+        self._compression_threshold = value
+
+    @property
+    def serializer(self) -> JSONSerializer:
+        """
+        Serializer of request and response bodies. Can be set to "auto", "json", "orjson",
+        "binary" or any :class:`JSONSerializer` instance. With "binary", NumPy arrays of requests
+        are sent as packed buffers and the server is asked to do the same in responses, see
+        :class:`BinarySerializer`. If the server rejects binary requests, the session falls back
+        to the JSON serializer.
+        """
+        return self._serializer
+
+    @serializer.setter
+    def serializer(self, value: Union[str, JSONSerializer]):
+        self._serializer = value if isinstance(value, JSONSerializer) else get_serializer(value)
+
+    @property
+    def connection_stats(self) -> ConnectionStats:
+        """
+        Counters of the requests sent by the session, the connections opened for them and
+        the resulting pool hits.
+        """
+        return self._connection_stats
+
+    def _mount_adapters(self):
+        for prefix in ["https://", "http://"]:
+            # Pooled connections of the replaced adapter are closed, requests in flight complete
+            replaced = self.session.adapters.get(prefix)
+            self.session.mount(
+                prefix,
+                CountingHTTPAdapter(
+                    self._connection_stats,
+                    pool_connections=self._pool_connections,
+                    pool_maxsize=self._pool_maxsize,
+                    pool_block=self._pool_block,
+                ),
+            )
+            if replaced is not None:
+                replaced.close()
+
+    def _configure_pools(self):
+        self._mount_adapters()
+        if isinstance(self.async_transport, AsyncioTransport):
+            self.async_transport.configure(self._pool_connections, self._pool_maxsize, self._pool_block)
+
+    @contextlib.contextmanager
+    def _in_flight(self):
+        limiter = self._in_flight_limiter
+        if limiter is not None:
+            limiter.acquire()
+        self._connection_stats.record_request_start()
+        try:
+            yield
+        finally:
+            self._connection_stats.record_request_end()
+            if limiter is not None:
+                limiter.release()
+
+    @contextlib.asynccontextmanager
+    async def _async_in_flight(self):
+        limiter = self._in_flight_limiter
+        if limiter is not None:
+            await limiter.async_acquire()
+        self._connection_stats.record_request_start()
+        try:
+            yield
+        finally:
+            self._connection_stats.record_request_end()
+            if limiter is not None:
+                limiter.release()
+
+    @property
+    def async_transport(self) -> AsyncTransport:
+        """
+        Network backend used by :func:`async_request`. Can be set to "asyncio" for the native
+        non-blocking transport, "thread" to run the blocking `requests` call in a thread pool,
+        or to any :class:`AsyncTransport` instance.
+        """
+        return self._async_transport
+
+    @async_transport.setter
+    def async_transport(self, value: Union[str, AsyncTransport]):
+        if isinstance(value, AsyncTransport):
+            self._async_transport = value
+        elif value == "asyncio":
+            self._async_transport = AsyncioTransport(
+                pool_connections=self._pool_connections,
+                pool_maxsize=self._pool_maxsize,
+                pool_block=self._pool_block,
+                stats=self._connection_stats,
+                session=self.session,
+            )
+        elif value == "thread":
+            self._async_transport = ThreadTransport(self.session)
+        else:
+            raise error.InvalidInput(f"Invalid async transport: {value}.")
 
     def should_log(self, retry_count):
         return retry_count == 0 or math.log2(retry_count).is_integer()
 
     @base_url.setter
     def base_url(self, value):
+        if value != self._base_url:
+            # Capabilities found for the previous server may not hold for the new one
+            self._server_support = {}
         self._base_url = value
 
+    def server_supports(self, capability: str) -> Optional[bool]:
+        """
+        Whether the server at `base_url` was found to support an optional capability, such as
+        "stored_properties", "state_encoding" or "drive_batch", None if it is not known yet.
+        Forgotten when `base_url` changes.
+        """
+        return self._server_support.get(capability)
+
+    def record_server_support(self, capability: str, supported: bool):
+        self._server_support[capability] = supported
+
     def _verify_api_key(
         self, 
         api_token: str, 
@@ -181,8 +780,21 @@ class Session:
         Raises:
             error.AuthenticationError: If access is denied due to an invalid API key.
         """
+        return self._check_api_key(api_token, verifying_url)[0]
+
+    def _check_api_key(
+        self,
+        api_token: str,
+        verifying_url: str
+    ) -> Tuple[str, bool]:
+        """
+        Same as :meth:`_verify_api_key`, also returning whether the key was accepted by the
+        returned URL. URLs reached after a server error of the commercial server, or answered
+        with an error themselves, are returned without being verified.
+        """
         self.session.auth = APITokenAuth(api_token)
         response = self.session.request(method="get", url=verifying_url)
+        verified = response.status_code in (200, 403)
         if verifying_url == iai.commercial_url and response.status_code != 200:
             # Check for academic access in case the previous call to the commercial server fails.
             logger.warning(
@@ -199,7 +811,16 @@ class Session:
             raise error.AuthenticationError(
                 "Access denied. Please check the provided API key."
             )
-        return verifying_url
+        return verifying_url, verified and response.status_code == 200
+
+    def _verify_and_cache_api_key(
+        self,
+        api_token: str,
+        request_url: str
+    ):
+        self.base_url, verified = self._check_api_key(api_token, request_url)
+        if verified:
+            self._key_cache.put(api_token, request_url, self.base_url)
 
     def add_apikey(
         self,
@@ -221,6 +842,9 @@ class Session:
             InvalidAPIKeyError: If the key_type is invalid.
             AuthenticationError: If access is denied due to an invalid API key.
             APIError: If the server encounters an error or is unable to perform the requested method.
+
+        Keys verified within `key_cache_ttl` are not verified again. With `lazy_key_verification`,
+        the key is verified on the first request instead and the errors above are raised from there.
         """
         if not iai.dev and not api_token:
             raise error.InvalidAPIKeyError("Empty API key received.")
@@ -234,7 +858,30 @@ class Session:
             request_url = iai.commercial_url
         if url is not None:
             request_url = url
-        self.base_url = self._verify_api_key(api_token, request_url)
+        self._pending_key_verification = None
+        cached_url = self._key_cache.get(api_token, request_url)
+        if cached_url is not None:
+            self.session.auth = APITokenAuth(api_token)
+            self.base_url = cached_url
+        elif self.lazy_key_verification:
+            self.session.auth = APITokenAuth(api_token)
+            self.base_url = request_url
+            self._pending_key_verification = (api_token, request_url)
+        else:
+            self._verify_and_cache_api_key(api_token, request_url)
+
+    def _ensure_api_key_verified(self):
+        """
+        Verify the API key passed to :func:`add_apikey` if its verification was deferred.
+        """
+        if self._pending_key_verification is None:
+            return
+        with self._key_verification_lock:
+            if self._pending_key_verification is None:
+                return
+            api_token, request_url = self._pending_key_verification
+            self._verify_and_cache_api_key(api_token, request_url)
+            self._pending_key_verification = None
 
     def use_mock_api(
         self, 
@@ -248,18 +895,106 @@ class Session:
 
     async def async_request(
         self, 
-        *args, 
-        **kwargs
+        model: str, 
+        params: Optional[dict] = None, 
+        data: Optional[dict] = None,
+        response_parser: Optional[Callable[[Dict], Any]] = None,
+        hedge: bool = False,
+        retry: bool = True
     ):
-        return await to_thread(self.request, *args, **kwargs)
+        """
+        The async version of :func:`request`. If `hedge` is set and the session has `hedging`
+        enabled, a slow request is duplicated, so it must be safe to send twice and give the same
+        result both times.
+        """
+        method, relative_path = iai.model_resources[model]
+        metrics = RequestMetrics(model=model)
+        start = time.perf_counter()
+
+        if self._debug_logger is not None:
+            request_data = data
+            if params is not None:
+                request_data = params
+            self._debug_logger.append_request(model,request_data)
+
+        try:
+            if self._pending_key_verification is not None:
+                await to_thread(self._ensure_api_key_verified)
+            if hedge and self.hedging:
+                response = await self._hedged_async_request(
+                    method=method,
+                    relative_path=relative_path,
+                    params=params,
+                    json_body=data,
+                    metrics=metrics,
+                )
+            else:
+                response = await self._async_request(
+                    method=method,
+                    relative_path=relative_path,
+                    params=params,
+                    json_body=data,
+                    metrics=metrics,
+                    retry=retry,
+                )
+
+            if self._debug_logger is not None:
+                self._debug_logger.append_response(model,response)
+
+            return self._parse_response(response, response_parser, metrics)
+        except Exception as e:
+            metrics.error = type(e).__name__
+            raise
+        finally:
+            metrics.total_time = time.perf_counter() - start
+            self._notify_observers(metrics)
+
+    def submit_async(
+        self,
+        coroutine: Coroutine
+    ) -> concurrent.futures.Future:
+        """
+        Schedule a coroutine on an event loop owned by the session and return a future of its result
+        without waiting for it. The loop lives in a background thread for the lifetime of the session
+        so that connections opened by the async transport are kept alive between calls.
+        """
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever, 
+                    name="iai-session-loop", 
+                    daemon=True
+                ).start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def run_async(
+        self,
+        coroutine: Coroutine
+    ) -> Any:
+        """
+        Run a coroutine to completion on the event loop of the session and return its result.
+        See :meth:`submit_async`.
+        """
+        return self.submit_async(coroutine).result()
 
     def request(
         self, 
         model: str, 
         params: Optional[dict] = None, 
-        data: Optional[dict] = None
+        data: Optional[dict] = None,
+        response_parser: Optional[Callable[[Dict], Any]] = None,
+        retry: bool = True
     ):
+        """
+        Send a request to the endpoint of the given model and return the decoded response.
+        If `response_parser` is given, it is applied to the decoded response and its result is
+        returned instead. Timings and sizes of the call are reported to the registered observers.
+        If `retry` is False, the request is sent once and failures are raised without retrying.
+        """
         method, relative_path = iai.model_resources[model]
+        metrics = RequestMetrics(model=model)
+        start = time.perf_counter()
         
         if self._debug_logger is not None:
             request_data = data
@@ -267,18 +1002,104 @@ class Session:
                 request_data = params
             self._debug_logger.append_request(model,request_data)
 
-        response = self._request(
-            method=method,
-            relative_path=relative_path,
-            params=params,
-            json_body=data,
-        )
+        try:
+            self._ensure_api_key_verified()
+            response = self._request(
+                method=method,
+                relative_path=relative_path,
+                params=params,
+                json_body=data,
+                metrics=metrics,
+                retry=retry,
+            )
 
-        if self._debug_logger is not None:
-            self._debug_logger.append_response(model,response)
+            if self._debug_logger is not None:
+                self._debug_logger.append_response(model,response)
+
+            return self._parse_response(response, response_parser, metrics)
+        except Exception as e:
+            metrics.error = type(e).__name__
+            raise
+        finally:
+            metrics.total_time = time.perf_counter() - start
+            self._notify_observers(metrics)
+
+    def add_observer(
+        self,
+        observer: Callable[["RequestMetrics"], None]
+    ):
+        """
+        Register a callable which receives a :class:`RequestMetrics` after every call to
+        :func:`request` or :func:`async_request`, including failed ones.
+        """
+        self._observers.append(observer)
+
+    def remove_observer(
+        self,
+        observer: Callable[["RequestMetrics"], None]
+    ):
+        self._observers.remove(observer)
+
+    def _notify_observers(
+        self,
+        metrics: "RequestMetrics"
+    ):
+        for observer in list(self._observers):
+            try:
+                observer(metrics)
+            except Exception as e:
+                logger.warning(f"Request observer {observer} failed: {e}")
 
+    def _parse_response(
+        self,
+        response: Dict,
+        response_parser: Optional[Callable[[Dict], Any]],
+        metrics: "RequestMetrics"
+    ) -> Any:
+        if response_parser is None:
+            return response
+        start = time.perf_counter()
+        response = response_parser(response)
+        metrics.model_time = time.perf_counter() - start
         return response
 
+    def _prepare_request(
+        self,
+        method,
+        relative_path: str = "",
+        params=None,
+        headers=None,
+        json_body=None,
+        data=None,
+        metrics: Optional["RequestMetrics"] = None,
+        serializer: Optional[JSONSerializer] = None,
+    ) -> requests.PreparedRequest:
+        if metrics is None:
+            metrics = RequestMetrics()
+        if serializer is None:
+            serializer = self.serializer
+        if json_body is not None:
+            start = time.perf_counter()
+            data = serializer.dumps(json_body)
+            if isinstance(serializer, BinarySerializer):
+                headers = {**(headers or {}), "Content-Type": serializer.content_type, "Accept": serializer.accept}
+            if self.request_compression is not None and len(data) >= self.compression_threshold:
+                data = REQUEST_COMPRESSIONS[self.request_compression](data)
+                headers = {**(headers or {}), "Content-Encoding": self.request_compression}
+            metrics.encode_time = time.perf_counter() - start
+        request = self.session.prepare_request(
+            requests.Request(
+                method=method.upper(),
+                url=self.base_url + relative_path,
+                params=params,
+                headers=headers,
+                data=data,
+            )
+        )
+        body = request.body or b""
+        metrics.payload_bytes = len(body.encode("utf-8") if isinstance(body, str) else body)
+        return request
+
     def _request(
         self,
         method,
@@ -287,100 +1108,242 @@ class Session:
         headers=None,
         json_body=None,
         data=None,
+        metrics: Optional["RequestMetrics"] = None,
+        serializer: Optional[JSONSerializer] = None,
+        retry: bool = True,
     ) -> Dict:
+        if metrics is None:
+            metrics = RequestMetrics()
+        request = self._prepare_request(method, relative_path, params, headers, json_body, data, metrics, serializer)
+        settings = self.session.merge_environment_settings(request.url, {}, None, None, None)
+        retries = 0
+        response = None
+        while retries < self.max_retries:
+            metrics.throttle_time += self._rate_limiter.acquire()
+            start = time.perf_counter()
+            try:
+                with self._in_flight():
+                    response = self.session.send(request, **settings)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                logger.warning("Error communicating with IAI, will retry.")
+                response = None
+            metrics.network_time = time.perf_counter() - start
+            if response is not None:
+                self._rate_limiter.record_response(response.status_code, response.headers)
+            if not self._should_retry(response):
+                self._retry_scheduler.record_success(relative_path)
+                break
+            if not retry:
+                break
+            backoff = self._next_backoff(relative_path, response, retries)
+            if backoff is None:
+                break
+            time.sleep(backoff)
+            metrics.backoff_time += backoff
+            retries += 1
+            metrics.retries = retries
+        if self._binary_rejected(serializer, json_body, response):
+            fallback = self.serializer.fallback
+            result = self._request(method, relative_path, params, headers, json_body, data, metrics, fallback, retry)
+            self._fall_back_to_json(fallback)
+            return result
+        return self._handle_response(response, metrics)
+
+    async def _async_request(
+        self,
+        method,
+        relative_path: str = "",
+        params=None,
+        headers=None,
+        json_body=None,
+        data=None,
+        metrics: Optional["RequestMetrics"] = None,
+        serializer: Optional[JSONSerializer] = None,
+        retry: bool = True,
+    ) -> Dict:
+        if metrics is None:
+            metrics = RequestMetrics()
+        request = self._prepare_request(method, relative_path, params, headers, json_body, data, metrics, serializer)
+        retries = 0
+        response = None
+        while retries < self.max_retries:
+            metrics.throttle_time += await self._rate_limiter.async_acquire()
+            start = time.perf_counter()
+            try:
+                async with self._async_in_flight():
+                    response = await self.async_transport.send(request)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                logger.warning("Error communicating with IAI, will retry.")
+                response = None
+            metrics.network_time = time.perf_counter() - start
+            if response is not None:
+                self._rate_limiter.record_response(response.status_code, response.headers)
+            if not self._should_retry(response):
+                self._retry_scheduler.record_success(relative_path)
+                break
+            if not retry:
+                break
+            backoff = self._next_backoff(relative_path, response, retries)
+            if backoff is None:
+                break
+            await asyncio.sleep(backoff)
+            metrics.backoff_time += backoff
+            retries += 1
+            metrics.retries = retries
+        if self._binary_rejected(serializer, json_body, response):
+            fallback = self.serializer.fallback
+            result = await self._async_request(method, relative_path, params, headers, json_body, data, metrics, fallback, retry)
+            self._fall_back_to_json(fallback)
+            return result
+        return self._handle_response(response, metrics)
+
+    def _binary_rejected(
+        self,
+        serializer: Optional[JSONSerializer],
+        json_body,
+        response
+    ) -> bool:
+        """
+        Whether a request was sent with the binary serializer of the session and rejected for its
+        content type, in which case it is sent again as JSON. Other input errors are raised as is.
+        """
+        if serializer is not None or json_body is None or not isinstance(self.serializer, BinarySerializer):
+            return False
+        if response is None or response.status_code not in (400, 415, 422):
+            return False
+        return response.status_code == 415 or any(
+            name in response.text.lower() for name in ("json", "content type", "content-type")
+        )
+
+    def _fall_back_to_json(
+        self,
+        fallback: JSONSerializer
+    ):
+        # The request was accepted as JSON, so the server does not support binary bodies
+        if isinstance(self.serializer, BinarySerializer):
+            logger.warning(f"The server does not accept binary request bodies, falling back to {fallback.name}.")
+            self.serializer = fallback
+
+    async def _hedged_async_request(
+        self,
+        metrics: "RequestMetrics",
+        **kwargs
+    ) -> Dict:
+        start = time.perf_counter()
+        delay = self._hedger.delay()
+        attempts = {asyncio.ensure_future(self._async_request(metrics=metrics, **kwargs)): metrics}
+        if delay is not None:
+            done, _ = await asyncio.wait(attempts, timeout=delay)
+            if not done:
+                hedge_metrics = RequestMetrics(model=metrics.model)
+                attempts[asyncio.ensure_future(self._async_request(metrics=hedge_metrics, **kwargs))] = hedge_metrics
+                self._hedger.record_fired()
+        pending = set(attempts)
         try:
-            retries = 0
-            while retries < self.max_retries:
-                try:
-                    response = self.session.request(
-                        method=method,
-                        params=params,
-                        url=self.base_url + relative_path,
-                        headers=headers,
-                        data=data,
-                        json=json_body,
-                    )
-                except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
-                    logger.warning("Error communicating with IAI, will retry.")
-                    response = None
-                if response is not None and response.status_code not in self.status_force_list:
-                    self.current_backoff = max(
-                        self.base_backoff, self.current_backoff / self.backoff_factor
-                    )
-                    response.raise_for_status()
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                succeeded = [task for task in done if task.exception() is None]
+                # Wait for the other attempt if this one failed
+                if succeeded or not pending:
                     break
-                else:
-                    if self.jitter_factor is not None:
-                        jitter = random.uniform(-self.jitter_factor, self.jitter_factor)
-                    else:
-                        jitter = 0
-                    if self.should_log(retries):
-                        if response is not None:
-                            logger.warning(
-                                f"Retrying {relative_path}: Status {response.status_code}, Message {STATUS_MESSAGE.get(response.status_code, response.text)} Retry #{retries + 1}, Backoff {self.current_backoff} seconds"
-                            )
-                        else:
-                            logger.warning(f"Retrying {relative_path}: No response received, Retry #{retries + 1}, Backoff {self.current_backoff} seconds")
-                    time.sleep(min(self.current_backoff * (1 + jitter), self.max_backoff if self.max_backoff is not None else float("inf")))
-                    self.current_backoff *= self.backoff_factor
-                    if self.max_backoff is not None:
-                        self.current_backoff = min(
-                            self.current_backoff, self.max_backoff
-                        )
-                    retries += 1
-            else:
-                if response is not None:
-                    response.raise_for_status()
-                else:
-                    error.APIConnectionError(
-                        "Error communicating with IAI", should_retry=True)
+            task = succeeded[0] if succeeded else done.pop()
+            winner_metrics = attempts[task]
+            if winner_metrics is not metrics:
+                for name in RequestMetrics.model_fields:
+                    setattr(metrics, name, getattr(winner_metrics, name))
+            metrics.hedged = len(attempts) > 1
+            response = task.result()
+            if winner_metrics is not metrics:
+                self._hedger.record_won()
+            self._hedger.record_latency(time.perf_counter() - start)
+            return response
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _should_retry(
+        self,
+        response
+    ) -> bool:
+        return response is None or response.status_code in self.status_force_list
 
+    def _next_backoff(
+        self,
+        relative_path: str,
+        response,
+        retries: int
+    ) -> Optional[float]:
+        """
+        Log the failed attempt and return the time to wait before the next one, or None if
+        the retry budget of the session is spent.
+        """
+        backoff = self._retry_scheduler.next_backoff(relative_path)
+        if backoff is None:
+            logger.warning(f"Not retrying {relative_path}: Retry budget exhausted")
+        elif self.should_log(retries):
+            if response is not None:
+                logger.warning(
+                    f"Retrying {relative_path}: Status {response.status_code}, Message {STATUS_MESSAGE.get(response.status_code, response.text)} Retry #{retries + 1}, Backoff {backoff} seconds"
+                )
+            else:
+                logger.warning(f"Retrying {relative_path}: No response received, Retry #{retries + 1}, Backoff {backoff} seconds")
+        return backoff
 
-        except requests.exceptions.ConnectionError as e:
+    def _handle_response(
+        self,
+        response,
+        metrics: Optional["RequestMetrics"] = None
+    ) -> Dict:
+        if metrics is None:
+            metrics = RequestMetrics()
+        if response is None:
             raise error.APIConnectionError(
                 "Error communicating with IAI", should_retry=True
-            ) from None
-        except requests.exceptions.Timeout as e:
-            raise error.APIConnectionError("Error communicating with IAI") from None
-        except requests.exceptions.RequestException as e:
-            if e.response.status_code == 403:
-                raise error.AuthenticationError(STATUS_MESSAGE[403]) from None
-            elif e.response.status_code in [400, 422]:
-                raise error.InvalidRequestError(e.response.text, param="") from None
-            elif e.response.status_code == 404:
-                raise error.ResourceNotFoundError(e.response.text) from None
-            elif e.response.status_code == 408:
-                raise error.RequestTimeoutError(e.response.text) from None
-            elif e.response.status_code == 413:
-                raise error.RequestTooLarge(e.response.text) from None
-            elif e.response.status_code == 429:
-                raise error.RateLimitError(STATUS_MESSAGE[429]) from None
-            elif e.response.status_code == 502:
-                raise error.APIError(STATUS_MESSAGE[502]) from None
-            elif e.response.status_code == 503:
-                raise error.RequestTimeoutError(e.response.text) from None
-            elif e.response.status_code == 504:
-                raise error.ServiceUnavailableError(STATUS_MESSAGE[504]) from None
-            elif 400 <= e.response.status_code < 500:
-                raise error.APIError(e.response.text) from None
-            else:
-                raise error.APIError(STATUS_MESSAGE[500]) from None
+            )
+        status_code = response.status_code
+        metrics.status_code = status_code
+        metrics.response_bytes = len(response.content)
+        metrics.server_time = _parse_server_timing(response.headers.get("Server-Timing"))
+        if status_code == 403:
+            raise error.AuthenticationError(STATUS_MESSAGE[403], http_status=status_code)
+        elif status_code in [400, 422]:
+            raise error.InvalidRequestError(response.text, param="")
+        elif status_code == 404:
+            raise error.ResourceNotFoundError(response.text, http_status=status_code)
+        elif status_code == 408:
+            raise error.RequestTimeoutError(response.text)
+        elif status_code == 413:
+            raise error.RequestTooLarge(response.text)
+        elif status_code == 429:
+            raise error.RateLimitError(STATUS_MESSAGE[429])
+        elif status_code == 502:
+            raise error.APIError(STATUS_MESSAGE[502])
+        elif status_code == 503:
+            raise error.RequestTimeoutError(response.text)
+        elif status_code == 504:
+            raise error.ServiceUnavailableError(STATUS_MESSAGE[504])
+        elif 400 <= status_code < 500:
+            raise error.APIError(response.text, http_status=status_code)
+        elif status_code >= 500:
+            raise error.APIError(STATUS_MESSAGE[500])
         iai.logger.info(
             iai.logger.logfmt(
                 "IAI API response",
                 path=self.base_url,
-                response_code=response.status_code,
+                response_code=status_code,
             )
         )
+        start = time.perf_counter()
         try:
-            data = json.loads(response.content)
-        except json.decoder.JSONDecodeError:
+            data = self.serializer.loads(response.content)
+        except ValueError:
             raise error.APIError(
-                f"HTTP code {response.status_code} from API ({response.content})",
+                f"HTTP code {status_code} from API ({response.content})",
                 response.content,
-                response.status_code,
+                status_code,
                 headers=response.headers,
             )
+        metrics.decode_time = time.perf_counter() - start
         return data
 
     def _get_base_url(self) -> str:
@@ -767,716 +1730,9 @@ def rot(rot):
     return np.array([[np.cos(rot), -np.sin(rot)], [np.sin(rot), np.cos(rot)]])
 
 
-class ScenePlotter():
-    """
-    A class providing features for handling the data visualization of a scene involving IAI data.
-    """
-    def __init__(
-        self,
-        map_image: Optional[np.array] = None,
-        fov: Optional[float] = None,
-        xy_offset: Optional[Tuple[float,float]] = None,
-        static_actors: Optional[List[StaticMapActor]] = None,
-        open_drive: Optional[str] = None, 
-        resolution: Tuple[int,int] = (640, 480), 
-        dpi: float = 100,
-        left_hand_coordinates: bool = False,
-        **kwargs
-    ):
-        """
-        Arguments
-        ----------
-        map_image:
-            An image used as the background for the visualization decoded from the birdview map taken from location info.
-        fov:
-            A single float value representing the field of view of the visualization that can be taken from location info.
-        xy_offset:
-            A tuple coordinate of the center of the map in metres that can be taken from location info.
-        static_actors:
-            A list of StaticMapActor objects representing objects such as traffic lights that can be taken from location info.
-        open_drive: 
-            If using an ASAM OpenDRIVE format map for visualization, this string parameter is used to indicate the path to the corresponding CSV file.
-        resolution: 
-            The desired resolution of the map image expressed as a Tuple with two integers for the width and height respectively.
-        dpi:
-            Dots per inch to define the level of detail in the image.
-        left_hand_coordinates:
-            Boolean flag dictating whether the X-coordinates of all agents and actors should be reversed to fit a left hand coordinate system.
-
-        Keyword Arguments
-        -----------------
-        map_image:
-            Base image onto which the scene is visualized. This parameter must be provided if using an ASAM OpenDRIVE format map.
-        fov: float
-            The field of view in meters corresponding to the map_image attribute. This parameter must be provided if using an ASAM OpenDRIVE format map.
-        xy_offset:
-            The left-hand offset for the center of the map image. This parameter must be provided if using an ASAM OpenDRIVE format map.
-        static_actors:
-            A list of static actor agents (e.g. traffic lights) represented as StaticMapActor objects, in the scene. This parameter must be provided 
-            if using an ASAM OpenDRIVE format map.
-        
-        See Also
-        --------
-        :func:`location_info`
-        """
-
-        self._left_hand_coordinates = left_hand_coordinates
-
-        self.conditional_agents = None
-        self.agent_properties = None
-        self.traffic_lights_history = None
-        self.agent_states_history = None
-        
-        self._open_drive = open_drive
-        self._dpi = dpi
-        self._resolution = resolution
-        
-        self.map_image = map_image
-        self.fov = fov
-        self.xy_offset = xy_offset
-        self.static_actors = static_actors
-
-        self.traffic_lights = {static_actor.actor_id: static_actor for static_actor in self.static_actors if static_actor.agent_type == 'traffic_light'}
-
-        if self._open_drive is None:
-            self.extent = (- self.fov / 2 + self.xy_offset[0], self.fov / 2 + self.xy_offset[0]) + \
-                (- self.fov / 2 + self.xy_offset[1], self.fov / 2 + self.xy_offset[1])
-
-        self.traffic_light_colors = {
-            "red": (1.0, 0.0, 0.0),
-            "green": (0.0, 1.0, 0.0),
-            "yellow": (1.0, 0.8, 0.0),
-        }
-
-        self.agent_c = (0.125,0.29,0.529)
-        self.agent_ped_c = (1.0, 0.75, 0.8)
-        self.cond_c = (0.78, 0.0, 0.0)
-        self.dir_c = (0.392,1.0,1.0)
-        self.v_c = (0.2, 0.75, 0.2)
-
-        self.dir_lines = {}
-        self.v_lines = {}
-        self.actor_boxes = {}
-        self.traffic_light_boxes = {}
-        self.box_labels = {}
-        self.frame_label = None
-        self.current_ax = None
-
-        self.numbers = None
-
-        self.agent_face_colors = None 
-        self.agent_edge_colors = None 
-
-        self.reset_recording()
-
-    @validate_arguments
-    def initialize_recording(
-        self,
-        agent_states: List[AgentState], 
-        agent_attributes: Optional[List[AgentAttributes]] = None, 
-        agent_properties: Optional[List[AgentProperties]] = None,
-        traffic_light_states: Optional[Dict[int, TrafficLightState]] = None, 
-        conditional_agents: Optional[List[int]] = None
-    ):
-        """
-        Record the initial state of the scene to be visualized. This function also acts as an implicit reset of the recording and removes previous 
-        agent state, agent attribute, conditional agent, traffic light, and agent style data.
-
-        Arguments
-        ----------
-        agent_states:
-            A list of AgentState objects corresponding to the initial time step to be visualized.
-        agent_attributes:
-            Static attributes of the agent, which don’t change over the course of a simulation. We assume every agent is a rectangle obeying a 
-            kinematic bicycle model.
-        agent_properties:
-            Static attributes of the agent (with the AgentProperties data type), which don’t change over the course of a simulation. We assume every 
-            agent is a rectangle obeying a kinematic bicycle model.
-        traffic_light_states:
-            Optional parameter containing the state of the traffic lights corresponding to the initial time step to be visualized. This parameter 
-            should only be used if the corresponding map contains traffic light static actors.
-        conditional_agents:
-            Optional parameter containing a list of agent IDs corresponding to conditional agents to be visualized to distinguish themselves.
-        """
-
-        assert (agent_attributes is not None) ^ (agent_properties is not None), \
-            "Either agent_attributes or agent_properties is populated. Populating both or neither field is invalid."
-
-        if agent_attributes is not None:
-            self.agent_properties = [convert_attributes_to_properties(attr) for attr in agent_attributes]
-            warnings.warn('agent_attributes is deprecated. Please use agent_properties.',category=DeprecationWarning)
-        else:
-            self.agent_properties = agent_properties
-
-        self.agent_states_history = [agent_states]
-        self.traffic_lights_history = [traffic_light_states]
-        if conditional_agents is not None:
-            self.conditional_agents = conditional_agents
-        else:
-            self.conditional_agents = []
-
-        self.agent_face_colors = None
-        self.agent_edge_colors = None
-
-    def reset_recording(self):
-        """
-        Explicitly reset the recording and remove the previous agent state, agent attribute, conditional agent, traffic light, and agent style data.
-        """
-        self.agent_states_history = []
-        self.traffic_lights_history = []
-        self.agent_properties = None
-        self.conditional_agents = []
-        self.agent_properties = None
-        self.agent_face_colors = None 
-        self.agent_edge_colors = None 
-
-    @validate_arguments
-    def record_step(
-        self,
-        agent_states: List[AgentState], 
-        traffic_light_states: Optional[Dict[int, TrafficLightState]] = None
-    ):
-        """
-        Record a single timestep of scene data to be used in a visualization
-
-        Arguments
-        ----------
-        agent_states:
-            A list of AgentState objects corresponding to the initial time step to be visualized.
-        traffic_light_states:
-            Optional parameter containing the state of the traffic lights corresponding to the initial time step to be visualized. This parameter should
-            only be used if the corresponding map contains traffic light static actors.
-        """
-        self.agent_states_history.append(agent_states)
-        self.traffic_lights_history.append(traffic_light_states)
-
-    @validate_arguments(config=dict(arbitrary_types_allowed=True))
-    def plot_scene(
-        self,
-        agent_states: List[AgentState], 
-        agent_attributes: Optional[List[AgentAttributes]] = None, 
-        agent_properties: Optional[List[AgentProperties]] = None, 
-        traffic_light_states: Optional[Dict[int, TrafficLightState]] = None, 
-        conditional_agents: Optional[List[int]] = None,
-        ax: Optional[Axes] = None,
-        numbers: Optional[List[int]] = None, 
-        direction_vec: bool = True, 
-        velocity_vec: bool = False,
-        agent_face_colors: Optional[List[Optional[Tuple[float,float,float]]]] = None,
-        agent_edge_colors: Optional[List[Optional[Tuple[float,float,float]]]] = None
-    ):
-        """
-        Plot a single timestep of data then reset the recording. 
-
-        Arguments
-        ----------
-        agent_states:
-            A list of agents to be visualized in the image.
-        agent_attributes: 
-            Static attributes of the agent, which don’t change over the course of a simulation. We assume every agent is a rectangle obeying a kinematic
-            bicycle model.
-        agent_properties:
-            Static attributes of the agent (with the AgentProperties data type), which don’t change over the course of a simulation. We assume every 
-            agent is a rectangle obeying a kinematic bicycle model.
-        traffic_light_states: 
-            Optional parameter containing the state of the traffic lights to be visualized in the image. This parameter should only be used if the 
-            corresponding map contains traffic light static actors.
-        conditional_agents:
-            Optional parameter containing a list of agent IDs of conditional agents to be visualized in the image to distinguish themselves.
-        ax: 
-            A matplotlib Axes object used to plot the image. By default, an Axes object is created if a value of None is passed.
-        numbers: 
-            A list of agent ID's that should be plotted in the image. By default this value is set to None.
-        direction_vec:
-            Flag to determine if a vector showing the vehicles direction should be plotted in the image. By default this flag is set to True.
-        velocity_vec: 
-            Flag to determine if the a vector showing the vehicles velocity should be plotted in the animation. By default this flag is set to False.
-        agent_face_colors:
-            An optional parameter containing a list of either RGB tuples indicating the desired color of the agent with the corresponding index ID. A value 
-            of None in this list will use the default color. This value gets overwritten by the conditional agent color.
-        agent_edge_colors:
-            An optional parameter containing a list of either RGB tuples indicating the desired color of a border around the agent with the corresponding 
-            index ID. A value of None in this list will use the default color. This value gets overwritten by the conditional agent color.
-
-        """
-        assert (agent_attributes is not None) ^ (agent_properties is not None), \
-            "Either agent_attributes or agent_properties is populated. Populating both or neither field is invalid."
-
-        if agent_attributes is not None:
-            agent_properties = [convert_attributes_to_properties(attr) for attr in agent_attributes]
-            warnings.warn('agent_attributes is deprecated. Please use agent_properties.',category=DeprecationWarning)
-
-        self.initialize_recording(
-            agent_states=agent_states, 
-            agent_properties=agent_properties,
-            traffic_light_states=traffic_light_states,
-            conditional_agents=conditional_agents
-        )
-
-        self._validate_agent_style_data(
-            agent_face_colors=agent_face_colors,
-            agent_edge_colors=agent_edge_colors
-        )
-
-        self._plot_frame(
-            idx=0, 
-            ax=ax, 
-            numbers=numbers, 
-            direction_vec=direction_vec,
-            velocity_vec=velocity_vec, 
-            plot_frame_number=False
-        )
-
-        self.reset_recording()
-
-    @validate_arguments(config=dict(arbitrary_types_allowed=True))
-    def animate_scene(
-        self,
-        output_name: Optional[str] = None,
-        start_idx: int = 0, 
-        end_idx: int = -1,
-        ax: Optional[Axes] = None,
-        numbers: Optional[List[int]] = None, 
-        direction_vec: bool = True, 
-        velocity_vec: bool = False,
-        plot_frame_number: bool = False, 
-        agent_face_colors: Optional[List[Optional[Tuple[float,float,float]]]] = None,
-        agent_edge_colors: Optional[List[Optional[Tuple[float,float,float]]]] = None
-    ) -> FuncAnimation:
-        """
-        Produce an animation of sequentially recorded steps. A matplotlib animation object can be returned and/or a gif saved of the scene.
-
-        Parameters
-        ----------
-        output_name: 
-            File name of the gif to which the animation will be saved.
-        start_idx:
-            The index of the time step from which the animation will begin. By default it is assumed all recorded steps are desired to be animated.
-        end_idx:
-            The index of the time step from which the animation will end. By default it is assumed all recorded steps are desired to be animated.
-        ax: 
-            A matplotlib Axes object used to plot the animation. By default, an Axes object is created if a value of None is passed.
-        numbers: 
-            A list of agent ID's that should be plotted in the image. By default this value is set to None.
-        direction_vec: 
-            Flag to determine if a vector showing the vehicles direction should be plotted in the animation. By default this flag is set to True.
-        velocity_vec:
-            Flag to determine if the a vector showing the vehicles velocity should be plotted in the animation. By default this flag is set to False.
-        plot_frame_number: 
-            Flag to determine if the frame numbers should be plotted in the animation. By default this flag is set to False.
-        agent_face_colors:
-            An optional parameter containing a list of either RGB tuples indicating the desired color of the agent with the corresponding index ID. A value 
-            of None in this list will use the default color. This value gets overwritten by the conditional agent color.
-        agent_edge_colors:
-            An optional parameter containing a list of either RGB tuples indicating the desired color of a border around the agent with the corresponding index 
-            ID. A value of None in this list will use the default color. This value gets overwritten by the conditional agent color.
-        """
-
-        self._validate_agent_style_data(agent_face_colors,agent_edge_colors)
-
-        self._initialize_plot(ax=ax, numbers=numbers, direction_vec=direction_vec,
-                              velocity_vec=velocity_vec, plot_frame_number=plot_frame_number)
-        end_idx = len(self.agent_states_history) if end_idx == -1 else end_idx
-        fig = self.current_ax.figure
-        fig.set_size_inches(self._resolution[0] / self._dpi, self._resolution[1] / self._dpi, True)
-
-        def animate(i):
-            self._update_frame_to(i)
-
-        ani = FuncAnimation(
-            fig, animate, np.arange(start_idx, end_idx), interval=100)
-        if output_name is not None:
-            ani.save(f'{output_name}', writer='pillow', dpi=self._dpi)
-        return ani
-
-    def _transform_point_to_left_hand_coordinate_frame(self,x,orientation):
-        t_x = 2*self.xy_offset[0] - x
-        if orientation >= 0:
-            t_orientation = -orientation + math.pi
-        else:
-            t_orientation = -orientation - math.pi
-
-        return t_x, t_orientation
-
-    def _plot_frame(self, idx, ax=None, numbers=None, direction_vec=True,
-                   velocity_vec=False, plot_frame_number=False):
-        self._initialize_plot(ax=ax, numbers=numbers, direction_vec=direction_vec,
-                              velocity_vec=velocity_vec, plot_frame_number=plot_frame_number)
-        self._update_frame_to(idx)
-
-    def _validate_agent_style_data(self,agent_face_colors,agent_edge_colors):
-        if self.agent_properties is not None: 
-            if agent_face_colors is not None:
-                if len(agent_face_colors) != len(self.agent_properties):
-                    raise Exception("Number of agent face colors does not match number of agents.")
-            if agent_edge_colors is not None:
-                if len(agent_edge_colors) != len(self.agent_properties):
-                    raise Exception("Number of agent edge colors does not match number of agents.")
-
-        self.agent_face_colors = agent_face_colors
-        self.agent_edge_colors = agent_edge_colors
-
-    def _initialize_plot(self, ax=None, numbers=None, direction_vec=True,
-                         velocity_vec=False, plot_frame_number=False):
-        if ax is None:
-            plt.clf()
-            ax = plt.gca()
-        if self._open_drive is None:
-            ax.imshow(self.map_image, extent=self.extent)
-        else:
-            self._draw_xodr_map(ax)
-            self.extent = (self.xy_offset[0] - self.fov / 2, self.xy_offset[0] + self.fov / 2) +\
-                (self.xy_offset[1] - self.fov / 2, self.xy_offset[1] + self.fov / 2)
-
-            ax.set_xlim((self.extent[0], self.extent[1]))
-            ax.set_ylim((self.extent[2], self.extent[3]))
-        self.current_ax = ax
-
-        self.dir_lines = {}
-        self.v_lines = {}
-        self.actor_boxes = {}
-        self.traffic_light_boxes = {}
-        self.box_labels = {}
-        self.frame_label = None
-
-        self.numbers = numbers
-        self.direction_vec = direction_vec
-        self.velocity_vec = velocity_vec
-        self.plot_frame_number = plot_frame_number
-
-        self._update_frame_to(0)
-
-    def _get_color(self,agent_idx,color_list):
-        c = None
-        if color_list and color_list[agent_idx]:
-            is_good_color_format = isinstance(color_list[agent_idx],tuple)
-            for pc in color_list[agent_idx]:
-                is_good_color_format *= isinstance(pc,float) and (0.0 <= pc <= 1.0)
-            
-            if not is_good_color_format:
-                raise Exception(f"Expected color format is Tuple[float,float,float] with 0 <= float <= 1 but received {color_list[agent_idx]}.")
-            c = color_list[agent_idx]
-
-        return c
-
-    def _update_frame_to(self, frame_idx):
-        for i, (agent, agent_attribute) in enumerate(
-            zip(self.agent_states_history[frame_idx], self.agent_properties)
-        ):
-            self._update_agent(i, agent, agent_attribute)
-
-        if self.traffic_lights_history[frame_idx] is not None:
-            for light_id, light_state in self.traffic_lights_history[frame_idx].items():
-                self._plot_traffic_light(light_id, light_state)
-
-        if self.plot_frame_number:
-            if self.frame_label is None:
-                self.frame_label = self.current_ax.text(
-                    self.extent[0], 
-                    self.extent[2], 
-                    str(frame_idx), 
-                    c="r", 
-                    fontsize=18
-                )
-            else:
-                self.frame_label.set_text(str(frame_idx))
-
-        if self._open_drive is None:
-            self.current_ax.set_xlim(*self.extent[0:2])
-            self.current_ax.set_ylim(*self.extent[2:4])
-
-    def _update_agent(self, agent_idx, agent, agent_attribute):
-        l, w = agent_attribute.length, agent_attribute.width
-        if agent_attribute.agent_type == "pedestrian":
-            l, w = 1.5, 1.5
-        x, y = agent.center.x, agent.center.y
-        v = agent.speed
-        psi = agent.orientation
-
-        if self._left_hand_coordinates:
-            x, psi = self._transform_point_to_left_hand_coordinate_frame(x,psi)
-
-        box = np.array([
-            [0, 0], [l * 0.5, 0],  # direction vector
-            [0, 0], [v * 0.5, 0],  # speed vector at (0.5 m / s ) / m
-        ])
-
-        box = np.matmul(rot(psi), box.T).T + np.array([[x, y]])
-        if self.direction_vec:
-            marker_offset = agent_attribute.length/4
-            x_data = x + marker_offset*math.cos(psi)
-            y_data = y + marker_offset*math.sin(psi)
-            marker_data = (3, 0, (-90+180*psi/math.pi))
-
-            if agent_idx not in self.dir_lines:
-                self.dir_lines[agent_idx] = self.current_ax.plot(
-                    x_data,
-                    y_data,
-                    marker=marker_data,
-                    markersize=agent_attribute.width*400/self.fov, 
-                    linestyle='None',
-                    c=self.dir_c
-                )
-            else:
-                self.dir_lines[agent_idx][0].set_xdata(x_data)
-                self.dir_lines[agent_idx][0].set_ydata(y_data)
-                self.dir_lines[agent_idx][0].set_marker(marker_data)
-
-        if self.velocity_vec:
-            if agent_idx not in self.v_lines:
-                self.v_lines[agent_idx] = self.current_ax.plot(
-                    box[2:4, 0], 
-                    box[2:4, 1], 
-                    lw=1.5, 
-                    c=self.v_c
-                )[0]  # plot the speed
-            else:
-                self.v_lines[agent_idx].set_xdata(box[2:4, 0])
-                self.v_lines[agent_idx].set_ydata(box[2:4, 1])
-        
-        if self.numbers is not None and agent_idx in self.numbers:
-            if agent_idx not in self.box_labels:
-                self.box_labels[agent_idx] = self.current_ax.text(
-                    x, 
-                    y, 
-                    str(agent_idx), 
-                    c="r", 
-                    fontsize=18
-                )
-                self.box_labels[agent_idx].set_clip_on(True)
-            else:
-                self.box_labels[agent_idx].set_x(x)
-                self.box_labels[agent_idx].set_y(y)
-
-        lw = 1
-        fc = self._get_color(agent_idx,self.agent_face_colors)
-        if fc is None:
-            if agent_idx in self.conditional_agents:
-                fc = self.cond_c
-            else:
-                fc = self.agent_c
-        ec = self._get_color(agent_idx,self.agent_edge_colors)
-        if ec is None:
-            lw = 0
-            ec = fc
-
-        rect = Rectangle(
-            (x - l / 2, y - w / 2), 
-            l, 
-            w, 
-            angle=psi * 180 / np.pi, 
-            rotation_point='center', 
-            fc=fc, 
-            ec=ec, 
-            lw=lw
-        )
-
-        if agent_idx in self.actor_boxes:
-            self.actor_boxes[agent_idx].remove()
-        self.actor_boxes[agent_idx] = rect
-        self.actor_boxes[agent_idx].set_clip_on(True)
-        self.current_ax.add_patch(self.actor_boxes[agent_idx])
-
-    def _plot_traffic_light(self, light_id, light_state):
-        light = self.traffic_lights[light_id]
-        x, y = light.center.x, light.center.y
-        psi = light.orientation
-        l, w = max(light.length,1.0), max(light.width,1.0)
-
-        if self._left_hand_coordinates:
-            x, psi = self._transform_point_to_left_hand_coordinate_frame(x,psi)
-
-        rect = Rectangle(
-            (x - l / 2, y - w / 2),
-            l,
-            w,
-            angle=psi * 180 / np.pi,
-            rotation_point="center",
-            fc=self.traffic_light_colors[light_state],
-            lw=0,
-        )
-        if light_id in self.traffic_light_boxes:
-            self.traffic_light_boxes[light_id].remove()
-        self.current_ax.add_patch(rect)
-        self.traffic_light_boxes[light_id] = rect
-
-    def _draw_xodr_map(self, ax, extras=False):
-        """
-        This function plots the parsed xodr map
-        the `odrplot` of `esmini` is used for plotting and parsing xodr
-        https: // esmini.github.io/  # _tools_overview
-        """
-        with open(self._open_drive) as f:
-            reader = csv.reader(f, skipinitialspace=True)
-            positions = list(reader)
-
-        ref_x = []
-        ref_y = []
-        ref_z = []
-        ref_h = []
-
-        lane_x = []
-        lane_y = []
-        lane_z = []
-        lane_h = []
-
-        border_x = []
-        border_y = []
-        border_z = []
-        border_h = []
-
-        road_id = []
-        road_id_x = []
-        road_id_y = []
-
-        road_start_dots_x = []
-        road_start_dots_y = []
-
-        road_end_dots_x = []
-        road_end_dots_y = []
-
-        lane_section_dots_x = []
-        lane_section_dots_y = []
-
-        arrow_dx = []
-        arrow_dy = []
-
-        current_road_id = None
-        current_lane_id = None
-        current_lane_section = None
-        new_lane_section = False
-
-        for i in range(len(positions) + 1):
-
-            if i < len(positions):
-                pos = positions[i]
-
-            # plot road id before going to next road
-            if i == len(positions) or (
-                pos[0] == "lane" and i > 0 and current_lane_id == "0"
-            ):
-
-                if current_lane_section == "0":
-                    road_id.append(int(current_road_id))
-                    index = int(len(ref_x[-1]) / 3.0)
-                    h = ref_h[-1][index]
-                    road_id_x.append(
-                        ref_x[-1][index]
-                        + (text_x_offset * math.cos(h) - text_y_offset * math.sin(h))
-                    )
-                    road_id_y.append(
-                        ref_y[-1][index]
-                        + (text_x_offset * math.sin(h) + text_y_offset * math.cos(h))
-                    )
-                    road_start_dots_x.append(ref_x[-1][0])
-                    road_start_dots_y.append(ref_y[-1][0])
-                    if len(ref_x) > 0:
-                        arrow_dx.append(ref_x[-1][1] - ref_x[-1][0])
-                        arrow_dy.append(ref_y[-1][1] - ref_y[-1][0])
-                    else:
-                        arrow_dx.append(0)
-                        arrow_dy.append(0)
-
-                lane_section_dots_x.append(ref_x[-1][-1])
-                lane_section_dots_y.append(ref_y[-1][-1])
-
-            if i == len(positions):
-                break
-
-            if pos[0] == "lane":
-                current_road_id = pos[1]
-                current_lane_section = pos[2]
-                current_lane_id = pos[3]
-                if pos[3] == "0":
-                    ltype = "ref"
-                    ref_x.append([])
-                    ref_y.append([])
-                    ref_z.append([])
-                    ref_h.append([])
-
-                elif pos[4] == "no-driving":
-                    ltype = "border"
-                    border_x.append([])
-                    border_y.append([])
-                    border_z.append([])
-                    border_h.append([])
-                else:
-                    ltype = "lane"
-                    lane_x.append([])
-                    lane_y.append([])
-                    lane_z.append([])
-                    lane_h.append([])
-            else:
-                if ltype == "ref":
-                    ref_x[-1].append(float(pos[0]))
-                    ref_y[-1].append(float(pos[1]))
-                    ref_z[-1].append(float(pos[2]))
-                    ref_h[-1].append(float(pos[3]))
-
-                elif ltype == "border":
-                    border_x[-1].append(float(pos[0]))
-                    border_y[-1].append(float(pos[1]))
-                    border_z[-1].append(float(pos[2]))
-                    border_h[-1].append(float(pos[3]))
-                else:
-                    lane_x[-1].append(float(pos[0]))
-                    lane_y[-1].append(float(pos[1]))
-                    lane_z[-1].append(float(pos[2]))
-                    lane_h[-1].append(float(pos[3]))
-
-        # plot driving lanes in blue
-        for i in range(len(lane_x)):
-            ax.plot(lane_x[i], lane_y[i], linewidth=1.0, color="#222222")
-
-        # plot road ref line segments
-        for i in range(len(ref_x)):
-            ax.plot(ref_x[i], ref_y[i], linewidth=2.0, color="#BB5555")
-
-        # plot border lanes in gray
-        for i in range(len(border_x)):
-            ax.plot(border_x[i], border_y[i], linewidth=1.0, color="#AAAAAA")
-
-        if extras:
-            # plot red dots indicating lane dections
-            for i in range(len(lane_section_dots_x)):
-                ax.plot(
-                    lane_section_dots_x[i],
-                    lane_section_dots_y[i],
-                    "o",
-                    ms=4.0,
-                    color="#BB5555",
-                )
-
-            for i in range(len(road_start_dots_x)):
-                # plot a yellow dot at start of each road
-                ax.plot(
-                    road_start_dots_x[i],
-                    road_start_dots_y[i],
-                    "o",
-                    ms=5.0,
-                    color="#BBBB33",
-                )
-                # and an arrow indicating road direction
-                ax.arrow(
-                    road_start_dots_x[i],
-                    road_start_dots_y[i],
-                    arrow_dx[i],
-                    arrow_dy[i],
-                    width=0.1,
-                    head_width=1.0,
-                    color="#BB5555",
-                )
-            # plot road id numbers
-            for i in range(len(road_id)):
-                ax.text(
-                    road_id_x[i],
-                    road_id_y[i],
-                    road_id[i],
-                    size=text_size,
-                    ha="center",
-                    va="center",
-                    color="#3333BB",
-                )
-
-        return None
-
+def __getattr__(name):
+    # The plotting tools import matplotlib, which is slow, so they are only loaded when first used.
+    if name == "ScenePlotter":
+        from invertedai.plotting import ScenePlotter
+        return ScenePlotter
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,107 @@
+"""
+Validation of the arguments of the API functions, following the validation policy of the
+session or of the call.
+"""
+
+import asyncio
+import inspect
+import functools
+import collections.abc
+from typing import Any, Callable, Union, get_args, get_origin, get_type_hints
+
+from pydantic import validate_call
+
+import invertedai as iai
+from invertedai.error import InvalidInput
+
+VALIDATION_POLICIES = ("full", "shallow", "none")
+
+
+def check_validation_policy(validation: str) -> str:
+    if validation not in VALIDATION_POLICIES:
+        raise InvalidInput(f"Invalid validation policy: {validation}, expected one of {', '.join(VALIDATION_POLICIES)}.")
+    return validation
+
+
+def _is_instance(value: Any, annotation: Any) -> bool:
+    """
+    Whether `value` already has the annotated type, looking at every element of lists and
+    dictionaries. Models are trusted to be valid.
+    """
+    if annotation is Any:
+        return True
+    if annotation is None or annotation is type(None):
+        return value is None
+    origin = get_origin(annotation)
+    if origin is Union:
+        return any(_is_instance(value, arg) for arg in get_args(annotation))
+    if origin is list:
+        (item,) = get_args(annotation) or (Any,)
+        return isinstance(value, list) and all(_is_instance(element, item) for element in value)
+    if origin is tuple:
+        return isinstance(value, tuple)
+    if origin is dict:
+        key, item = get_args(annotation) or (Any, Any)
+        if not isinstance(value, dict):
+            return False
+        return all(_is_instance(k, key) and _is_instance(v, item) for k, v in value.items())
+    if origin is collections.abc.Callable:
+        return callable(value)
+    if origin is not None:
+        return False
+    if annotation is float:
+        return isinstance(value, (float, int)) and not isinstance(value, bool)
+    if annotation is int:
+        return isinstance(value, int) and not isinstance(value, bool)
+    if isinstance(annotation, type):
+        return isinstance(value, annotation)
+    return False
+
+
+def validate_api_call(func: Callable) -> Callable:
+    """
+    Like :func:`pydantic.validate_call`, but following a validation policy, given by the
+    `validation` keyword argument of the call or else by :attr:`Session.validation` of the
+    `session` argument or of the global session:
+
+    - "full": all arguments are validated by pydantic.
+    - "shallow": arguments that already have the annotated types are passed as they are, without
+      validating the fields of models, and all arguments are validated otherwise. This is meant
+      for simulations passing the objects of a response back to the next call.
+    - "none": arguments are passed as they are.
+    """
+    validated = validate_call(config=dict(arbitrary_types_allowed=True))(func)
+    signature = inspect.signature(func)
+    annotations = get_type_hints(func)
+    parameters = [name for name in signature.parameters]
+    session_index = parameters.index("session") if "session" in parameters else None
+
+    def _select(args, kwargs) -> Callable:
+        validation = kwargs.pop("validation", None)
+        if validation is None:
+            session = kwargs.get("session")
+            if session is None and session_index is not None and len(args) > session_index:
+                session = args[session_index]
+            validation = (session if session is not None else iai.session).validation
+        if validation == "none":
+            return func
+        if validation == "shallow":
+            values = dict(zip(parameters, args), **kwargs)
+            if all(_is_instance(value, annotations.get(name, Any)) for name, value in values.items()):
+                return func
+            return validated
+        check_validation_policy(validation)
+        return validated
+
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            return await _select(args, kwargs)(*args, **kwargs)
+        wrapper = async_wrapper
+    else:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return _select(args, kwargs)(*args, **kwargs)
+
+    wrapper.raw_function = func
+    return wrapper
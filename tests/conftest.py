@@ -1,3 +1,89 @@
 import invertedai as iai
 import os
-iai.add_apikey(os.environ.get("IAI_API_KEY"))
+import pytest
+import threading
+from http.server import ThreadingHTTPServer
+
+from invertedai.utils import Session
+from tests.stand_in import StandInHandler, stand_in_drive, stand_in_drive_batch, stand_in_location_info
+
+# Tests against the stand-in server run without an API key
+if os.environ.get("IAI_API_KEY"):
+    iai.add_apikey(os.environ.get("IAI_API_KEY"))
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """
+    Directory of the on-disk caches of a test, including those of the global session, so that
+    tests do not read the caches of other tests or of the user.
+    """
+    monkeypatch.setenv("IAI_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(iai.session.location_cache, "directory", str(tmp_path / "location_info"))
+    return tmp_path
+
+
+@pytest.fixture
+def stand_in_server():
+    """
+    A :class:`StandInHandler` server echoing every request.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.statuses = []
+    server.details = []
+    server.connections = set()
+    server.content_encodings = []
+    server.headers = {}
+    server.delays = []
+    server.paths = []
+    server.bodies = []
+    server.binary = False
+    server.handlers = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def stand_in_api(stand_in_server):
+    """
+    The stand-in server answering drive, drive_batch and location_info like the IAI API.
+    """
+    stand_in_server.handlers.update({
+        "/drive": stand_in_drive,
+        "/drive_batch": stand_in_drive_batch,
+        "/location_info": stand_in_location_info,
+    })
+    return stand_in_server
+
+
+@pytest.fixture
+def make_session(stand_in_server, cache_dir):
+    """
+    Factory of sessions sending requests to the stand-in server, retrying without delay.
+    """
+    def _make_session(async_transport="asyncio"):
+        session = Session(async_transport=async_transport)
+        session.base_url = f"http://127.0.0.1:{stand_in_server.server_address[1]}"
+        session.base_backoff = 0.01
+        session.jitter_factor = None
+        session.adaptive_rate_limit = False
+        return session
+    return _make_session
+
+
+@pytest.fixture
+def session(make_session):
+    return make_session()
+
+
+@pytest.fixture
+def car_properties():
+    """
+    Factory of the properties of the given number of cars of the same size.
+    """
+    def _car_properties(num_agents=1):
+        return [iai.common.AgentProperties(length=4.5, width=2.0, rear_axis_offset=1.4, agent_type="car")] * num_agents
+    return _car_properties
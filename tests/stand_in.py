@@ -0,0 +1,164 @@
+"""
+Local stand-in for the IAI API, answering requests of sessions in the tests, and helpers
+shared by the tests.
+"""
+
+import json
+import math
+import zlib
+import time
+import random
+import struct
+import numpy as np
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qsl, urlsplit
+
+from invertedai.utils import BinarySerializer
+from invertedai.encoding import encode_array, decode_array
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Local stand-in for the IAI API which echoes the request body (or query parameters) back under "echo", or answers
+    with `server.handlers[path](body)` for the paths given there.
+    Status codes queued in `server.statuses` are returned, with the echo or the error detail
+    queued in `server.details`, before succeeding.
+    Binary bodies are only accepted if `server.binary` is set, in which case the arrays of
+    responses to binary requests are sent as buffers.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _respond(self, body):
+        self.server.connections.add(self.client_address)
+        self.server.paths.append(self.path)
+        if self.server.delays:
+            time.sleep(self.server.delays.pop(0))
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        handler = self.server.handlers.get(self.path.split("?")[0])
+        response = handler(body) if handler is not None and status == 200 else dict(echo=body, path=self.path)
+        if status != 200 and self.server.details:
+            response = dict(detail=self.server.details.pop(0))
+        content_type = "application/json"
+        if BinarySerializer.content_type in self.headers.get("Accept", ""):
+            content_type = BinarySerializer.content_type
+            payload = BinarySerializer().dumps({
+                key: np.array(value) if key in ("agent_states", "recurrent_states") else value
+                for key, value in response.items()
+            })
+        else:
+            payload = json.dumps(response).encode("utf-8")
+        self.send_response(status)
+        for header, value in self.server.headers.items():
+            self.send_header(header, value)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self._respond(dict(parse_qsl(urlsplit(self.path).query)))
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        encoding = self.headers.get("Content-Encoding")
+        self.server.content_encodings.append(encoding)
+        if encoding == "gzip":
+            body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+        elif encoding == "deflate":
+            body = zlib.decompress(body)
+        if self.headers.get("Content-Type") == BinarySerializer.content_type:
+            if not self.server.binary:
+                self.server.paths.append(self.path)
+                self.send_response(415)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = BinarySerializer().loads(body)
+        else:
+            body = json.loads(body)
+        self.server.bodies.append(body)
+        self._respond(body)
+
+
+def stand_in_drive(body):
+    """
+    Moves every agent forward at its speed for one 0.1s time step.
+    """
+    agent_states = [[x + 0.1 * speed * math.cos(orientation), y + 0.1 * speed * math.sin(orientation), orientation, speed]
+                     for x, y, orientation, speed in body["agent_states"]]
+    return dict(
+        agent_states=agent_states,
+        recurrent_states=body["recurrent_states"] or [[0.0] * 152 for _ in agent_states],
+        birdview=None,
+        infraction_indicators=[],
+        is_inside_supported_area=[True] * len(agent_states),
+        model_version="stand-in",
+        traffic_lights_states=body["traffic_lights_states"],
+        light_recurrent_states=body["light_recurrent_states"],
+    )
+
+
+def stand_in_drive_storing_properties(body):
+    """
+    Like `stand_in_drive`, acknowledging that the agent properties of a handle are stored.
+    """
+    response = stand_in_drive(body)
+    response["agent_properties_handle"] = body.get("agent_properties_handle")
+    return response
+
+
+def stand_in_drive_encoding_states(stored_states, reference_responses=False):
+    """
+    Like `stand_in_drive`, with binary encoded states decoded with the states in `stored_states`
+    and the states of the response stored there. With `reference_responses`, states of the
+    response are encoded against the stored states referenced by the request.
+    """
+    def _drive(body):
+        if body.get("state_encoding") != "binary":
+            return stand_in_drive(body)
+        decoded = dict(body)
+        for name in ("agent_states", "recurrent_states"):
+            if body[name] is not None:
+                reference = stored_states.get(body[name].get("reference"), {}).get(name)
+                decoded[name] = decode_array(body[name], reference).tolist()
+        response = stand_in_drive(decoded)
+        state_reference = str(len(stored_states))
+        stored_states[state_reference] = {name: np.array(response[name]) for name in ("agent_states", "recurrent_states")}
+        for name in ("agent_states", "recurrent_states"):
+            reference = body[name].get("reference") if reference_responses and body[name] is not None else None
+            response[name] = encode_array(
+                stored_states[state_reference][name],
+                (reference, stored_states[reference][name]) if reference is not None else None
+            )
+        response["state_reference"] = state_reference
+        return response
+    return _drive
+
+
+def stand_in_drive_batch(body):
+    return dict(responses=[stand_in_drive(request) for request in body["requests"]])
+
+
+def stand_in_location_info(body):
+    return dict(
+        version="stand-in",
+        max_agent_number=100,
+        bounding_polygon=[[-50, -50], [50, -50], [50, 50], [-50, 50]],
+        birdview_image=[],
+        osm_map=None,
+        map_origin=[0, 0],
+        map_center=[0, 0],
+        map_fov=100,
+        static_actors=[],
+    )
+
+
+def random_floats(n):
+    rng = random.Random(0)
+    values = [0.0, -0.0, 1e-7, 5e-324, 1.7976931348623157e308, 0.1, 1/3, 152.0]
+    values += [struct.unpack("<d", struct.pack("<Q", rng.getrandbits(62)))[0] for _ in range(n)]
+    values += [rng.uniform(-1000, 1000) for _ in range(n)]
+    return values
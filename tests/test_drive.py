@@ -1,13 +1,17 @@
 import sys
+import asyncio
 import pytest
+import numpy as np
 
 sys.path.insert(0, "../../")
 import invertedai as iai
 from invertedai.api.initialize import initialize
 from invertedai.api.drive import drive, DriveResponse
 from invertedai.api.location import location_info
-from invertedai.common import Point, AgentProperties
-from invertedai.error import InvalidRequestError
+from invertedai.common import Point, AgentProperties, AgentStateBatch, RecurrentStateBatch, RECURRENT_SIZE
+from invertedai.encoding import encode_array, decode_array
+from invertedai.error import InvalidRequestError, AuthenticationError, InvalidInput
+from tests.stand_in import stand_in_drive_storing_properties, stand_in_drive_encoding_states, random_floats
 
 
 def recurrent_states_helper(states_to_extend):
@@ -402,4 +406,316 @@ def test_mock_drive(
         agent_count,
         simulation_length
     )
-    iai.api.config.mock_api = False
\ No newline at end of file
+    iai.api.config.mock_api = False
+
+
+@pytest.fixture
+def drive_requests(car_properties):
+    """
+    Factory of requests driving a single car, starting at x=i for the i-th request.
+    """
+    def _drive_requests(num_requests):
+        agent_properties = car_properties()
+        return [
+            iai.DriveRequest(
+                location="carla:Town03",
+                agent_states=[iai.common.AgentState.fromlist([float(i), 0.0, 0.0, 10.0])],
+                agent_properties=agent_properties
+            )
+            for i in range(num_requests)
+        ]
+    return _drive_requests
+
+
+def test_drive_batch(stand_in_api, session, drive_requests):
+    responses = iai.drive_batch(drive_requests(5), batch_size=2, session=session)
+    assert [r.agent_states[0].center.x for r in responses] == pytest.approx([1.0, 2.0, 3.0, 4.0, 5.0])
+    assert stand_in_api.paths == ["/drive_batch"] * 3
+
+
+def test_drive_batch_fallback(stand_in_api, session, drive_requests):
+    del stand_in_api.handlers["/drive_batch"]
+    stand_in_api.statuses = [404]
+    responses = iai.drive_batch(drive_requests(3), max_concurrency=2, session=session)
+    assert [r.agent_states[0].center.x for r in responses] == pytest.approx([1.0, 2.0, 3.0])
+    assert stand_in_api.paths == ["/drive_batch"] + ["/drive"] * 3
+    # The missing endpoint is remembered for the session
+    iai.drive_batch(drive_requests(2), session=session)
+    assert stand_in_api.paths[4:] == ["/drive"] * 2
+
+
+@pytest.mark.parametrize("status", [403, 405])
+def test_drive_batch_fallback_from_gateway(stand_in_api, session, drive_requests, status):
+    # Gateways answer unknown routes with statuses which are otherwise retried
+    session.status_force_list = session.status_force_list + [405]
+    stand_in_api.statuses = [status]
+    responses = iai.drive_batch(drive_requests(3), batch_size=2, session=session)
+    assert [r.agent_states[0].center.x for r in responses] == pytest.approx([1.0, 2.0, 3.0])
+    # A 403 is confirmed not to reject the API key with one /drive call
+    assert stand_in_api.paths == ["/drive_batch"] + ["/drive"] * (4 if status == 403 else 3)
+
+
+def test_drive_batch_rejected_api_key(stand_in_api, session, drive_requests):
+    stand_in_api.statuses = [403, 403]
+    with pytest.raises(AuthenticationError):
+        iai.drive_batch(drive_requests(3), session=session)
+    assert stand_in_api.paths == ["/drive_batch", "/drive"]
+    assert session.server_supports("drive_batch") is None
+
+
+def test_drive_batch_probe_retried(stand_in_api, session, drive_requests):
+    stand_in_api.statuses = [503]
+    responses = iai.drive_batch(drive_requests(3), batch_size=2, session=session)
+    assert [r.agent_states[0].center.x for r in responses] == pytest.approx([1.0, 2.0, 3.0])
+    assert stand_in_api.paths == ["/drive_batch"] * 3
+    # Statuses of a missing endpoint are retried once the endpoint answered
+    stand_in_api.statuses = [403]
+    iai.drive_batch(drive_requests(1), session=session)
+    assert stand_in_api.paths[3:] == ["/drive_batch"] * 2
+
+
+def test_gather_or_cancel():
+    from invertedai.api.drive import _gather_or_cancel
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def failing():
+        raise ValueError("failed")
+
+    async def run():
+        with pytest.raises(ValueError):
+            await _gather_or_cancel([slow(), failing()])
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert cancelled == [True]
+
+
+def test_drive_stream(stand_in_api, session, drive_requests):
+    drive_request = drive_requests(1)[0]
+    ego_state = iai.common.AgentState.fromlist([100.0, 0.0, 0.0, 0.0])
+    stream = iai.drive_stream(
+        location=drive_request.location,
+        agent_states=drive_request.agent_states * 2,
+        agent_properties=drive_request.agent_properties * 2,
+        num_steps=3,
+        update_inputs=lambda response: dict(agent_states=response.agent_states[:1] + [ego_state]),
+        session=session
+    )
+    responses = list(stream)
+    assert [r.agent_states[0].center.x for r in responses] == pytest.approx([1.0, 2.0, 3.0])
+    assert [r.agent_states[1].center.x for r in responses] == pytest.approx([1.0, 100.0, 100.0])
+    assert stand_in_api.paths == ["/drive"] * 3
+
+
+def test_agent_state_batch(stand_in_api, session, car_properties):
+    agent_states = [iai.common.AgentState.fromlist([x, y, 0.0, 10.0]) for x, y in [(0, 0), (200, 0), (0, 200)]]
+    agent_properties = car_properties(3)
+    batch = AgentStateBatch.from_agent_states(agent_states)
+    assert batch[1] == agent_states[1] and list(batch) == agent_states
+    response = iai.drive(location="carla:Town03", agent_states=batch, agent_properties=agent_properties, session=session)
+    expected = iai.drive(location="carla:Town03", agent_states=agent_states, agent_properties=agent_properties, session=session)
+    assert isinstance(response.agent_states, AgentStateBatch)
+    assert response.agent_states.to_agent_states() == expected.agent_states
+    large_response = iai.large_drive(location="carla:Town03", agent_states=batch, agent_properties=agent_properties,
+                                     single_call_agent_limit=1, session=session)
+    assert isinstance(large_response.agent_states, AgentStateBatch)
+    assert large_response.agent_states.x.tolist() == pytest.approx([1.0, 201.0, 1.0])
+
+
+def test_recurrent_state_batch(stand_in_api, session, car_properties):
+    agent_states = AgentStateBatch.fromlist([[0, 0, 0, 10], [200, 0, 0, 10], [0, 200, 0, 10]])
+    agent_properties = car_properties(3)
+    recurrent_states = RecurrentStateBatch.fromlist(random_floats(3 * RECURRENT_SIZE)[:3 * RECURRENT_SIZE])
+    assert recurrent_states[2] == iai.common.RecurrentState.fromval(recurrent_states.array[2].tolist())
+    response = iai.drive(location="carla:Town03", agent_states=agent_states, agent_properties=agent_properties,
+                         recurrent_states=recurrent_states, session=session)
+    assert isinstance(response.recurrent_states, RecurrentStateBatch)
+    assert response.recurrent_states.array.tobytes() == recurrent_states.array.tobytes()
+    large_response = iai.large_drive(location="carla:Town03", agent_states=agent_states, agent_properties=agent_properties,
+                                     recurrent_states=recurrent_states, single_call_agent_limit=1, session=session)
+    assert large_response.recurrent_states.array.tobytes() == recurrent_states.array.tobytes()
+
+
+def test_unvalidated_responses(stand_in_api, session, car_properties):
+    agent_states = [iai.common.AgentState.fromlist([x, 0.0, 0.0, 10.0]) for x in (0.0, 200.0)]
+    agent_properties = car_properties(2)
+    kwargs = dict(location="carla:Town03", agent_states=agent_states, agent_properties=agent_properties,
+                  traffic_lights_states={7: "green"}, light_recurrent_states=[iai.common.LightRecurrentState(state=1, time_remaining=2)],
+                  session=session)
+    expected = iai.drive(**kwargs)
+    session.validate_responses = False
+    response = iai.drive(**kwargs)
+    assert response == expected
+    assert response.traffic_lights_states == {7: iai.common.TrafficLightState.green}
+    assert iai.large_drive(**kwargs, single_call_agent_limit=1).agent_states == expected.agent_states
+
+
+def test_agent_properties_handle(stand_in_api, session, drive_requests):
+    stand_in_api.handlers["/drive"] = stand_in_drive_storing_properties
+    drive_request = drive_requests(1)[0]
+    handle = iai.common.AgentPropertiesHandle(drive_request.agent_properties)
+    for _ in range(2):
+        iai.drive(location=drive_request.location, agent_states=drive_request.agent_states,
+                  agent_properties=handle, session=session)
+    assert [body["agent_properties_handle"] for body in stand_in_api.bodies] == [handle.key] * 2
+    assert stand_in_api.bodies[0]["agent_properties"] == handle.serialized
+    assert stand_in_api.bodies[1]["agent_properties"] is None
+    # The server forgot the properties, they are sent again
+    stand_in_api.statuses = [404]
+    response = iai.drive(location=drive_request.location, agent_states=drive_request.agent_states,
+                         agent_properties=handle, session=session)
+    assert response.agent_states[0].center.x == pytest.approx(1.0)
+    assert [body["agent_properties"] for body in stand_in_api.bodies[2:]] == [None, handle.serialized]
+
+
+def test_agent_properties_handle_unsupported(stand_in_api, session, drive_requests):
+    drive_request = drive_requests(1)[0]
+    handle = iai.common.AgentPropertiesHandle(drive_request.agent_properties)
+    for _ in range(2):
+        iai.drive(location=drive_request.location, agent_states=drive_request.agent_states,
+                  agent_properties=handle, session=session)
+    assert [body["agent_properties"] for body in stand_in_api.bodies] == [handle.serialized] * 2
+    assert "agent_properties_handle" not in stand_in_api.bodies[1]
+
+
+def test_agent_properties_handle_rejected(stand_in_api, session, make_session, drive_requests):
+    drive_request = drive_requests(1)[0]
+    handle = iai.common.AgentPropertiesHandle(drive_request.agent_properties)
+    # A strict server rejecting the unknown field
+    stand_in_api.statuses = [422]
+    stand_in_api.details = [[dict(loc=["body", "agent_properties_handle"], msg="extra fields not permitted")]]
+    response = iai.drive(location=drive_request.location, agent_states=drive_request.agent_states,
+                         agent_properties=handle, session=session)
+    assert response.agent_states[0].center.x == pytest.approx(1.0)
+    assert [body.get("agent_properties_handle") for body in stand_in_api.bodies] == [handle.key, None]
+    iai.drive(location=drive_request.location, agent_states=drive_request.agent_states,
+              agent_properties=handle, session=session)
+    assert "agent_properties_handle" not in stand_in_api.bodies[2]
+
+    # Other input errors are raised without sending the request again, and the handle is still used
+    session = make_session()
+    stand_in_api.statuses = [422]
+    stand_in_api.details = [[dict(loc=["body", "agent_states", 0], msg="value is not a valid list")]]
+    with pytest.raises(InvalidRequestError):
+        iai.drive(location=drive_request.location, agent_states=drive_request.agent_states,
+                  agent_properties=handle, session=session)
+    assert len(stand_in_api.bodies) == 4
+    iai.drive(location=drive_request.location, agent_states=drive_request.agent_states,
+              agent_properties=handle, session=session)
+    assert stand_in_api.bodies[-1]["agent_properties_handle"] == handle.key
+
+
+def test_agent_properties_handle_is_current(car_properties):
+    agent_properties = car_properties()
+    handle = iai.common.AgentPropertiesHandle(agent_properties)
+    assert handle.is_current()
+    agent_properties[0].waypoint = iai.common.Point(x=1.0, y=2.0)
+    assert not handle.is_current()
+    assert not handle.is_current(agent_properties + agent_properties)
+    assert iai.common.AgentPropertiesHandle(agent_properties).is_current(agent_properties)
+
+
+def test_encode_array_round_trip():
+    reference = np.array(random_floats(12)[:12]).reshape(3, 4)
+    array = reference.copy()
+    array[0] = [np.nan, -0.0, np.inf, 1e-300]
+    assert decode_array(encode_array(array)).tobytes() == array.tobytes()
+    encoded = encode_array(array, ("ref", reference))
+    assert encoded["reference"] == "ref"
+    assert decode_array(encoded, reference).tobytes() == array.tobytes()
+    with pytest.raises(InvalidInput):
+        decode_array(encoded)
+    # References of another shape are not used
+    assert "reference" not in encode_array(array[:2], ("ref", reference))
+
+
+def test_binary_state_encoding(stand_in_api, session, car_properties):
+    session.state_encoding = "binary"
+    stored_states = {}
+    stand_in_api.handlers["/drive"] = stand_in_drive_encoding_states(stored_states)
+    agent_states = AgentStateBatch.fromlist([[200.0 * i, 0.0, 0.0, 10.0] for i in range(50)])
+    agent_properties = car_properties(50)
+    response = iai.drive(location="carla:Town03", agent_states=agent_states, agent_properties=agent_properties, session=session)
+    assert response.agent_states.x.tolist() == pytest.approx([200.0 * i + 1.0 for i in range(50)])
+    # Only the ego agent is changed by the client, the other states are sent as an empty difference
+    states = response.agent_states
+    states[0] = iai.common.AgentState.fromlist([-5.0, 0.0, 0.0, 0.0])
+    response = iai.drive(location="carla:Town03", agent_states=states, agent_properties=agent_properties,
+                         recurrent_states=response.recurrent_states, session=session)
+    assert response.agent_states.x.tolist() == pytest.approx([-5.0] + [200.0 * i + 2.0 for i in range(1, 50)])
+    first_request, second_request = stand_in_api.bodies
+    assert second_request["agent_states"]["reference"] == "0"
+    assert len(second_request["agent_states"]["data"]) < len(first_request["agent_states"]["data"]) / 4
+    # The server forgot the stored states, they are sent again
+    stored_states.clear()
+    stand_in_api.statuses = [404]
+    response = iai.drive(location="carla:Town03", agent_states=response.agent_states, agent_properties=agent_properties,
+                         recurrent_states=response.recurrent_states, session=session)
+    assert response.agent_states.x.tolist() == pytest.approx([-5.0] + [200.0 * i + 3.0 for i in range(1, 50)])
+    assert "reference" not in stand_in_api.bodies[-1]["agent_states"]
+
+
+def test_binary_state_encoding_unsupported(stand_in_api, session, make_session, drive_requests):
+    session.state_encoding = "binary"
+    drive_request = drive_requests(1)[0]
+    stand_in_api.statuses = [422]
+    stand_in_api.details = [[dict(loc=["body", "state_encoding"], msg="extra fields not permitted")]]
+    for _ in range(2):
+        response = iai.drive(location=drive_request.location, agent_states=drive_request.agent_states,
+                             agent_properties=drive_request.agent_properties, session=session)
+        assert response.agent_states[0].center.x == pytest.approx(1.0)
+    assert [body.get("state_encoding") for body in stand_in_api.bodies] == ["binary", None, None]
+
+    # Other input errors are raised without sending the request again, and states are still encoded
+    session = make_session()
+    session.state_encoding = "binary"
+    stand_in_api.handlers["/drive"] = stand_in_drive_encoding_states({})
+    stand_in_api.statuses = [422]
+    stand_in_api.details = [[dict(loc=["body", "location"], msg="unknown location")]]
+    with pytest.raises(InvalidRequestError):
+        iai.drive(location=drive_request.location, agent_states=drive_request.agent_states,
+                  agent_properties=drive_request.agent_properties, session=session)
+    assert len(stand_in_api.bodies) == 4
+    iai.drive(location=drive_request.location, agent_states=drive_request.agent_states,
+              agent_properties=drive_request.agent_properties, session=session)
+    assert stand_in_api.bodies[-1]["state_encoding"] == "binary"
+
+
+def test_only_successful_fallback_recorded(stand_in_api, session, drive_requests):
+    session.state_encoding = "binary"
+    stand_in_api.handlers["/drive"] = stand_in_drive_encoding_states({})
+    drive_request = drive_requests(1)[0]
+    handle = iai.common.AgentPropertiesHandle(drive_request.agent_properties)
+    stand_in_api.statuses = [422]
+    stand_in_api.details = [[dict(loc=["body", "agent_properties_handle"], msg="extra fields not permitted")]]
+    iai.drive(location=drive_request.location, agent_states=drive_request.agent_states,
+              agent_properties=handle, session=session)
+    # Sending the properties was enough, binary encoded states are still used
+    assert [(body.get("agent_properties_handle"), body.get("state_encoding")) for body in stand_in_api.bodies] \
+        == [(handle.key, "binary"), (None, "binary")]
+    assert session.server_supports("stored_properties") is False
+    assert session.server_supports("state_encoding") is None
+
+    session.base_url = session.base_url + "/"
+    assert session.server_supports("stored_properties") is None
+
+
+def test_binary_state_encoding_referenced_response(stand_in_api, session, car_properties):
+    session.state_encoding = "binary"
+    stand_in_api.handlers["/drive"] = stand_in_drive_encoding_states({}, reference_responses=True)
+    agent_states = AgentStateBatch.fromlist([[10.0 * i, 0.0, 0.0, 10.0] for i in range(5)])
+    agent_properties = car_properties(5)
+    recurrent_states = None
+    for step in range(1, 4):
+        response = iai.drive(location="carla:Town03", agent_states=agent_states, agent_properties=agent_properties,
+                             recurrent_states=recurrent_states, session=session)
+        agent_states, recurrent_states = response.agent_states, response.recurrent_states
+        assert agent_states.x.tolist() == pytest.approx([10.0 * i + step for i in range(5)])
+    assert stand_in_api.bodies[-1]["agent_states"]["reference"] == "1"
@@ -0,0 +1,15 @@
+import sys
+import subprocess
+
+import pytest
+
+
+@pytest.mark.parametrize("module", ["matplotlib", "PIL", "tqdm"])
+def test_import_does_not_load_optional_modules(module):
+    statement = f"import sys, invertedai; assert {module!r} not in sys.modules"
+    subprocess.run([sys.executable, "-c", statement], check=True)
+
+
+def test_scene_plotter_is_loaded_on_use():
+    statement = "import sys, invertedai as iai; iai.utils.ScenePlotter; assert 'matplotlib' in sys.modules"
+    subprocess.run([sys.executable, "-c", statement], check=True)
@@ -1,5 +1,8 @@
 import sys
+import math
+import random
 import pytest
+import numpy as np
 
 sys.path.insert(0, "../../")
 import invertedai as iai
@@ -7,6 +10,7 @@ from invertedai.common import Point, AgentProperties
 from invertedai.api.initialize import initialize, InitializeResponse
 from invertedai.api.location import location_info
 from invertedai.error import InvalidRequestError
+from tests.stand_in import stand_in_location_info
 
 positive_tests_old = [
     ("canada:ubc_roundabout",
@@ -475,4 +479,129 @@ def test_mock_initialize_old(
         get_infractions, 
         agent_count
     )
-    iai.api.config.mock_api = False
\ No newline at end of file
+    iai.api.config.mock_api = False
+
+
+def test_drivable_area_index():
+    # Drivable left half, in which lies the only static actor
+    birdview = np.zeros((100, 200, 3), dtype=np.uint8)
+    birdview[:, :100] = 255
+    static_actor_centers = [iai.common.Point(x=-10.0, y=0.0)]
+    index = iai.DrivableAreaIndex.from_birdview(birdview, (0.0, 0.0), 100, static_actor_centers)
+    assert not index.left_hand_coordinates
+    assert index.drivable_fraction(iai.common.Point(x=-25.0, y=0.0), 50) == pytest.approx(1.0)
+    assert index.drivable_fraction(iai.common.Point(x=0.0, y=10.0), 20) == pytest.approx(0.5)
+    assert index.drivable_fraction(iai.common.Point(x=25.0, y=0.0), 50) == pytest.approx(0.0)
+    # Regions partly outside of the index
+    assert index.drivable_fraction(iai.common.Point(x=-50.0, y=0.0), 20) == pytest.approx(0.5)
+    mirrored = iai.DrivableAreaIndex.from_birdview(birdview, (0.0, 0.0), 100, [iai.common.Point(x=10.0, y=0.0)])
+    assert mirrored.left_hand_coordinates
+    assert mirrored.drivable_fraction(iai.common.Point(x=25.0, y=0.0), 50) == pytest.approx(1.0)
+
+
+def test_drivable_area_from_single_birdview(stand_in_api, session, make_session, cache_dir):
+    PImage = pytest.importorskip("PIL.Image")
+    import io
+    pixels = np.zeros((100, 100, 3), dtype=np.uint8)
+    pixels[:, :50] = 255
+    stream = io.BytesIO()
+    PImage.fromarray(pixels).save(stream, format="PNG")
+    # A static actor on the drivable left half tells that x is not mirrored
+    static_actors = [dict(actor_id=0, agent_type="traffic_light", x=-10.0, y=0.0, orientation=0.0,
+                          length=None, width=None, dependant=None)]
+    stand_in_api.handlers["/location_info"] = lambda body: dict(
+        stand_in_location_info(body), birdview_image=list(stream.getvalue()), map_fov=100, static_actors=static_actors
+    )
+    regions = [iai.large.common.Region.create_square_region(center=iai.common.Point(x=x, y=y), size=25)
+               for x in (-37.5, -12.5, 12.5, 37.5) for y in (-37.5, -12.5, 12.5, 37.5)]
+    new_regions = iai.get_number_of_agents_per_region_by_drivable_area(
+        location="carla:Town03", regions=regions, total_num_agents=20, random_seed=0,
+        display_progress_bar=False, session=session
+    )
+    assert len(stand_in_api.paths) == 1
+    assert sum(len(region.agent_properties) for region in new_regions) == 20
+    assert all(region.center.x < 0 for region in new_regions)
+    # The index is cached on disk with the responses of location_info, and cleared with them
+    iai.DrivableAreaIndex.for_regions("carla:Town03", regions, session=make_session())
+    assert len(stand_in_api.paths) == 1
+    assert [path.suffix for path in (cache_dir / "location_info").iterdir()].count(".npz") == 1
+    session.location_cache.clear()
+    iai.DrivableAreaIndex.for_regions("carla:Town03", regions, session=session)
+    assert len(stand_in_api.paths) == 2
+
+    # Without static actors, the layout is unknown and a birdview of each region is used
+    static_actors.clear()
+    session.location_cache_size = 0
+    index = iai.DrivableAreaIndex.from_location("carla:Town03", (0.0, 0.0), 100, session=session)
+    assert not index.layout_known
+    iai.get_number_of_agents_per_region_by_drivable_area(
+        location="carla:Town03", regions=regions, total_num_agents=20, random_seed=0,
+        display_progress_bar=False, session=session
+    )
+    assert len(stand_in_api.paths) == 4 + len(regions)
+
+
+def test_drivable_area_from_region_birdviews(stand_in_api, make_session):
+    PImage = pytest.importorskip("PIL.Image")
+    import io
+    encoded_images = {}
+    for value in (0, 255):
+        stream = io.BytesIO()
+        PImage.fromarray(np.full((10, 10, 3), value, dtype=np.uint8)).save(stream, format="PNG")
+        encoded_images[value] = list(stream.getvalue())
+
+    def region_location_info(params):
+        # Only the left half of the map is drivable
+        x = float(params["rendering_center"].split(",")[0])
+        return dict(stand_in_location_info(params), birdview_image=encoded_images[255 if x < 0 else 0])
+
+    stand_in_api.handlers["/location_info"] = region_location_info
+    regions = [iai.large.common.Region.create_square_region(center=iai.common.Point(x=x, y=y), size=25)
+               for x in (-37.5, -12.5, 12.5, 37.5) for y in (-37.5, -12.5, 12.5, 37.5)]
+    results = []
+    for max_concurrency in (1, 5):
+        session = make_session()
+        session.location_cache_size = 0
+        new_regions = iai.get_number_of_agents_per_region_by_drivable_area(
+            location="carla:Town03", regions=regions, total_num_agents=20, random_seed=0, display_progress_bar=False,
+            session=session, per_region_birdviews=True, max_concurrency=max_concurrency
+        )
+        assert all(region.center.x < 0 for region in new_regions)
+        results.append([(region.center.x, region.center.y, len(region.agent_properties)) for region in new_regions])
+    assert len(stand_in_api.paths) == 2 * len(regions)
+    assert results[0] == results[1]
+
+
+def test_agent_grid_matches_all_regions():
+    from invertedai.large.initialize import _AgentGrid, _inside_fov, AGENT_SCOPE_FOV_BUFFER
+    from invertedai.large.common import REGION_MAX_SIZE
+    rng = random.Random(0)
+    regions = []
+    for x in range(-150, 200, 50):
+        for y in (-50, 0, 50, 300):
+            states = [iai.common.AgentState.fromlist([x + rng.uniform(-30, 30), y + rng.uniform(-30, 30), 0.0, 0.0])
+                      for _ in range(rng.randint(0, 4))]
+            properties = [iai.common.AgentProperties(agent_type="car") for _ in range(len(states) + 1)]
+            regions.append(iai.large.common.Region(center=iai.common.Point(x=x, y=y), size=50,
+                                                   agent_states=states, agent_properties=properties))
+
+    def nearby_states(i):
+        # Agents of all other regions near enough, filtered by the scope of the region
+        center = regions[i].center
+        return [state for j, other in enumerate(regions) if j != i
+                and math.hypot(center.x - other.center.x, center.y - other.center.y) <= REGION_MAX_SIZE + AGENT_SCOPE_FOV_BUFFER
+                for state in other.agent_states
+                if _inside_fov(center=center, agent_scope_fov=regions[i].size + AGENT_SCOPE_FOV_BUFFER, point=state.center)]
+
+    grid = _AgentGrid(regions, cell_size=20)
+    for i in range(len(regions)):
+        states, properties = grid.get_nearby_agents(region_index=i, agent_scope_fov=regions[i].size + AGENT_SCOPE_FOV_BUFFER)
+        assert [id(state) for state in states] == [id(state) for state in nearby_states(i)]
+        assert len(properties) == len(states)
+        regions[i].clear_agents()
+        if i % 2 == 0:
+            regions[i].insert_all_agent_details(
+                iai.common.AgentState.fromlist([regions[i].center.x, regions[i].center.y, 0.0, 0.0]),
+                iai.common.AgentProperties(agent_type="car"), None
+            )
+        grid.update(i)
@@ -1,4 +1,5 @@
 import sys
+import time
 import pytest
 
 sys.path.insert(0, "../../")
@@ -21,3 +22,40 @@ def test_mock_location_info():
     location = "carla:Town03"
     _ = iai.location_info(location=location, rendering_center=None, rendering_fov=800)
     iai.api.config.mock_api = False
+
+
+def test_location_cache(stand_in_api, session, make_session):
+    for _ in range(2):
+        response = iai.location_info(location="carla:Town03", rendering_fov=100, session=session)
+        assert response.map_fov == 100 and response.bounding_polygon[0].x == -50
+    assert len(stand_in_api.paths) == 1
+    # Other processes read the cache from disk
+    iai.location_info(location="carla:Town03", rendering_fov=100, session=make_session())
+    assert len(stand_in_api.paths) == 1
+    iai.location_info(location="carla:Town03", rendering_fov=200, session=session)
+    iai.location_info(location="carla:Town03", rendering_fov=100, session=session, use_cache=False)
+    assert len(stand_in_api.paths) == 3
+    session.location_cache_size = 0
+    iai.location_info(location="carla:Town03", rendering_fov=100, session=session)
+    assert len(stand_in_api.paths) == 4
+
+    # Responses which cannot be parsed are not cached
+    session.location_cache_size = 10 ** 7
+    stand_in_location = stand_in_api.handlers["/location_info"]
+    stand_in_api.handlers["/location_info"] = lambda params: dict(stand_in_location(params), map_center=None)
+    with pytest.raises(TypeError):
+        iai.location_info(location="carla:Town04", session=session)
+    stand_in_api.handlers["/location_info"] = stand_in_location
+    iai.location_info(location="carla:Town04", session=session)
+    assert len(stand_in_api.paths) == 6
+
+
+def test_location_cache_eviction(tmp_path):
+    cache = iai.cache.LocationInfoCache(max_bytes=1000, memory_entries=1, directory=str(tmp_path / "location_info"))
+    response = dict(version="stand-in", birdview_image=[1] * 300)
+    for key in ("a", "b", "c"):
+        cache.put(key, response)
+        time.sleep(0.01)
+    # Each entry takes about 450 bytes, the least recently used one is evicted
+    assert sorted(path.name for path in (tmp_path / "location_info").iterdir()) == ["b.json", "c.json"]
+    assert cache.get("a") is None and cache.get("b")["birdview_image"] == bytes([1] * 300)
@@ -0,0 +1,534 @@
+import sys
+import json
+import math
+import time
+import struct
+import asyncio
+import threading
+import pytest
+import numpy as np
+from typing import List, Optional
+
+sys.path.insert(0, "../../")
+import invertedai as iai
+from invertedai.utils import Session, JSONSerializer, BinarySerializer, get_serializer
+from invertedai.common import AgentStateBatch
+from invertedai.retry import RetryScheduler, RateLimiter, InFlightLimiter
+from invertedai.validation import validate_api_call
+from invertedai.error import RateLimitError, InvalidRequestError, RequestTimeoutError, AuthenticationError, InvalidInput
+from tests.stand_in import random_floats
+
+
+@pytest.mark.parametrize("async_transport", ["asyncio", "thread"])
+def test_async_request_round_trip(make_session, async_transport):
+    session = make_session(async_transport)
+    data = dict(location="carla:Town03", agent_states=[[1.0, 2.5, 0.1, 3.0]], random_seed=None)
+    sync_response = session.request(model="drive", data=data)
+    async_response = session.run_async(session.async_request(model="drive", data=data))
+    assert sync_response == async_response
+    assert async_response["echo"] == data
+    assert async_response["path"] == "/drive"
+
+
+def test_async_request_params(session):
+    params = {"location": "carla:Town03", "include_map_source": False, "rendering_fov": None}
+    response = session.run_async(session.async_request(model="location_info", params=params))
+    assert response["path"] == "/location_info?location=carla%3ATown03&include_map_source=False"
+
+
+def test_asyncio_transport_uses_proxies(stand_in_server, session, monkeypatch):
+    for name in ("NO_PROXY", "no_proxy", "ALL_PROXY", "all_proxy"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("HTTP_PROXY", f"http://127.0.0.1:{stand_in_server.server_address[1]}")
+    # Only reachable through the proxy
+    session.base_url = "http://iai.invalid"
+    response = session.run_async(session.async_request(model="drive", data=dict(i=1)))
+    assert response["echo"] == dict(i=1)
+    assert stand_in_server.paths == ["http://iai.invalid/drive"]
+
+
+def test_asyncio_transport_tls_settings(tmp_path):
+    import ssl
+    from invertedai.transport import AsyncioTransport
+    transport = AsyncioTransport()
+    assert transport._get_ssl_context().verify_mode == ssl.CERT_REQUIRED
+    unverified = transport._get_ssl_context(verify=False)
+    assert unverified.verify_mode == ssl.CERT_NONE and not unverified.check_hostname
+    with pytest.raises((OSError, ssl.SSLError)):
+        transport._get_ssl_context(verify=str(tmp_path / "missing.pem"))
+    assert transport._get_ssl_context() is transport._get_ssl_context(verify=True)
+
+
+def test_async_request_reuses_connections(stand_in_server, session):
+    session.pool_maxsize = 2
+    session.pool_block = True
+
+    async def fire(n):
+        return await asyncio.gather(*[session.async_request(model="drive", data=dict(i=i)) for i in range(n)])
+
+    for _ in range(3):
+        responses = session.run_async(fire(8))
+        assert [r["echo"]["i"] for r in responses] == list(range(8))
+    assert len(stand_in_server.connections) <= 2
+    stats = session.connection_stats
+    assert stats.requests == 24
+    assert stats.new_connections <= 2
+    assert stats.pool_hits == stats.requests - stats.new_connections
+    assert stats.in_flight == 0
+
+
+def test_max_in_flight(stand_in_server, session):
+    session.max_in_flight = 3
+
+    async def fire(n):
+        return await asyncio.gather(*[session.async_request(model="drive", data=dict(i=i)) for i in range(n)])
+
+    session.run_async(fire(10))
+    assert session.connection_stats.peak_in_flight <= 3
+
+    # The limit is shared by synchronous and async requests
+    stand_in_server.delays = [0.02] * 12
+    threads = [threading.Thread(target=session.request, kwargs=dict(model="drive", data=dict(i=i))) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    session.run_async(fire(6))
+    for thread in threads:
+        thread.join()
+    assert session.connection_stats.peak_in_flight <= 3
+    assert session.connection_stats.in_flight == 0
+
+
+def test_in_flight_limiter_cancelled_waiters():
+    limiter = InFlightLimiter(1)
+
+    async def run():
+        limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.async_acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        limiter.release()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0)
+        # The slot of the cancelled waiter is free again
+        await asyncio.wait_for(limiter.async_acquire(), timeout=1)
+        limiter.release()
+
+    asyncio.run(run())
+    assert limiter._in_flight == 0
+
+
+def test_reconfigured_pools_are_closed(session):
+    session.request(model="drive", data=dict(i=0))
+    adapter = session.session.adapters["http://"]
+    pool = adapter.poolmanager.pools[adapter.poolmanager.pools.keys().pop()]
+    assert pool.pool.qsize() > 0
+    session.pool_maxsize = 4
+    assert session.session.adapters["http://"] is not adapter
+    assert len(adapter.poolmanager.pools) == 0
+    session.request(model="drive", data=dict(i=1))
+
+
+def test_sync_connection_stats(session):
+    for i in range(5):
+        session.request(model="drive", data=dict(i=i))
+    stats = session.connection_stats.as_dict()
+    assert stats["requests"] == 5
+    assert stats["new_connections"] == 1
+    assert stats["pool_hits"] == 4
+
+
+def test_async_request_retries(stand_in_server, session):
+    stand_in_server.statuses = [429, 503]
+    response = session.run_async(session.async_request(model="drive", data=dict(i=1)))
+    assert response["echo"] == dict(i=1)
+
+    session.max_retries = 1
+    stand_in_server.statuses = [429, 429]
+    with pytest.raises(RateLimitError):
+        session.run_async(session.async_request(model="drive", data=dict(i=1)))
+
+    stand_in_server.statuses = [422]
+    with pytest.raises(InvalidRequestError):
+        session.run_async(session.async_request(model="drive", data=dict(i=1)))
+
+
+def test_request_observers(stand_in_server, session):
+    recorded = []
+    session.add_observer(recorded.append)
+    stand_in_server.statuses = [503]
+    data = dict(recurrent_states=[[0.1] * 152])
+    response = session.request(model="drive", data=data, response_parser=lambda r: r["echo"])
+    assert response == data
+    session.run_async(session.async_request(model="drive", data=data))
+    stand_in_server.statuses = [422]
+    with pytest.raises(InvalidRequestError):
+        session.request(model="drive", data=data)
+    session.remove_observer(recorded.append)
+    session.request(model="drive", data=data)
+
+    assert len(recorded) == 3
+    sync_metrics, async_metrics, failed_metrics = recorded
+    assert sync_metrics.model == "drive"
+    assert sync_metrics.retries == 1
+    assert sync_metrics.status_code == 200
+    assert sync_metrics.payload_bytes == len(session.serializer.dumps(data))
+    assert sync_metrics.response_bytes > sync_metrics.payload_bytes
+    assert sync_metrics.model_time > 0
+    assert sync_metrics.total_time >= sync_metrics.network_time + sync_metrics.backoff_time
+    assert async_metrics.retries == 0 and async_metrics.error is None
+    assert failed_metrics.status_code == 422 and failed_metrics.error == "InvalidRequestError"
+
+
+@pytest.mark.parametrize("request_compression", ["gzip", "deflate"])
+def test_request_compression(stand_in_server, session, request_compression):
+    session.request_compression = request_compression
+    recorded = []
+    session.add_observer(recorded.append)
+    small = dict(location="carla:Town03")
+    large = dict(location="carla:Town03", recurrent_states=[[0.123456789] * 152 for _ in range(100)])
+
+    assert session.request(model="drive", data=small)["echo"] == small
+    assert session.request(model="drive", data=large)["echo"] == large
+    assert session.run_async(session.async_request(model="drive", data=large))["echo"] == large
+    assert stand_in_server.content_encodings == [None, request_compression, request_compression]
+    assert recorded[1].payload_bytes < len(json.dumps(large)) / 10
+
+    session.request_compression = None
+    session.request(model="drive", data=large)
+    assert stand_in_server.content_encodings[-1] is None
+
+
+@pytest.mark.parametrize("encoder", ["json", "orjson"])
+@pytest.mark.parametrize("decoder", ["json", "orjson"])
+def test_serializer_float_round_trip(encoder, decoder):
+    if "orjson" in (encoder, decoder):
+        pytest.importorskip("orjson")
+    floats = random_floats(1000)
+    body = dict(recurrent_states=[floats], traffic_lights_states={1: "green"}, seed=None)
+    decoded = get_serializer(decoder).loads(get_serializer(encoder).dumps(body))
+    assert [struct.pack("<d", f) for f in decoded["recurrent_states"][0]] == [struct.pack("<d", f) for f in floats]
+    assert decoded["traffic_lights_states"] == {"1": "green"}
+
+
+@pytest.mark.parametrize("serializer", ["json", "orjson"])
+@pytest.mark.parametrize("value", [math.nan, math.inf, -math.inf, np.float32("nan")])
+def test_serializer_non_finite_floats(serializer, value):
+    if serializer == "orjson":
+        pytest.importorskip("orjson")
+    for body in (
+        dict(agent_states=[[0.0, 1.0, value, 2.0]]),
+        dict(recurrent_states=[1, 2.0, value]),
+        dict(agent_states=np.array([[0.0, value]])),
+        dict(rendering_center=(value, 0.0), seed=None),
+    ):
+        with pytest.raises(ValueError):
+            get_serializer(serializer).dumps(body)
+    # Finite values whose sum overflows
+    assert get_serializer(serializer).loads(get_serializer(serializer).dumps([1e308, 1e308])) == [1e308, 1e308]
+
+
+@pytest.mark.parametrize("serializer", ["json", "orjson"])
+def test_serializer_numpy_arrays(serializer):
+    if serializer == "orjson":
+        pytest.importorskip("orjson")
+    states = [random_floats(2)[i:i + 4] for i in range(0, 8, 4)]
+    encoded = get_serializer(serializer).dumps(dict(agent_states=AgentStateBatch.fromlist(states).array))
+    assert encoded == get_serializer(serializer).dumps(dict(agent_states=states))
+
+
+def test_binary_serializer_round_trip():
+    floats = random_floats(1000)
+    serializer = BinarySerializer()
+    body = dict(recurrent_states=np.array([floats]), image=np.arange(256, dtype=np.uint8), lists=[floats], seed=None)
+    encoded = serializer.dumps(body)
+    assert encoded.startswith(BinarySerializer.MAGIC)
+    decoded = serializer.loads(encoded)
+    assert [struct.pack("<d", f) for f in decoded["recurrent_states"][0]] == [struct.pack("<d", f) for f in floats]
+    assert decoded["image"] == list(range(256)) and decoded["lists"] == [floats] and decoded["seed"] is None
+    # JSON bodies are still understood
+    assert serializer.loads(JSONSerializer().dumps(dict(seed=1))) == dict(seed=1)
+
+
+@pytest.mark.parametrize("binary_server", [True, False])
+def test_binary_serializer_negotiation(stand_in_api, session, car_properties, binary_server):
+    stand_in_api.binary = binary_server
+    session.serializer = "binary"
+    agent_states = AgentStateBatch.fromlist([[float(i), 0.0, 0.0, 10.0] for i in range(3)])
+    agent_properties = car_properties(3)
+    for _ in range(2):
+        response = iai.drive(location="carla:Town03", agent_states=agent_states, agent_properties=agent_properties,
+                             session=session)
+        assert response.agent_states.x.tolist() == pytest.approx([1.0, 2.0, 3.0])
+    # A server that rejects binary bodies gets the request again as JSON, and JSON from then on
+    assert isinstance(session.serializer, BinarySerializer) == binary_server
+    assert stand_in_api.paths == ["/drive"] * (2 if binary_server else 3)
+
+
+def test_binary_serializer_input_error(stand_in_api, session, car_properties):
+    stand_in_api.binary = True
+    session.serializer = "binary"
+    agent_states = AgentStateBatch.fromlist([[0.0, 0.0, 0.0, 10.0]])
+    agent_properties = car_properties()
+    # Input errors unrelated to the content type are not sent again as JSON
+    stand_in_api.statuses = [422]
+    stand_in_api.details = [[dict(loc=["body", "location"], msg="unknown location")]]
+    with pytest.raises(InvalidRequestError):
+        iai.drive(location="carla:Town03", agent_states=agent_states, agent_properties=agent_properties,
+                  session=session)
+    assert stand_in_api.paths == ["/drive"]
+    assert isinstance(session.serializer, BinarySerializer)
+
+
+@pytest.mark.parametrize("serializer", ["json", "auto"])
+def test_session_serializer(session, serializer):
+    session.serializer = serializer
+    assert isinstance(session.serializer, JSONSerializer)
+    data = dict(recurrent_states=[random_floats(200)])
+    assert session.request(model="drive", data=data)["echo"] == data
+
+
+def test_retry_scheduler_per_endpoint_backoff():
+    scheduler = RetryScheduler(base_backoff=1, backoff_factor=2, jitter_factor=None, max_backoff=5)
+    assert [scheduler.next_backoff("drive") for _ in range(4)] == [1, 2, 4, 5]
+    assert scheduler.current_backoff("drive") == 5
+    assert scheduler.current_backoff("location_info") == 1
+    assert scheduler.next_backoff("location_info") == 1
+    scheduler.record_success("drive")
+    assert scheduler.current_backoff("drive") == 2.5
+    assert scheduler.current_backoff() == 2.5
+    scheduler.reset()
+    assert scheduler.current_backoff("drive") == 1
+
+
+def test_retry_budget_refills_exactly():
+    scheduler = RetryScheduler(jitter_factor=None, retry_budget=5, retry_budget_refill=0.1)
+    for _ in range(5):
+        assert scheduler.next_backoff("drive") is not None
+    assert scheduler.next_backoff("drive") is None
+    for _ in range(10):
+        scheduler.record_success("drive")
+    # Ten refills of 0.1 are exactly one retry
+    assert scheduler.next_backoff("drive") is not None
+    assert scheduler.next_backoff("drive") is None
+    assert scheduler.tokens == 0
+
+
+def test_retry_budget(stand_in_server, session):
+    session.retry_budget = 2
+    stand_in_server.statuses = [503, 503, 503]
+    with pytest.raises(RequestTimeoutError):
+        session.request(model="drive", data=dict(i=1))
+    assert session.retry_scheduler.tokens == 0
+    assert session.retry_scheduler.exhausted == 1
+
+    for _ in range(10):
+        session.request(model="drive", data=dict(i=1))
+    assert session.retry_scheduler.tokens == pytest.approx(1)
+    stand_in_server.statuses = [503]
+    assert session.request(model="drive", data=dict(i=1))["echo"] == dict(i=1)
+
+
+def test_retry_scheduler_thread_safe():
+    scheduler = RetryScheduler(base_backoff=1, jitter_factor=None, retry_budget=1000, retry_budget_refill=0)
+
+    def spend():
+        for _ in range(200):
+            scheduler.next_backoff("drive")
+
+    threads = [threading.Thread(target=spend) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert scheduler.retries == 1000
+    assert scheduler.exhausted == 600
+    assert scheduler.tokens == 0
+
+
+def test_rate_limiter_aimd():
+    limiter = RateLimiter(increase=1.0, decrease_factor=0.5)
+    assert limiter.acquire() == 0 and limiter.rate is None
+    limiter.rate = 10
+    limiter.record_response(429, {})
+    assert limiter.rate == 5 and limiter.throttled == 1
+    limiter.record_response(429, {})
+    assert limiter.rate == 5  # At most one decrease per interval
+    for _ in range(5):
+        limiter.record_response(200, {})
+    assert limiter.rate == pytest.approx(6, abs=0.1)
+    limiter.record_response(200, {"X-RateLimit-Remaining": "2", "X-RateLimit-Reset": "4"})
+    assert limiter.rate == 0.5
+
+
+@pytest.mark.parametrize("epoch", [False, True])
+def test_rate_limiter_reset_header(epoch):
+    limiter = RateLimiter()
+    limiter.rate = 10
+    reset = time.time() + 4 if epoch else 4
+    limiter.record_response(200, {"X-RateLimit-Remaining": "2", "X-RateLimit-Reset": str(reset)})
+    assert limiter.rate == pytest.approx(0.5, rel=0.01)
+    # Timestamps which already passed are ignored
+    limiter.record_response(200, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(time.time() - 10)})
+    assert limiter.rate >= 0.5
+
+
+def test_rate_limiter_paces_requests(session):
+    session.rate_limit = 20
+
+    async def fire(n):
+        return await asyncio.gather(*[session.async_request(model="drive", data=dict(i=i)) for i in range(n)])
+
+    start = time.perf_counter()
+    session.run_async(fire(10))
+    assert time.perf_counter() - start >= 9 / 20 * 0.9
+    assert session.rate_limiter.queued == 0
+    assert session.rate_limiter.wait_time > 0
+
+
+def test_rate_limiter_learns_from_throttling(stand_in_server, session):
+    session.adaptive_rate_limit = True
+    for i in range(10):
+        session.request(model="drive", data=dict(i=i))
+    assert session.rate_limit is None
+    recorded = []
+    session.add_observer(recorded.append)
+    stand_in_server.statuses = [429]
+    stand_in_server.headers = {"Retry-After": "0.2"}
+    session.request(model="drive", data=dict(i=1))
+    assert 1 < session.rate_limit < 10
+    assert session.rate_limiter.throttled == 1
+    assert recorded[0].throttle_time >= 0.15
+
+
+def test_hedged_requests(stand_in_server, session):
+    session.hedging = True
+    session.hedger.min_samples = 5
+    recorded = []
+    session.add_observer(recorded.append)
+
+    for i in range(5):
+        session.run_async(session.async_request(model="drive", data=dict(i=i), hedge=True))
+    assert session.hedger.fired == 0
+
+    stand_in_server.delays = [1.0]
+    start = time.perf_counter()
+    response = session.run_async(session.async_request(model="drive", data=dict(i=5), hedge=True))
+    assert time.perf_counter() - start < 0.5
+    assert response["echo"] == dict(i=5)
+    assert session.hedger.as_dict() == dict(fired=1, won=1)
+    assert recorded[-1].hedged
+
+    stand_in_server.delays = [0.3]
+    session.run_async(session.async_request(model="drive", data=dict(i=6)))
+    assert session.hedger.fired == 1 and not recorded[-1].hedged
+
+
+def test_explicit_session(stand_in_api, session, car_properties):
+    recorded, global_recorded = [], []
+    session.add_observer(recorded.append)
+    iai.session.add_observer(global_recorded.append)
+    try:
+        location = iai.location_info(location="carla:Town03", session=session)
+        agent_states = [iai.common.AgentState.fromlist([0.0, 0.0, 0.0, 10.0])]
+        agent_properties = car_properties()
+        response = iai.drive(location="carla:Town03", agent_states=agent_states, agent_properties=agent_properties, session=session)
+        large_response = iai.large_drive(
+            location="carla:Town03",
+            agent_states=[iai.common.AgentState.fromlist([x, y, 0.0, 10.0]) for x, y in [(0, 0), (200, 0), (0, 200)]],
+            agent_properties=agent_properties * 3,
+            single_call_agent_limit=1,
+            session=session
+        )
+    finally:
+        iai.session.remove_observer(global_recorded.append)
+    assert location.version == "stand-in"
+    assert response.agent_states[0].center.x == pytest.approx(1.0)
+    assert len(large_response.agent_states) == 3
+    assert [m.model for m in recorded[:2]] == ["location_info", "drive"]
+    assert len(recorded) > 2
+    assert global_recorded == []
+
+
+def test_api_key_cache(stand_in_server, session, make_session, cache_dir):
+    base_url = f"http://127.0.0.1:{stand_in_server.server_address[1]}"
+    make_session().add_apikey("key", url=base_url)
+    assert len(stand_in_server.paths) == 1
+
+    session.add_apikey("key", url=base_url)
+    assert len(stand_in_server.paths) == 1
+    assert session.base_url == base_url
+    assert "key" not in (cache_dir / "api_keys.json").read_text()
+
+    session.add_apikey("other key", url=base_url)
+    assert len(stand_in_server.paths) == 2
+    session.key_cache_ttl = 0
+    session.add_apikey("key", url=base_url)
+    assert len(stand_in_server.paths) == 3
+
+    # Keys are not cached when their verification fails with a server error
+    session.key_cache_ttl = 60
+    stand_in_server.statuses = [503]
+    session.add_apikey("third key", url=base_url)
+    assert len(stand_in_server.paths) == 4
+    session.add_apikey("third key", url=base_url)
+    assert len(stand_in_server.paths) == 5
+
+
+def test_lazy_key_verification(stand_in_server, session, make_session):
+    base_url = f"http://127.0.0.1:{stand_in_server.server_address[1]}"
+    session.lazy_key_verification = True
+    session.add_apikey("key", url=base_url)
+    assert stand_in_server.paths == []
+    session.request(model="drive", data=dict(i=1))
+    session.run_async(session.async_request(model="drive", data=dict(i=2)))
+    assert stand_in_server.paths == ["/", "/drive", "/drive"]
+
+    session = make_session()
+    session.lazy_key_verification = True
+    stand_in_server.statuses = [403]
+    session.add_apikey("invalid key", url=base_url)
+    with pytest.raises(AuthenticationError):
+        session.run_async(session.async_request(model="drive", data=dict(i=1)))
+
+
+@validate_api_call
+def identity_states(agent_states: List[iai.common.AgentState], session: Optional[Session] = None):
+    return agent_states
+
+
+@validate_api_call
+async def async_identity_states(agent_states: List[iai.common.AgentState], session: Optional[Session] = None):
+    return agent_states
+
+
+def test_validation_policy():
+    session = Session()
+    state = iai.common.AgentState.fromlist([0.0, 0.0, 0.0, 1.0])
+    raw_state = dict(center=dict(x=0.0, y=0.0), orientation=0.0, speed=1.0)
+    assert identity_states([raw_state], session=session) == [state]
+    session.validation = "shallow"
+    assert identity_states([state], session=session)[0] is state
+    assert identity_states([raw_state], session=session) == [state]
+    # Every element is looked at, not only the first one
+    assert identity_states([state, raw_state], session=session) == [state, state]
+    session.validation = "none"
+    assert identity_states([raw_state], session=session)[0] is raw_state
+    assert session.run_async(async_identity_states([raw_state], session=session))[0] is raw_state
+    assert identity_states([raw_state], session=session, validation="full") == [state]
+    with pytest.raises(InvalidInput):
+        session.validation = "partial"
+
+
+def test_image_decoded_once():
+    PImage = pytest.importorskip("PIL.Image")
+    import io
+    pixels = np.arange(2 * 3 * 3, dtype=np.uint8).reshape(2, 3, 3)
+    stream = io.BytesIO()
+    PImage.fromarray(pixels).save(stream, format="PNG")
+    for validate in (True, False):
+        image = iai.common.Image.fromval(list(stream.getvalue()), validate=validate)
+        assert image.encoded_image == stream.getvalue()
+        assert image.array is image.array and not image.array.flags.writeable
+        assert image.decode().tolist() == pixels[:, :, ::-1].tolist()
+        assert image.model_dump()["encoded_image"] == list(stream.getvalue())